@@ -4,7 +4,7 @@ import hashlib
 import hmac
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any
 # Используем parse_qsl для правильного декодирования URL-строки
 from urllib.parse import parse_qsl
@@ -12,6 +12,7 @@ from urllib.parse import parse_qsl
 from itsdangerous import URLSafeTimedSerializer
 
 from app.config import get_settings
+from app.schemas import MembershipClaims
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -19,6 +20,8 @@ logger.setLevel(logging.INFO)
 settings = get_settings()
 serializer = URLSafeTimedSerializer(settings.jwt_secret)
 
+SESSION_TTL_SECONDS = 6 * 3600
+
 
 def _check_webapp_signature(data: str) -> dict[str, Any]:
     """Verify Telegram WebApp init_data signature."""
@@ -89,7 +92,8 @@ def _decode_user_json(payload: dict[str, Any]) -> dict[str, Any]:
     return payload
 
 
-def create_session_token(init_data: str) -> str:
+def verify_init_data(init_data: str) -> dict[str, Any]:
+    """Проверка init_data Mini App; возвращает данные пользователя Telegram."""
     # Валидация
     data = _check_webapp_signature(init_data)
     
@@ -104,15 +108,57 @@ def create_session_token(init_data: str) -> str:
             raise ValueError("User info missing")
             
     logger.info("Auth success for user_id=%s username=%s", user.get("id"), user.get("username"))
+    return user
 
-    expires = datetime.utcnow() + timedelta(hours=6)
-    return serializer.dumps({"tg_user": user, "exp": expires.timestamp()})
 
+def create_session_token(user: dict[str, Any], claims: MembershipClaims | None = None) -> str:
+    """
+    Подписывает сессионный токен.
 
-def verify_session_token(token: str) -> dict[str, Any]:
+    В токен кладутся незаблокированные семьи пользователя с ролями и эпоха членства,
+    чтобы проверки доступа к семье не требовали запросов к БД.
+    """
+    expires = datetime.utcnow() + timedelta(seconds=SESSION_TTL_SECONDS)
+    payload: dict[str, Any] = {"tg_user": user, "exp": expires.timestamp()}
+    if claims is not None:
+        # Ключи JSON-объекта всегда строки
+        payload["fam"] = {str(family_id): role for family_id, role in claims.families.items()}
+        payload["ep"] = claims.epoch
+    return serializer.dumps(payload)
+
+
+def token_claims(data: dict[str, Any]) -> MembershipClaims | None:
+    """Извлечение прав в семьях из содержимого токена (None для токенов без них)."""
+    if "ep" not in data or not isinstance(data.get("fam"), dict):
+        return None
+    try:
+        return MembershipClaims(
+            epoch=int(data["ep"]),
+            families={int(family_id): str(role) for family_id, role in data["fam"].items()},
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def decode_session_token(token: str) -> tuple[dict[str, Any], float]:
+    """
+    Проверка подписи и срока действия токена.
+
+    Возвращает содержимое токена и оставшееся время его жизни в секундах.
+    """
     try:
-        data = serializer.loads(token, max_age=6 * 3600)
-        return data["tg_user"]
+        data, signed_at = serializer.loads(token, max_age=SESSION_TTL_SECONDS, return_timestamp=True)
     except Exception as e:
         # Хорошей практикой считается ловить ошибки сериализатора (BadSignature, SignatureExpired)
-        raise ValueError(f"Invalid session token: {e}")
\ No newline at end of file
+        raise ValueError(f"Invalid session token: {e}")
+
+    if not isinstance(data, dict) or "tg_user" not in data:
+        raise ValueError("Invalid session token: missing user")
+
+    remaining = SESSION_TTL_SECONDS - (datetime.now(timezone.utc) - signed_at).total_seconds()
+    return data, remaining
+
+
+def verify_session_token(token: str) -> dict[str, Any]:
+    data, _ = decode_session_token(token)
+    return data["tg_user"]
\ No newline at end of file
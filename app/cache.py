@@ -0,0 +1,107 @@
+"""
+Простые in-process кэши с ограничением по размеру и времени жизни.
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    LRU-кэш с TTL на каждую запись.
+
+    При превышении max_size вытесняется наименее недавно использованная запись.
+    Если задан max_weight, вытеснение идёт и по суммарному весу записей
+    (weigher(value), например размер в байтах).
+    Счётчики hits/misses/evictions доступны через stats().
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_weight: Optional[int] = None,
+        weigher: Callable[[V], int] = lambda value: 1,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self._weigher = weigher
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        """Сохранение значения; ttl позволяет сократить время жизни конкретной записи."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        self._remove(key)
+        self._data[key] = (self._clock() + ttl, value)
+        self.weight += self._weigher(value)
+        while len(self._data) > self.max_size or (self.max_weight is not None and self.weight > self.max_weight):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> Optional[tuple[float, V]]:
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.weight -= self._weigher(entry[1])
+        return entry
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        entry = self._remove(key)
+        return entry[1] if entry else None
+
+    def discard_where(self, predicate: Callable[[Hashable, V], bool]) -> int:
+        """Удаление всех записей, для которых predicate(key, value) истинен."""
+        keys = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.max_weight is not None:
+            stats.update(weight=self.weight, max_weight=self.max_weight)
+        return stats
@@ -23,6 +23,82 @@ class Settings(BaseSettings):
     # ID администраторов бота (через запятую) - могут отправлять сообщения от лица бота
     admin_user_ids: str = Field(default="", description="Admin user IDs (comma-separated)")
 
+    # Пул соединений с БД (на процесс)
+    db_pool_size: int = Field(default=10, description="Persistent connections kept in the pool")
+    db_max_overflow: int = Field(default=20, description="Extra connections opened under bursts")
+    db_pool_timeout_seconds: float = Field(default=30, description="How long a checkout waits for a free connection")
+    db_pool_recycle_seconds: int = Field(default=1800, description="Reconnect connections older than this (-1 disables)")
+    db_pool_pre_ping: bool = Field(default=True, description="Check connections for liveness on checkout")
+    db_statement_cache_size: int = Field(default=100, description="asyncpg prepared statement cache per connection")
+    db_pgbouncer_transaction_mode: bool = Field(
+        default=False, description="Disable server-side prepared statements for pgbouncer pool_mode=transaction"
+    )
+    db_slow_checkout_ms: float = Field(default=100, description="Checkout wait counted as slow in pool stats")
+
+    # Миграции выполняются отдельной командой; при старте только проверяется версия схемы
+    migrate_on_startup: bool = Field(default=False, description="Apply pending migrations when an API process starts")
+
+    # Кэш проверенных сессионных токенов (на процесс)
+    session_cache_ttl_seconds: int = Field(default=300, description="How long a verified session is cached")
+    session_cache_max_size: int = Field(default=10000, description="Max cached sessions per worker")
+
+    # Кэш выборок задач по месяцам (app/task_cache.py)
+    task_cache_enabled: bool = Field(default=True, description="Serve GET /tasks from month buckets cache")
+    task_cache_url: str = Field(default="", description="Redis URL for a shared cache (empty: in-process)")
+    task_cache_ttl_seconds: int = Field(default=600, description="How long a month bucket is kept")
+    task_cache_max_entries: int = Field(default=20000, description="Max month buckets per worker (in-process)")
+    task_cache_max_bytes: int = Field(default=64 * 1024 * 1024, description="Memory cap for buckets per worker (in-process)")
+    task_cache_max_months: int = Field(default=12, description="Longer periods bypass the cache")
+
+    # Длинные периоды GET /tasks: страницы по курсору или потоковый ответ
+    tasks_page_size: int = Field(default=200, description="GET /tasks page size when paginating without limit")
+    tasks_page_size_max: int = Field(default=1000, description="Largest page GET /tasks returns")
+    tasks_unpaged_max_days: int = Field(default=62, description="Longer GET /tasks periods are paginated unless streamed")
+    tasks_stream_batch_size: int = Field(default=500, description="Rows fetched per server-side cursor round trip")
+
+    # Выгрузка и импорт .ics (GET /tasks/export.ics, POST /tasks/import)
+    ics_import_max_bytes: int = Field(default=100 * 1024 * 1024, description="Largest .ics file POST /tasks/import accepts")
+    ics_import_batch_size: int = Field(default=1000, description="Events inserted per import transaction")
+
+    # Дельта-синхронизация задач (GET /tasks/changes)
+    task_tombstone_retention_days: int = Field(default=30, description="How long deleted tasks are reported to sync clients")
+
+    # Поток изменений задач (GET /tasks/stream)
+    realtime_enabled: bool = Field(default=True, description="Publish task change events to connected clients")
+    realtime_heartbeat_seconds: float = Field(default=15, description="Keep-alive comment interval for idle streams")
+    realtime_queue_size: int = Field(default=100, description="Events buffered per connection before it is reset")
+    realtime_max_connections: int = Field(default=10000, description="Max open streams per worker")
+    realtime_max_stream_seconds: float = Field(default=1800, description="Streams are closed after this to re-check access")
+
+    # Планировщик напоминаний
+    embedded_scheduler: bool = Field(default=True, description="Run the reminder scheduler inside API processes")
+    leader_heartbeat_seconds: float = Field(default=10, description="Scheduler leader lock heartbeat interval")
+    leader_retry_seconds: float = Field(default=15, description="How often followers try to take over leadership")
+    scheduler_batch_size: int = Field(default=100, description="Reminders claimed per scheduler transaction")
+    scheduler_max_sleep_seconds: float = Field(default=60, description="Upper bound for scheduler sleep between checks")
+
+    # Доставка сообщений в Telegram
+    delivery_workers: int = Field(default=8, description="Concurrent Telegram senders per process")
+    delivery_rate_per_second: float = Field(default=30, description="Global Bot API message rate")
+    delivery_per_chat_interval_seconds: float = Field(default=1.0, description="Min interval between messages to one chat")
+    delivery_queue_size: int = Field(default=10000, description="Max queued messages before producers wait")
+    delivery_max_attempts: int = Field(default=5, description="Attempts before a message is dropped")
+
+    # Telegram-бот: long polling (python -m bot.main) или webhook внутри API
+    bot_webhook_enabled: bool = Field(default=False, description="Receive bot updates on POST /telegram/webhook instead of polling")
+    bot_webhook_url: str = Field(default="", description="Public webhook URL (empty: WEBAPP_URL host + /telegram/webhook)")
+    bot_webhook_secret: str = Field(default="", description="X-Telegram-Bot-Api-Secret-Token value, required in webhook mode")
+    bot_update_workers: int = Field(default=16, description="Chats whose updates are handled concurrently")
+    bot_update_queue_size: int = Field(default=1000, description="Updates waiting for a worker before intake stalls")
+    bot_update_dedupe_window: int = Field(default=10000, description="Recent update ids remembered to drop redeliveries")
+
+    # Очередь фоновых задач (таблица jobs)
+    embedded_job_worker: bool = Field(default=True, description="Run a job worker inside each API process")
+    job_batch_size: int = Field(default=50, description="Jobs claimed per worker transaction")
+    job_poll_interval_seconds: float = Field(default=1.0, description="Worker sleep when the queue is empty")
+    job_visibility_timeout_seconds: int = Field(default=120, description="Lease after which a running job is retried")
+    job_max_attempts: int = Field(default=5, description="Attempts before a job is dead-lettered")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
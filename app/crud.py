@@ -1,17 +1,22 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 import random
 import string
-from datetime import date
-from typing import Iterable, Optional
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Container, Iterable, Iterator, NamedTuple, Optional, Sequence
 
 # Меняем импорт сессии на асинхронную
 from sqlalchemy.ext.asyncio import AsyncSession 
-from sqlalchemy import select, and_, or_, delete
+from sqlalchemy import select, insert, and_, or_, delete, update, union_all, cast, null, literal, literal_column, func, tuple_, table, column, type_coerce, true, Float, Integer, Row
+from sqlalchemy.dialects.postgresql import JSONB, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import selectinload
 # Session больше не нужна: from sqlalchemy.orm import Session 
 
-from app import schemas, models
+from app import schemas, models, recurrence, search, ical
 
 
 # Генерация кода не выполняет I/O, оставляем синхронной
@@ -30,11 +35,21 @@ async def get_user(db: AsyncSession, user_id: int) -> Optional[models.User]:
 
 
 async def create_or_update_user(db: AsyncSession, payload: schemas.UserCreate) -> models.User:
-    """Асинхронное создание или обновление пользователя."""
+    """
+    Асинхронное создание или обновление пользователя.
+
+    Если профиль в Telegram не изменился, запись не трогаем и транзакцию не открываем на запись.
+    """
     # Вызываем асинхронную версию get_user
     user = await get_user(db, payload.id)
     
     if user:
+        if (
+            user.first_name == payload.first_name
+            and user.last_name == payload.last_name
+            and user.username == payload.username
+        ):
+            return user
         user.first_name = payload.first_name
         user.last_name = payload.last_name
         user.username = payload.username
@@ -84,6 +99,7 @@ async def create_family(db: AsyncSession, owner_id: int, name: str) -> models.Fa
 
     membership = models.FamilyMembership(user_id=owner_id, family_id=family.id, role="owner")
     db.add(membership)
+    await bump_membership_epoch(db, owner_id)
     
     # Второй асинхронный commit
     await db.commit()
@@ -120,6 +136,188 @@ async def is_member(db: AsyncSession, user_id: int, family_id: int) -> bool:
     return result.scalar_one_or_none() is not None
 
 
+async def get_membership_claims(db: AsyncSession, user_id: int) -> schemas.MembershipClaims:
+    """
+    Эпоха членства и незаблокированные семьи пользователя с ролями — одним запросом.
+    Используется для подписи прав в сессионном токене.
+    """
+    stmt = (
+        select(models.User.membership_epoch, models.FamilyMembership.family_id, models.FamilyMembership.role)
+        .outerjoin(
+            models.FamilyMembership,
+            and_(
+                models.FamilyMembership.user_id == models.User.id,
+                models.FamilyMembership.blocked == False,
+            ),
+        )
+        .where(models.User.id == user_id)
+    )
+    result = await db.execute(stmt)
+    claims = schemas.MembershipClaims()
+    for epoch, family_id, role in result.all():
+        claims.epoch = epoch
+        if family_id is not None:
+            claims.families[family_id] = role or "member"
+    return claims
+
+
+async def bump_membership_epoch(db: AsyncSession, user_id: int) -> None:
+    """
+    Увеличение эпохи членства пользователя (без commit — выполняется в транзакции вызывающего).
+    Токены, подписанные с предыдущей эпохой, перестают считаться актуальными.
+    """
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(membership_epoch=models.User.membership_epoch + 1)
+    )
+
+
+async def get_membership_epoch(db: AsyncSession, user_id: int) -> Optional[int]:
+    """Текущая эпоха членства пользователя (меняется при любом изменении его списка семей)."""
+    stmt = select(models.User.membership_epoch).where(models.User.id == user_id)
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+
+async def bump_task_version(db: AsyncSession, owner_id: int, family_id: Optional[int]) -> int:
+    """
+    Отметка изменения задач: версия семьи для семейной задачи, версия владельца для личной
+    (без commit — выполняется в транзакции вызывающего). Используется для ETag списков задач.
+
+    Возвращает новую версию — она же change_seq изменённой задачи. Строка источника остаётся
+    заблокированной до commit, поэтому версии одного источника фиксируются строго по порядку.
+    """
+    if family_id is not None:
+        stmt = update(models.Family).where(models.Family.id == family_id).values(
+            data_version=models.Family.data_version + 1
+        ).returning(models.Family.data_version)
+    else:
+        stmt = update(models.User).where(models.User.id == owner_id).values(
+            data_version=models.User.data_version + 1
+        ).returning(models.User.data_version)
+    return (await db.execute(stmt)).scalar_one()
+
+
+class TasksStamp(NamedTuple):
+    """Версия данных списка задач области (см. get_tasks_stamp)."""
+    epoch: Optional[int]
+    personal_version: Optional[int]  # None, если личные задачи в область не входят
+    families: tuple[tuple[int, int], ...]  # (family_id, data_version) доступных семей области
+
+
+async def get_tasks_stamp(db: AsyncSession, user_id: int, scope: str, family_id: Optional[int]) -> TasksStamp:
+    """
+    Версия данных, от которых зависит список задач области, — одним запросом без выборки задач.
+
+    Состоит из эпохи членства пользователя (вход/выход/блокировка), версии его личных задач
+    и версий задач доступных ему семей (для области семьи — только этой семьи).
+    Используется для ETag и как ключ кэша выборок (app.task_cache).
+    """
+    if scope == "personal":
+        stmt = select(models.User.membership_epoch, models.User.data_version).where(models.User.id == user_id)
+        row = (await db.execute(stmt)).first()
+        return TasksStamp(row[0], row[1], ()) if row else TasksStamp(None, None, ())
+
+    membership = and_(
+        models.FamilyMembership.user_id == models.User.id,
+        models.FamilyMembership.blocked == False,
+    )
+    if scope == "family" and family_id:
+        membership = and_(membership, models.FamilyMembership.family_id == family_id)
+    stmt = (
+        select(
+            models.User.membership_epoch,
+            models.User.data_version,
+            models.Family.id,
+            models.Family.data_version,
+        )
+        .outerjoin(models.FamilyMembership, membership)
+        .outerjoin(models.Family, models.Family.id == models.FamilyMembership.family_id)
+        .where(models.User.id == user_id)
+        .order_by(models.Family.id)
+    )
+    result = await db.execute(stmt)
+    rows = result.all()
+    if not rows:
+        return TasksStamp(None, None, ())
+    epoch, personal_version = rows[0][0], rows[0][1]
+    families = tuple((fid, version) for _, _, fid, version in rows if fid is not None)
+    if scope == "family" and family_id:
+        personal_version = None
+    return TasksStamp(epoch, personal_version, families)
+
+
+async def list_notification_recipients(
+    db: AsyncSession,
+    owner_ids: Iterable[int],
+    family_ids: Iterable[int],
+) -> list[tuple[Optional[int], int]]:
+    """
+    Получатели уведомлений для пачки задач одним запросом.
+
+    Возвращает пары (family_id, user_id): для личных задач family_id = None и user_id — владелец,
+    для семейных — все незаблокированные участники семьи. Пользователи с выключенными
+    уведомлениями отфильтровываются в том же запросе.
+    """
+    owner_ids, family_ids = set(owner_ids), set(family_ids)
+    statements = []
+    if owner_ids:
+        statements.append(
+            select(cast(null(), Integer).label("family_id"), models.User.id.label("user_id")).where(
+                models.User.id.in_(owner_ids),
+                models.User.telegram_notifications_enabled == True,
+            )
+        )
+    if family_ids:
+        statements.append(
+            select(models.FamilyMembership.family_id, models.FamilyMembership.user_id)
+            .join(models.User, models.User.id == models.FamilyMembership.user_id)
+            .where(
+                models.FamilyMembership.family_id.in_(family_ids),
+                models.FamilyMembership.blocked == False,
+                models.User.telegram_notifications_enabled == True,
+            )
+        )
+    if not statements:
+        return []
+
+    stmt = statements[0] if len(statements) == 1 else union_all(*statements)
+    result = await db.execute(stmt)
+    return [(family_id, user_id) for family_id, user_id in result.all()]
+
+
+async def _can_access_family(
+    db: AsyncSession,
+    user_id: int,
+    family_id: int,
+    member_family_ids: Optional[Container[int]],
+) -> bool:
+    """Проверка доступа к семье: сначала по сверенным с эпохой правам из сессии, при их отсутствии — по БД."""
+    if member_family_ids is not None and family_id in member_family_ids:
+        return True
+    return await is_member(db, user_id, family_id)
+
+
+async def _accessible_families(
+    db: AsyncSession,
+    user_id: int,
+    family_ids: Iterable[int],
+    member_family_ids: Optional[Container[int]],
+) -> set[int]:
+    """Семьи из family_ids, доступные пользователю: по правам из токена, остальные — одним запросом к БД."""
+    family_ids = set(family_ids)
+    allowed = {family_id for family_id in family_ids if member_family_ids is not None and family_id in member_family_ids}
+    unknown = family_ids - allowed
+    if unknown:
+        stmt = select(models.FamilyMembership.family_id).where(
+            models.FamilyMembership.user_id == user_id,
+            models.FamilyMembership.family_id.in_(unknown),
+            models.FamilyMembership.blocked == False,
+        )
+        allowed.update(await db.scalars(stmt))
+    return allowed
+
+
 async def list_user_families(db: AsyncSession, user_id: int) -> list[models.FamilyMembership]:
     """Асинхронное получение всех записей о членстве пользователя в группах."""
     stmt = (
@@ -145,6 +343,7 @@ async def add_user_to_family(db: AsyncSession, user_id: int, invite_code: str) -
 
     membership = models.FamilyMembership(user_id=user_id, family_id=family.id)
     db.add(membership)
+    await bump_membership_epoch(db, user_id)
     
     # Асинхронный commit
     await db.commit()
@@ -159,6 +358,7 @@ async def remove_user_from_family(db: AsyncSession, user_id: int, family_id: int
         models.FamilyMembership.family_id == family_id
     )
     await db.execute(stmt)
+    await bump_membership_epoch(db, user_id)
     await db.commit()
 
 
@@ -206,6 +406,7 @@ async def block_family_member(
         raise ValueError("Member not found")
     
     membership.blocked = True
+    await bump_membership_epoch(db, member_user_id)
     await db.commit()
 
 
@@ -230,6 +431,7 @@ async def unblock_family_member(
         raise ValueError("Member not found")
     
     membership.blocked = False
+    await bump_membership_epoch(db, member_user_id)
     await db.commit()
 
 
@@ -253,6 +455,162 @@ async def remove_family_member(
 # TASK FUNCTIONS
 # ----------------------------------------------------------------------
 
+# Колонки ответа GET /tasks в порядке полей schemas.TaskRead
+TASK_READ_FIELDS = tuple(schemas.TaskRead.model_fields)
+TASK_READ_COLUMNS = tuple(getattr(models.Task, name) for name in TASK_READ_FIELDS)
+# Колонки выборок списков: TASK_READ_COLUMNS и исключения серий (в JSON не попадают:
+# rows_to_json берёт колонки по числу полей)
+TASK_LIST_COLUMNS = TASK_READ_COLUMNS + (models.Task.exdates,)
+TaskListRow = namedtuple("TaskListRow", TASK_READ_FIELDS + ("exdates",))
+# Колонки выгрузки в .ics (app.ical.format_event)
+TASK_EXPORT_COLUMNS = TASK_LIST_COLUMNS + (models.Task.external_uid, models.Task.updated_at)
+
+
+def _exdates(value: Optional[list[str]]) -> set[date]:
+    return {date.fromisoformat(day) for day in value or ()}
+
+
+def _task_order(task) -> tuple:
+    # Тот же порядок, что ORDER BY _list_order (задачи без времени — в конце дня)
+    return task.date, task.start_time is None, task.start_time or time.min, task.id
+
+
+def _list_order(columns) -> tuple:
+    """ORDER BY списка задач на любой СУБД: порядок _task_order (задачи без времени — в конце дня)."""
+    return columns.date, columns.start_time.is_(None), columns.start_time, columns.id
+
+
+def _occurrence_row(row, day: date) -> TaskListRow:
+    return TaskListRow(*row)._replace(date=day, occurrence_date=day)
+
+
+def _occurrence_task(task: models.Task, day: date) -> models.Task:
+    """Вхождение серии как несохраняемый объект Task (в сессию не добавляется)."""
+    values = {column.key: getattr(task, column.key) for column in models.Task.__table__.columns}
+    return models.Task(**{**values, "date": day, "occurrence_date": day})
+
+
+def _series_occurrences(row, start: date, end: date, make: Callable[[Any, date], Any]) -> Iterator[Any]:
+    rule = recurrence.parse(row.rrule)
+    for day in recurrence.occurrences(row.date, rule, start, end, _exdates(row.exdates)):
+        yield make(row, day)
+
+
+def expand_series(
+    rows: Sequence[Any],
+    start: date,
+    end: date,
+    make: Callable[[Any, date], Any] = _occurrence_row,
+    ordered: bool = True,
+) -> Sequence[Any]:
+    """
+    Одиночные задачи как есть, серии — их вхождения в [start, end] (генераторами, без
+    промежуточных списков по сериям). С ordered одиночные строки уже отсортированы по date,
+    start_time, id, и результат сливается в том же порядке.
+    """
+    series = [row for row in rows if row.rrule is not None]
+    if not series:
+        return rows
+    singles = [row for row in rows if row.rrule is None]
+    expanded = [_series_occurrences(row, start, end, make) for row in series]
+    if ordered:
+        return list(heapq.merge(singles, *expanded, key=_task_order))
+    return singles + [occurrence for occurrences in expanded for occurrence in occurrences]
+
+
+def _in_window(start: date, end: date, series: Optional[bool]) -> list:
+    """
+    Условия попадания задачи в период: одиночные задачи — по дате, серии — по пересечению
+    [date, recurrence_end] с периодом. series=None — оба условия (отдельными ветками UNION ALL,
+    чтобы каждая шла по своему индексу), True/False — только серии/одиночные задачи.
+    """
+    single = and_(models.Task.rrule.is_(None), models.Task.date.between(start, end))
+    overlapping = and_(
+        models.Task.rrule.is_not(None),
+        models.Task.date <= end,
+        or_(models.Task.recurrence_end.is_(None), models.Task.recurrence_end >= start),
+    )
+    if series is None:
+        return [single, overlapping]
+    return [overlapping] if series else [single]
+
+
+def _member_family_tasks(user_id: int, *columns, source=models.Task):
+    """
+    Задачи семей, в которых пользователь состоит и не заблокирован (JOIN по uq_membership).
+    source — таблица с family_id задачи (models.Task или models.TaskTag).
+    """
+    return select(*columns).join(
+        models.FamilyMembership,
+        and_(
+            models.FamilyMembership.family_id == source.family_id,
+            models.FamilyMembership.user_id == user_id,
+            models.FamilyMembership.blocked.is_(False),
+        ),
+    )
+
+
+def _scope_branches(
+    user_id: int,
+    scope: str,
+    family_id: Optional[int],
+    columns: Sequence[Any],
+    condition,
+    source=models.Task,
+) -> list:
+    """
+    Запросы задач области, видимых пользователю, с условием condition (ветки для UNION ALL).
+    source — таблица, по owner_id/family_id которой определяется область (см. _member_family_tasks).
+    """
+    personal = select(*columns).where(
+        condition,
+        source.owner_id == user_id,
+        source.family_id.is_(None),
+    )
+    if scope == "personal":
+        return [personal]
+    if scope == "family" and family_id:
+        return [_member_family_tasks(user_id, *columns, source=source).where(condition, source.family_id == family_id)]
+    # UNION ALL, а не OR с подзапросом: каждая ветка идёт по своему индексу
+    # (owner_id, ...) / (family_id, ...); пересечений нет, т.к. family_id IS NULL
+    # только у личных задач
+    return [personal, _member_family_tasks(user_id, *columns, source=source).where(condition)]
+
+
+def _visible_tasks_stmt(
+    user_id: int,
+    start: date,
+    end: date,
+    scope: str,
+    family_id: Optional[int],
+    *columns,
+    ordered: bool = True,
+    series: Optional[bool] = None,
+    where=None,
+):
+    """
+    Запрос задач, видимых пользователю за период (ordered — с сортировкой по дате и времени).
+    where — дополнительное условие на задачи (например, фильтр по тегам).
+
+    Членство в семьях проверяется в том же запросе, поэтому список строится за один
+    round-trip, а заблокированные участники семейных задач не видят.
+    columns — сущность models.Task или набор её колонок (должны включать date, start_time и id).
+    Строки серий (см. _in_window) возвращаются как есть: вхождения разворачивает expand_series.
+    """
+    branches = []
+    for in_range in _in_window(start, end, series):
+        condition = in_range if where is None else and_(in_range, where)
+        branches += _scope_branches(user_id, scope, family_id, columns, condition)
+    stmt = branches[0] if len(branches) == 1 else union_all(*branches)
+    if ordered:
+        # id — чтобы порядок задач с одинаковым временем был стабильным (нужно кэшу выборок).
+        # Сортировка над подзапросом: выражения ORDER BY в UNION допустимы только так, и
+        # задачи без времени оказываются в конце дня на любой СУБД (как в _task_order)
+        found = stmt.subquery()
+        stmt = select(found).order_by(*_list_order(found.c))
+    return stmt
+
+
 async def list_tasks(
     db: AsyncSession,
     user_id: int,
@@ -261,72 +619,508 @@ async def list_tasks(
     scope: str,
     family_id: Optional[int],
 ) -> Iterable[models.Task]:
-    """Асинхронное получение списка задач с фильтрацией по дате и области."""
-    conditions = [models.Task.date.between(start, end)]
+    """
+    Асинхронное получение списка задач с фильтрацией по дате и области.
+    Вхождения серий — несохраняемые копии Task с датой вхождения.
+    """
+    stmt = _visible_tasks_stmt(user_id, start, end, scope, family_id, models.Task)
+    
+    # Асинхронное выполнение запроса и получение всех объектов
+    result = await db.execute(select(models.Task).from_statement(stmt))
+    return expand_series(result.scalars().all(), start, end, make=_occurrence_task)
 
-    if scope == "personal":
-        conditions.append(models.Task.owner_id == user_id)
-        conditions.append(models.Task.family_id.is_(None))
-    elif scope == "family" and family_id:
-        conditions.append(models.Task.family_id == family_id)
+
+async def list_task_rows(
+    db: AsyncSession,
+    user_id: int,
+    start: date,
+    end: date,
+    scope: str,
+    family_id: Optional[int],
+    tags: Sequence[str] = (),
+) -> Sequence[Row]:
+    """
+    То же, что list_tasks, но только колонки TASK_LIST_COLUMNS без ORM-объектов:
+    строки не попадают в identity map сессии (путь только для чтения).
+    tags — только задачи со всеми этими тегами (см. _tags_filter).
+    """
+    where = _tags_filter(db.get_bind().dialect.name, tags) if tags else None
+    stmt = _visible_tasks_stmt(user_id, start, end, scope, family_id, *TASK_LIST_COLUMNS, where=where)
+    result = await db.execute(stmt)
+    return expand_series(result.all(), start, end)
+
+
+# Ключ keyset-пагинации GET /tasks: (date, start_time, id) последней строки страницы
+TaskListKey = tuple[date, Optional[time], int]
+
+
+def _after_key(after: TaskListKey):
+    """Условие «строка после after» в порядке _list_order; date >= — для диапазона по индексу."""
+    day, start_time, task_id = after
+    Task = models.Task
+    if start_time is None:
+        same_day = and_(Task.start_time.is_(None), Task.id > task_id)
     else:
-        # Асинхронный вызов list_user_families
-        memberships = await list_user_families(db, user_id)
-        family_ids = [m.family_id for m in memberships]
-        
-        # Если групп нет, используем [0] для предотвращения пустого списка in_()
-        # Но PostgreSQL/SQLAlchemy может потребовать явного where(False)
-        family_filter = models.Task.family_id.in_(family_ids) if family_ids else False
-
-        conditions.append(
-            or_(
-                and_(models.Task.owner_id == user_id, models.Task.family_id.is_(None)),
-                family_filter,
+        same_day = or_(
+            Task.start_time.is_(None),
+            Task.start_time > start_time,
+            and_(Task.start_time == start_time, Task.id > task_id),
+        )
+    return and_(Task.date >= day, or_(Task.date > day, and_(Task.date == day, same_day)))
+
+
+async def _source_conditions(db: AsyncSession, user_id: int, scope: str, family_id: Optional[int]) -> list:
+    """
+    Условия области по источникам (личные задачи, каждая семья отдельно) для выборок в
+    порядке _list_order: ветка на источник идёт по индексу (owner_id, date) / (family_id, date)
+    уже в порядке даты, а JOIN по членству заставил бы сортировать все строки периода.
+    Членство проверяется отдельным запросом до выборки; области те же, что у _scope_branches.
+    """
+    personal = and_(models.Task.owner_id == user_id, models.Task.family_id.is_(None))
+    if scope == "personal":
+        return [personal]
+    stmt = select(models.FamilyMembership.family_id).where(
+        models.FamilyMembership.user_id == user_id,
+        models.FamilyMembership.blocked.is_(False),
+    )
+    if scope == "family" and family_id:
+        stmt = stmt.where(models.FamilyMembership.family_id == family_id)
+        return [models.Task.family_id == member_family for member_family in await db.scalars(stmt)]
+    return [personal, *(models.Task.family_id == member_family for member_family in sorted(await db.scalars(stmt)))]
+
+
+async def _series_rows(
+    db: AsyncSession,
+    user_id: int,
+    start: date,
+    end: date,
+    scope: str,
+    family_id: Optional[int],
+    conditions: list,
+) -> Sequence[Row]:
+    """Строки серий, пересекающихся с периодом (без разворачивания)."""
+    stmt = _visible_tasks_stmt(
+        user_id, start, end, scope, family_id, *TASK_LIST_COLUMNS,
+        ordered=False, series=True, where=and_(*conditions) if conditions else None,
+    )
+    return (await db.execute(stmt)).all()
+
+
+def _merged_occurrences(series: Sequence[Row], start: date, end: date) -> Iterator[TaskListRow]:
+    """Вхождения всех серий периода в порядке _task_order (генераторами, по мере чтения)."""
+    return heapq.merge(*(_series_occurrences(row, start, end, _occurrence_row) for row in series), key=_task_order)
+
+
+async def list_task_page(
+    db: AsyncSession,
+    user_id: int,
+    start: date,
+    end: date,
+    scope: str,
+    family_id: Optional[int],
+    limit: int,
+    after: Optional[TaskListKey] = None,
+    tags: Sequence[str] = (),
+) -> list:
+    """
+    Страница list_task_rows: не больше limit строк после ключа after (keyset, без OFFSET).
+
+    Одиночные задачи сортируются и ограничиваются в ветке каждого источника (см.
+    _source_conditions, date >= даты курсора), поэтому страница читает около limit строк
+    на источник, где бы в периоде она ни была. Серии разворачиваются с даты курсора, и обе
+    последовательности сливаются в порядке _task_order.
+    """
+    conditions = [_tags_filter(db.get_bind().dialect.name, tags)] if tags else []
+    if after is not None:
+        start = max(start, after[0])
+    [single] = _in_window(start, end, False)
+    single_conditions = [single, *conditions, *([_after_key(after)] if after is not None else [])]
+    branches = [
+        select(*TASK_LIST_COLUMNS).where(source, *single_conditions).order_by(*_list_order(models.Task)).limit(limit)
+        for source in await _source_conditions(db, user_id, scope, family_id)
+    ]
+    singles = []
+    if branches:
+        found = union_all(*(select(branch.subquery()) for branch in branches)).subquery()
+        singles = (await db.execute(select(found).order_by(*_list_order(found.c)).limit(limit))).all()
+
+    occurrences = _merged_occurrences(await _series_rows(db, user_id, start, end, scope, family_id, conditions), start, end)
+    if after is not None:
+        after_order = (after[0], after[1] is None, after[1] or time.min, after[2])
+        occurrences = itertools.dropwhile(lambda row: _task_order(row) <= after_order, occurrences)
+    return list(itertools.islice(heapq.merge(singles, occurrences, key=_task_order), limit))
+
+
+async def stream_task_rows(
+    db: AsyncSession,
+    user_id: int,
+    start: date,
+    end: date,
+    scope: str,
+    family_id: Optional[int],
+    tags: Sequence[str] = (),
+    batch_size: int = 500,
+) -> AsyncIterator[list]:
+    """
+    Строки list_task_rows пачками по batch_size без загрузки всего периода в память.
+
+    Одиночные задачи читаются серверным курсором (yield_per) из веток по источникам (см.
+    _source_conditions): PostgreSQL сливает их по индексам без сортировки всего периода.
+    Вхождения серий (их строки загружаются заранее, их немного) вставляются между ними
+    в порядке _task_order.
+    """
+    conditions = [_tags_filter(db.get_bind().dialect.name, tags)] if tags else []
+    occurrences = _merged_occurrences(await _series_rows(db, user_id, start, end, scope, family_id, conditions), start, end)
+    pending = next(occurrences, None)
+
+    [single] = _in_window(start, end, False)
+    sources = await _source_conditions(db, user_id, scope, family_id)
+    if sources:
+        singles = union_all(*(
+            select(select(*TASK_LIST_COLUMNS).where(source, single, *conditions).order_by(*_list_order(models.Task)).subquery())
+            for source in sources
+        )).subquery()
+        stmt = select(singles).order_by(*_list_order(singles.c)).execution_options(yield_per=batch_size)
+        result = await db.stream(stmt)
+        async for partition in result.partitions():
+            batch = []
+            for row in partition:
+                while pending is not None and _task_order(pending) < _task_order(row):
+                    batch.append(pending)
+                    pending = next(occurrences, None)
+                batch.append(row)
+            yield batch
+    if pending is not None:
+        rest = itertools.chain((pending,), occurrences)
+        while batch := list(itertools.islice(rest, batch_size)):
+            yield batch
+
+
+async def stream_export_rows(
+    db: AsyncSession,
+    user_id: int,
+    scope: str,
+    family_id: Optional[int],
+    batch_size: int = 500,
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Все задачи области для выгрузки в .ics (серия — одной строкой с правилом), колонки
+    TASK_EXPORT_COLUMNS, пачками по batch_size через серверный курсор, без сортировки.
+    """
+    sources = await _source_conditions(db, user_id, scope, family_id)
+    if not sources:
+        return
+    stmt = union_all(*(select(*TASK_EXPORT_COLUMNS).where(source) for source in sources))
+    result = await db.stream(stmt.execution_options(yield_per=batch_size))
+    async for partition in result.partitions():
+        yield partition
+
+
+async def list_task_month_rows(
+    db: AsyncSession,
+    owner_id: Optional[int],
+    family_ids: Iterable[int],
+    start: date,
+    end: date,
+) -> Sequence[Row]:
+    """
+    Колонки TASK_LIST_COLUMNS личных задач owner_id и задач семей family_ids за период
+    (с развёрнутыми вхождениями серий, без сортировки) одним запросом, без проверки
+    членства (её выполняет вызывающий, см. app.task_cache).
+    """
+    family_ids = list(family_ids)
+    branches = []
+    for in_range in _in_window(start, end, None):
+        if owner_id is not None:
+            branches.append(select(*TASK_LIST_COLUMNS).where(
+                in_range, models.Task.owner_id == owner_id, models.Task.family_id.is_(None)
+            ))
+        if family_ids:
+            branches.append(select(*TASK_LIST_COLUMNS).where(in_range, models.Task.family_id.in_(family_ids)))
+    if not branches:
+        return []
+    result = await db.execute(union_all(*branches))
+    return expand_series(result.all(), start, end, ordered=False)
+
+
+async def summarize_tasks(
+    db: AsyncSession,
+    user_id: int,
+    start: date,
+    end: date,
+    scope: str,
+    family_id: Optional[int],
+) -> list[schemas.DaySummary]:
+    """
+    Сводка по дням (количество, цвета, самое раннее время) для сетки календаря.
+
+    Одиночные задачи агрегируются GROUP BY (date, color) в БД, поэтому ответ зависит от числа
+    дней с задачами, а не от числа задач. Строки серий приходят тем же запросом (UNION ALL)
+    и разворачиваются во вхождения периода здесь.
+    """
+    columns = (models.Task.date, models.Task.start_time, models.Task.color)
+    singles = _visible_tasks_stmt(user_id, start, end, scope, family_id, *columns, ordered=False, series=False).subquery()
+    series = _visible_tasks_stmt(
+        user_id, start, end, scope, family_id, *columns, models.Task.rrule, models.Task.exdates,
+        ordered=False, series=True,
+    ).subquery()
+    stmt = union_all(
+        select(
+            singles.c.date, singles.c.color, func.count(), func.min(singles.c.start_time),
+            cast(null(), models.Task.rrule.type).label("rrule"),
+            cast(null(), models.Task.exdates.type).label("exdates"),
+        ).group_by(singles.c.date, singles.c.color),
+        select(series.c.date, series.c.color, literal(1), series.c.start_time, series.c.rrule, series.c.exdates),
+    )
+    result = await db.execute(stmt)
+
+    groups_by_day: dict[date, dict[Optional[str], list]] = {}
+
+    def add(day: date, color: Optional[str], count: int, first_start: Optional[time]) -> None:
+        group = groups_by_day.setdefault(day, {}).setdefault(color, [0, None])
+        group[0] += count
+        if first_start is not None and (group[1] is None or first_start < group[1]):
+            group[1] = first_start
+
+    for row in result.all():
+        if row.rrule is None:
+            add(row.date, row.color, row[2], row[3])
+            continue
+        rule = recurrence.parse(row.rrule)
+        for day in recurrence.occurrences(row.date, rule, start, end, _exdates(row.exdates)):
+            add(day, row.color, 1, row[3])
+
+    summaries = []
+    for day in sorted(groups_by_day):
+        groups = [(count, color, first_start) for color, (count, first_start) in groups_by_day[day].items()]
+        # Цвета в порядке времени начала, как задачи идут в списке дня; задачи без времени в конце
+        groups.sort(key=lambda group: (group[2] is None, group[2] or time.min))
+        start_times = [first_start for _, _, first_start in groups if first_start is not None]
+        summaries.append(
+            schemas.DaySummary(
+                date=day,
+                count=sum(count for count, _, _ in groups),
+                colors=[color for _, color, _ in groups],
+                first_start_time=min(start_times) if start_times else None,
             )
         )
+    return summaries
 
-    stmt = select(models.Task).where(*conditions).order_by(models.Task.date, models.Task.start_time)
-    
-    # Асинхронное выполнение запроса и получение всех объектов
+
+async def search_tasks(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    scope: str,
+    family_id: Optional[int],
+    limit: int,
+    after: Optional[tuple[float, int]] = None,
+) -> Sequence[Row]:
+    """
+    Полнотекстовый поиск задач области (см. app.search): колонки TASK_READ_COLUMNS и rank
+    по убыванию релевантности, при равной — по убыванию id. after — (rank, id) последней
+    строки предыдущей страницы (keyset-пагинация без OFFSET). Серия — одна строка, без вхождений.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        text_query = search.tsquery_text(query)
+        if text_query is None:
+            return []
+        tsquery = func.to_tsquery(literal_column(f"'{search.TEXT_SEARCH_CONFIG}'::regconfig"), text_query)
+        vector = literal_column(f"tasks.{search.SEARCH_VECTOR_COLUMN}")
+        rank = func.ts_rank(vector, tsquery, type_=Float)
+        condition = vector.op("@@")(tsquery)
+    else:
+        match = search.fts5_query(query)
+        if match is None:
+            return []
+        # bm25 тем меньше, чем релевантнее: меняем знак, чтобы порядок был тот же
+        fts = table(search.FTS_TABLE, column("rowid"))
+        rank = -func.bm25(literal_column(search.FTS_TABLE), *search.FTS_WEIGHTS, type_=Float)
+        condition = and_(fts.c.rowid == models.Task.id, literal_column(search.FTS_TABLE).match(match))
+
+    branches = _scope_branches(user_id, scope, family_id, TASK_READ_COLUMNS + (rank.label("rank"),), condition)
+    found = (branches[0] if len(branches) == 1 else union_all(*branches)).subquery()
+    stmt = select(found)
+    if after is not None:
+        stmt = stmt.where(tuple_(found.c.rank, found.c.id) < tuple_(*after))
+    stmt = stmt.order_by(found.c.rank.desc(), found.c.id.desc()).limit(limit)
     result = await db.execute(stmt)
-    return result.scalars().all()
+    return result.all()
 
 
-async def create_task(
+def tag_key(tag: str) -> str:
+    """Ключ тега в task_tags: без регистра и крайних пробелов."""
+    return tag.strip().lower()
+
+
+def _tags_filter(dialect: str, tags: Sequence[str]):
+    """
+    Условие «у задачи есть все теги tags» (точное совпадение, как в tags задачи).
+    PostgreSQL — tags @> '[...]' по GIN-индексу ix_tasks_tags, остальные СУБД — через task_tags.
+    """
+    tags = list(dict.fromkeys(tags))
+    if dialect == "postgresql":
+        return type_coerce(models.Task.tags, JSONB).contains(tags)
+    tagged = (
+        select(models.TaskTag.task_id)
+        .where(models.TaskTag.tag.in_(tags))
+        .group_by(models.TaskTag.task_id)
+        .having(func.count() == len(tags))
+    )
+    return models.Task.id.in_(tagged)
+
+
+async def summarize_tags(
     db: AsyncSession,
-    owner_id: int,
-    payload: schemas.TaskCreate,
-) -> models.Task:
-    """Асинхронное создание новой задачи."""
+    user_id: int,
+    start: date,
+    end: date,
+    scope: str,
+    family_id: Optional[int],
+) -> list[schemas.TagCount]:
+    """
+    Число задач области за период по тегам (вхождения серий считаются по отдельности, как в
+    summarize_tasks); по убыванию числа. Одиночные задачи агрегируются GROUP BY в БД по
+    task_tags, серии приходят тем же запросом и разворачиваются здесь. Теги, отличающиеся
+    только регистром, считаются одним (написание — первое по алфавиту).
+    """
+    key, tag = models.TaskTag.key, models.TaskTag.tag
+
+    def tagged(series: bool, *columns):
+        # Область и период — по индексам tasks, теги задачи — по первичному ключу task_tags
+        branches = []
+        for in_range in _in_window(start, end, series):
+            condition = and_(in_range, models.TaskTag.task_id == models.Task.id)
+            branches += _scope_branches(user_id, scope, family_id, (models.Task.date, *columns, key, tag), condition)
+        return (branches[0] if len(branches) == 1 else union_all(*branches)).subquery()
+
+    singles = tagged(False)
+    series = tagged(True, models.Task.rrule, models.Task.exdates)
+    stmt = union_all(
+        select(
+            singles.c.key, func.min(singles.c.tag), func.count(),
+            cast(null(), models.Task.date.type).label("date"),
+            cast(null(), models.Task.rrule.type).label("rrule"),
+            cast(null(), models.Task.exdates.type).label("exdates"),
+        ).group_by(singles.c.key),
+        select(series.c.key, series.c.tag, literal(0), series.c.date, series.c.rrule, series.c.exdates),
+    )
+    result = await db.execute(stmt)
+
+    counts: dict[str, list] = {}
+    for row in result.all():
+        count = row[2]
+        if row.rrule is not None:
+            rule = recurrence.parse(row.rrule)
+            count = sum(1 for _ in recurrence.occurrences(row.date, rule, start, end, _exdates(row.exdates)))
+            if not count:
+                continue
+        entry = counts.setdefault(row.key, [row[1], 0])
+        entry[0] = min(entry[0], row[1])
+        entry[1] += count
+    return [
+        schemas.TagCount(tag=tag_text, count=count)
+        for tag_text, count in sorted(counts.values(), key=lambda entry: (-entry[1], entry[0]))
+    ]
+
+
+async def suggest_tags(
+    db: AsyncSession,
+    user_id: int,
+    prefix: str,
+    scope: str,
+    family_id: Optional[int],
+    limit: int,
+) -> list[schemas.TagCount]:
+    """
+    Теги задач области, начинающиеся с prefix (без учёта регистра), по убыванию числа задач.
+    Поиск — диапазон key >= p AND key < p + U+10FFFF по индексам (owner_id, key) и
+    (family_id, key) таблицы task_tags, а не перебор задач.
+    """
+    start = tag_key(prefix)
+    key = models.TaskTag.key
+    condition = and_(key >= start, key < start + "\U0010ffff") if start else true()
+    branches = _scope_branches(
+        user_id, scope, family_id, (key, models.TaskTag.tag), condition, source=models.TaskTag,
+    )
+    found = (branches[0] if len(branches) == 1 else union_all(*branches)).subquery()
+    stmt = (
+        select(func.min(found.c.tag), func.count())
+        .group_by(found.c.key)
+        .order_by(func.count().desc(), found.c.key)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return [schemas.TagCount(tag=tag_text, count=count) for tag_text, count in result.all()]
+
+
+async def sync_tasks_tags(db: AsyncSession, tasks: Sequence[models.Task]) -> None:
+    """
+    Строки task_tags по текущим tags задач (после flush, когда известны id): старые
+    удаляются одним DELETE, новые вставляются одним executemany.
+    """
+    if not tasks:
+        return
+    await db.execute(delete(models.TaskTag).where(models.TaskTag.task_id.in_([task.id for task in tasks])))
+    rows = []
+    for task in tasks:
+        keys: dict[str, str] = {}
+        for tag in task.tags or ():
+            if isinstance(tag, str) and tag.strip():
+                keys.setdefault(tag_key(tag), tag)
+        rows += [
+            {"task_id": task.id, "key": key, "tag": tag, "owner_id": task.owner_id, "family_id": task.family_id}
+            for key, tag in keys.items()
+        ]
+    if rows:
+        await db.execute(insert(models.TaskTag), rows)
+
+
+# Поля, которые меняет PATCH /tasks/{id} (владелец, область и семья задачи не меняются)
+TASK_UPDATE_FIELDS = (
+    "title", "description", "date", "start_time", "end_time",
+    "tags", "color", "notify_before_days", "notify_before_hours",
+)
+
+
+def _new_task(owner_id: int, payload: schemas.TaskCreate) -> models.Task:
+    """Объект новой задачи без change_seq; ValueError при неизвестной области."""
+    scope = models.TaskScope(payload.scope)
     task = models.Task(
         owner_id=owner_id,
-        family_id=payload.family_id if payload.scope == "family" else None,
+        family_id=payload.family_id if scope == models.TaskScope.family else None,
         title=payload.title,
         description=payload.description,
         date=payload.date,
         start_time=payload.start_time,
         end_time=payload.end_time,
-        scope=models.TaskScope(payload.scope),
+        scope=scope,
         tags=payload.tags,
         color=payload.color,
         notify_before_days=payload.notify_before_days,
         notify_before_hours=payload.notify_before_hours,
+        rrule=payload.rrule,
+        updated_at=datetime.now(),
     )
-    db.add(task)
-    
-    # Асинхронный commit
-    await db.commit()
-    await db.refresh(task)
+    _sync_recurrence(task)
     return task
 
 
-async def update_task(
+def _sync_recurrence(task: models.Task) -> None:
+    """recurrence_end по правилу и первому вхождению серии; у задачи без правила полей серии нет."""
+    if task.rrule:
+        task.recurrence_end = recurrence.series_end(task.date, recurrence.parse(task.rrule))
+    else:
+        task.rrule = task.exdates = task.recurrence_end = None
+
+
+async def _get_task_for_write(
     db: AsyncSession,
     user_id: int,
     task_id: int,
-    payload: schemas.TaskUpdate,
+    member_family_ids: Optional[Container[int]],
 ) -> models.Task:
-    """Обновление задачи (в том числе смена даты для канбана)."""
+    """Задача для изменения: ValueError, если её нет, PermissionError — если нет прав."""
     task = await db.get(models.Task, task_id)
     if not task:
         raise ValueError("Task not found")
@@ -335,15 +1129,72 @@ async def update_task(
         if task.owner_id != user_id:
             raise PermissionError("Forbidden")
     elif task.scope == models.TaskScope.family:
-        if not task.family_id or not await is_member(db, user_id, task.family_id):
+        if not task.family_id or not await _can_access_family(db, user_id, task.family_id, member_family_ids):
             raise PermissionError("Forbidden")
+    return task
 
-    for field in ["title", "description", "date", "start_time", "end_time", "tags", "color", "notify_before_days", "notify_before_hours"]:
-        value = getattr(payload, field)
-        if value is not None:
-            setattr(task, field, value)
 
-    await db.commit()
+async def _finish_write(db: AsyncSession, commit: bool) -> None:
+    """
+    Завершение изменения задач. С commit=False изменения только отправляются в БД (flush):
+    вызывающий фиксирует их одной транзакцией вместе с уведомлением (jobs.enqueue) и
+    событием потока (realtime.publish), как jobs.enqueue(commit=False).
+    """
+    if commit:
+        await db.commit()
+    else:
+        await db.flush()
+
+
+async def create_task(
+    db: AsyncSession,
+    owner_id: int,
+    payload: schemas.TaskCreate,
+    member_family_ids: Optional[Container[int]] = None,
+    commit: bool = True,
+) -> models.Task:
+    """
+    Асинхронное создание новой задачи.
+    PermissionError, если семейная задача создаётся в недоступной пользователю семье.
+    """
+    task = _new_task(owner_id, payload)
+    if task.scope == models.TaskScope.family and (
+        not task.family_id or not await _can_access_family(db, owner_id, task.family_id, member_family_ids)
+    ):
+        raise PermissionError("Forbidden")
+    task.change_seq = await bump_task_version(db, owner_id, task.family_id)
+    db.add(task)
+    await db.flush()
+    await sync_task_reminders(db, task)
+    await sync_tasks_tags(db, [task])
+    
+    # Асинхронный commit
+    await _finish_write(db, commit)
+    await db.refresh(task)
+    return task
+
+
+async def update_task(
+    db: AsyncSession,
+    user_id: int,
+    task_id: int,
+    payload: schemas.TaskUpdate,
+    member_family_ids: Optional[Container[int]] = None,
+    commit: bool = True,
+) -> models.Task:
+    """
+    Обновление задачи (в том числе смена даты для канбана).
+    Для серии изменения относятся ко всей серии; date — её первое вхождение.
+    """
+    task = await _get_task_for_write(db, user_id, task_id, member_family_ids)
+    _apply_task_update(task, payload)
+
+    await sync_task_reminders(db, task)
+    if payload.tags is not None:
+        await sync_tasks_tags(db, [task])
+    task.change_seq = await bump_task_version(db, task.owner_id, task.family_id)
+    task.updated_at = datetime.now()
+    await _finish_write(db, commit)
     await db.refresh(task)
     return task
 
@@ -352,18 +1203,570 @@ async def delete_task(
     db: AsyncSession,
     user_id: int,
     task_id: int,
+    member_family_ids: Optional[Container[int]] = None,
+    commit: bool = True,
 ) -> None:
-    """Удаление задачи с проверкой прав."""
-    task = await db.get(models.Task, task_id)
-    if not task:
-        raise ValueError("Task not found")
+    """Удаление задачи с проверкой прав; у серии удаляются и изменённые вхождения."""
+    task = await _get_task_for_write(db, user_id, task_id, member_family_ids)
+    doomed = [task, *(await db.scalars(select(models.Task).where(models.Task.series_id == task.id)))]
+    doomed_ids = [t.id for t in doomed]
+
+    await db.execute(delete(models.NotificationOutbox).where(models.NotificationOutbox.task_id.in_(doomed_ids)))
+    await db.execute(delete(models.TaskTag).where(models.TaskTag.task_id.in_(doomed_ids)))
+    version = await bump_task_version(db, task.owner_id, task.family_id)
+    now = datetime.now()
+    for doomed_task in doomed:
+        db.add(models.TaskTombstone(
+            task_id=doomed_task.id,
+            owner_id=doomed_task.owner_id,
+            family_id=doomed_task.family_id,
+            change_seq=version,
+            deleted_at=now,
+        ))
+        await db.delete(doomed_task)
+    await _finish_write(db, commit)
+
+
+async def _get_series_occurrence(
+    db: AsyncSession,
+    user_id: int,
+    task_id: int,
+    occurrence_date: date,
+    member_family_ids: Optional[Container[int]],
+) -> models.Task:
+    """Серия с проверкой прав и того, что occurrence_date — её неисключённое вхождение."""
+    task = await _get_task_for_write(db, user_id, task_id, member_family_ids)
+    if not task.rrule:
+        raise ValueError("Task is not recurring")
+    if occurrence_date in _exdates(task.exdates) or not recurrence.is_occurrence(
+        task.date, recurrence.parse(task.rrule), occurrence_date
+    ):
+        raise ValueError("Occurrence not found")
+    return task
+
+
+def _exclude_occurrence(series: models.Task, occurrence_date: date) -> None:
+    series.exdates = sorted({*(series.exdates or ()), occurrence_date.isoformat()})
+
+
+async def override_occurrence(
+    db: AsyncSession,
+    user_id: int,
+    task_id: int,
+    occurrence_date: date,
+    payload: schemas.TaskUpdate,
+    member_family_ids: Optional[Container[int]] = None,
+    commit: bool = True,
+) -> models.Task:
+    """
+    Изменение одного вхождения серии: вхождение исключается из серии и заменяется
+    обычной задачей (series_id, occurrence_date) с полями серии и изменениями из payload.
+    Дальше это вхождение меняют и удаляют как обычную задачу.
+    """
+    series = await _get_series_occurrence(db, user_id, task_id, occurrence_date, member_family_ids)
+    now = datetime.now()
+    override = models.Task(
+        owner_id=series.owner_id,
+        family_id=series.family_id,
+        scope=series.scope,
+        date=occurrence_date,
+        series_id=series.id,
+        occurrence_date=occurrence_date,
+        updated_at=now,
+        **{field: getattr(series, field) for field in TASK_UPDATE_FIELDS if field != "date"},
+    )
+    # Правило повторения у изменённого вхождения не меняется: оно часть серии
+    _apply_task_update(override, payload.model_copy(update={"rrule": None}))
+    _exclude_occurrence(series, occurrence_date)
+    series.updated_at = now
+    series.change_seq = override.change_seq = await bump_task_version(db, series.owner_id, series.family_id)
+    db.add(override)
+    await db.flush()
+    await sync_tasks_reminders(db, [series, override])
+    await sync_tasks_tags(db, [override])
+    await _finish_write(db, commit)
+    return override
+
+
+async def delete_occurrence(
+    db: AsyncSession,
+    user_id: int,
+    task_id: int,
+    occurrence_date: date,
+    member_family_ids: Optional[Container[int]] = None,
+    commit: bool = True,
+) -> models.Task:
+    """Удаление одного вхождения серии (EXDATE). Возвращает серию."""
+    series = await _get_series_occurrence(db, user_id, task_id, occurrence_date, member_family_ids)
+    _exclude_occurrence(series, occurrence_date)
+    series.updated_at = datetime.now()
+    series.change_seq = await bump_task_version(db, series.owner_id, series.family_id)
+    await sync_task_reminders(db, series)
+    await _finish_write(db, commit)
+    return series
+
+
+def _apply_task_update(task: models.Task, payload: schemas.TaskUpdate) -> None:
+    for field in TASK_UPDATE_FIELDS:
+        value = getattr(payload, field)
+        if value is not None:
+            setattr(task, field, value)
+    if payload.rrule is not None:
+        task.rrule = payload.rrule or None
+    _sync_recurrence(task)
+
+
+def _task_source(task: models.Task) -> tuple[Optional[int], Optional[int]]:
+    """(owner_id, family_id) источника задачи в форме аргументов bump_task_version."""
+    return (None, task.family_id) if task.family_id is not None else (task.owner_id, None)
+
+
+class TaskBatchOutcome(NamedTuple):
+    results: list[schemas.TaskBatchResult]  # В порядке операций
+    applied: list[tuple[str, models.Task]]  # ("created" | "updated" | "deleted", задача) применённых операций
+
+
+async def apply_task_batch(
+    db: AsyncSession,
+    user_id: int,
+    operations: Sequence[schemas.TaskBatchOperation],
+    member_family_ids: Optional[Container[int]] = None,
+    atomic: bool = False,
+    commit: bool = True,
+) -> TaskBatchOutcome:
+    """
+    Пакет операций create/update/delete (POST /tasks/batch) в одной транзакции.
+
+    Права проверяются для всего набора сразу: целевые задачи загружаются одним запросом,
+    членство в затронутых семьях, которых нет в правах токена, — ещё одним. Операции
+    выполняются по порядку; ошибочные (403/404/422) пропускаются и попадают в результаты,
+    с atomic=True любая ошибка отменяет весь пакет. Новые задачи вставляются пачкой,
+    изменения пишутся одним executemany, версия каждого источника повышается один раз.
+    """
+    target_ids = {operation.id for operation in operations if operation.op != "create"}
+    tasks: dict[int, models.Task] = {}
+    if target_ids:
+        result = await db.scalars(select(models.Task).where(models.Task.id.in_(target_ids)))
+        tasks = {task.id: task for task in result}
+
+    family_ids = {task.family_id for task in tasks.values() if task.family_id is not None}
+    family_ids.update(
+        operation.family_id for operation in operations
+        if operation.op == "create" and operation.scope == "family" and operation.family_id is not None
+    )
+    allowed = await _accessible_families(db, user_id, family_ids, member_family_ids)
+
+    def can_write(scope: models.TaskScope, owner_id: int, family_id: Optional[int]) -> bool:
+        if scope == models.TaskScope.personal:
+            return owner_id == user_id
+        return family_id is not None and family_id in allowed
+
+    now = datetime.now()
+    # (op, status, задача или id, ошибка) — задачи сериализуются после flush, когда известны id
+    outcomes: list[tuple[str, int, object, Optional[str]]] = []
+    applied: list[tuple[str, models.Task]] = []
+    deleted: dict[int, models.Task] = {}
+    for operation in operations:
+        if operation.op == "create":
+            try:
+                task = _new_task(user_id, operation)
+            except ValueError:
+                outcomes.append(("create", 422, None, "Invalid scope"))
+                continue
+            if not can_write(task.scope, user_id, task.family_id):
+                outcomes.append(("create", 403, None, "Forbidden"))
+                continue
+            applied.append(("created", task))
+            outcomes.append(("create", 201, task, None))
+            continue
+
+        task = tasks.get(operation.id)
+        if task is None or task.id in deleted:
+            outcomes.append((operation.op, 404, operation.id, "Task not found"))
+        elif not can_write(task.scope, task.owner_id, task.family_id):
+            outcomes.append((operation.op, 403, operation.id, "Forbidden"))
+        elif operation.op == "update":
+            _apply_task_update(task, operation)
+            task.updated_at = now
+            applied.append(("updated", task))
+            outcomes.append(("update", 200, task, None))
+        else:
+            deleted[task.id] = task
+            applied.append(("deleted", task))
+            outcomes.append(("delete", 204, task.id, None))
+
+    if atomic and any(error for _, _, _, error in outcomes):
+        await db.rollback()
+        results = [
+            schemas.TaskBatchResult(
+                op=op, status=status if error else 424,
+                id=target if isinstance(target, int) else None,
+                error=error or "Not applied",
+            )
+            for op, status, target, error in outcomes
+        ]
+        return TaskBatchOutcome(results, [])
+
+    if deleted:
+        # Изменённые вхождения удаляемых серий удаляются вместе с ними
+        result = await db.scalars(select(models.Task).where(
+            models.Task.series_id.in_(list(deleted)), models.Task.id.not_in(list(deleted))
+        ))
+        deleted.update((task.id, task) for task in result)
+
+    if applied:
+        # Строки источников блокируются до commit; единый порядок исключает взаимные блокировки пакетов
+        sources = sorted({_task_source(task) for _, task in applied}, key=lambda source: (source[0] or 0, source[1] or 0))
+        versions = {source: await bump_task_version(db, *source) for source in sources}
+        for task in deleted.values():
+            db.expunge(task)
+        written = {id(task): task for action, task in applied if action != "deleted" and task.id not in deleted}
+        for task in written.values():
+            task.change_seq = versions[_task_source(task)]
+        db.add_all(task for action, task in applied if action == "created")
+        await db.flush()
+        await sync_tasks_reminders(db, list(written.values()))
+        await sync_tasks_tags(db, list(written.values()))
+
+        if deleted:
+            await db.execute(
+                delete(models.NotificationOutbox).where(models.NotificationOutbox.task_id.in_(list(deleted)))
+            )
+            await db.execute(delete(models.TaskTag).where(models.TaskTag.task_id.in_(list(deleted))))
+            await db.execute(insert(models.TaskTombstone), [
+                {
+                    "task_id": task.id,
+                    "owner_id": task.owner_id,
+                    "family_id": task.family_id,
+                    "change_seq": versions[_task_source(task)],
+                    "deleted_at": now,
+                }
+                for task in deleted.values()
+            ])
+            await db.execute(delete(models.Task).where(models.Task.id.in_(list(deleted))))
+        await _finish_write(db, commit)
+
+    results = []
+    for op, status, target, error in outcomes:
+        if isinstance(target, models.Task):
+            results.append(schemas.TaskBatchResult(
+                op=op, status=status, id=target.id, task=schemas.TaskRead.model_validate(target),
+            ))
+        else:
+            results.append(schemas.TaskBatchResult(op=op, status=status, id=target, error=error))
+    return TaskBatchOutcome(results, applied)
+
+
+def _insert_skipping_duplicates(db: AsyncSession, table):
+    """INSERT ... ON CONFLICT DO NOTHING диалекта сессии (PostgreSQL или SQLite)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql_insert(table).on_conflict_do_nothing()
+    return sqlite_insert(table).on_conflict_do_nothing()
+
+
+async def import_tasks(
+    db: AsyncSession,
+    user_id: int,
+    events: AsyncIterable[Optional[ical.Event]],
+    family_id: Optional[int] = None,
+    member_family_ids: Optional[Container[int]] = None,
+    batch_size: int = 1000,
+) -> schemas.TaskImportResult:
+    """
+    Импорт событий .ics (POST /tasks/import) в личные задачи пользователя или в семью family_id.
+
+    События вставляются пачками по batch_size: многострочный INSERT ... ON CONFLICT DO NOTHING
+    по уникальному UID в источнике (повторный импорт того же файла ничего не дублирует),
+    теги — одним executemany, версия источника повышается раз на пачку. Каждая пачка — своя
+    транзакция, поэтому ни файл, ни задачи не накапливаются в памяти, а после сбоя импорт
+    можно просто повторить. Изменённые вхождения серий (RECURRENCE-ID) откладываются до конца
+    файла, когда их серии уже вставлены. Напоминаний у импортированных задач нет.
+    PermissionError, если семья недоступна.
+    """
+    if family_id is not None and not await _can_access_family(db, user_id, family_id, member_family_ids):
+        raise PermissionError("Forbidden")
+    outcome = schemas.TaskImportResult()
+    batch: list[ical.Event] = []
+    overrides: list[ical.Event] = []
+    async for event in events:
+        if event is None:
+            outcome.invalid += 1
+            continue
+        outcome.rrule_dropped += event.rrule_dropped
+        (overrides if event.series_uid else batch).append(event)
+        if len(batch) >= batch_size:
+            await _import_batch(db, user_id, family_id, batch, outcome)
+            batch = []
+    if batch:
+        await _import_batch(db, user_id, family_id, batch, outcome)
+    for start in range(0, len(overrides), batch_size):
+        await _import_batch(db, user_id, family_id, overrides[start:start + batch_size], outcome)
+    return outcome
+
+
+async def _import_batch(
+    db: AsyncSession,
+    user_id: int,
+    family_id: Optional[int],
+    events: Sequence[ical.Event],
+    outcome: schemas.TaskImportResult,
+) -> None:
+    """Пачка import_tasks одной транзакцией; счётчики копятся в outcome."""
+    Task = models.Task
+    source = Task.family_id == family_id if family_id is not None else and_(
+        Task.owner_id == user_id, Task.family_id.is_(None)
+    )
+    # Свои задачи приложения (UID "<id>@tgcalendar" из GET /tasks/export.ics) уже есть в источнике
+    own_ids = {task_id for event in events if event.uid and (task_id := ical.own_task_id(event.uid)) is not None}
+    existing = set(await db.scalars(select(Task.id).where(Task.id.in_(own_ids), source))) if own_ids else set()
+    series: dict[str, models.Task] = {}
+    series_uids = {event.series_uid for event in events if event.series_uid}
+    if series_uids:
+        result = await db.scalars(select(Task).where(source, Task.external_uid.in_(series_uids), Task.rrule.is_not(None)))
+        series = {task.external_uid: task for task in result}
+
+    change_seq = await bump_task_version(db, user_id, family_id)
+    now = datetime.now()
+    seen: set[str] = set()
+    values = []
+    for event in events:
+        if event.uid and (event.uid in seen or ical.own_task_id(event.uid) in existing):
+            outcome.duplicates += 1
+            continue
+        if event.uid:
+            seen.add(event.uid)
+        parent = series.get(event.series_uid) if event.series_uid else None
+        values.append({
+            "owner_id": user_id,
+            "family_id": family_id,
+            "scope": models.TaskScope.family if family_id is not None else models.TaskScope.personal,
+            "title": event.title,
+            "description": event.description,
+            "date": event.date,
+            "start_time": event.start_time,
+            "end_time": event.end_time,
+            "tags": event.tags,
+            "color": event.color,
+            "rrule": event.rrule,
+            "exdates": event.exdates,
+            "recurrence_end": recurrence.series_end(event.date, recurrence.parse(event.rrule)) if event.rrule else None,
+            "series_id": parent.id if parent is not None else None,
+            "occurrence_date": event.recurrence_id if parent is not None else None,
+            "external_uid": event.uid,
+            "change_seq": change_seq,
+            "updated_at": now,
+        })
+    if not values:
+        await db.rollback()
+        return
+
+    stmt = _insert_skipping_duplicates(db, Task.__table__).returning(
+        Task.id, Task.owner_id, Task.family_id, Task.tags, Task.series_id, Task.occurrence_date,
+    )
+    inserted = (await db.execute(stmt, values)).all()
+    outcome.imported += len(inserted)
+    outcome.duplicates += len(values) - len(inserted)
+    await sync_tasks_tags(db, inserted)
+
+    # Вхождение, заменённое импортированным изменением, исключается из серии (как в override_occurrence)
+    by_id = {task.id: task for task in series.values()}
+    for row in inserted:
+        if row.series_id is not None:
+            parent = by_id[row.series_id]
+            parent.exdates = sorted(set(parent.exdates or ()) | {row.occurrence_date.isoformat()})
+            parent.change_seq = change_seq
+            parent.updated_at = now
+    await db.commit()
+
+
+async def list_task_changes(
+    db: AsyncSession,
+    user_id: int,
+    since: TasksStamp,
+    current: TasksStamp,
+) -> tuple[Sequence[Row], list[int]]:
+    """
+    Задачи, изменённые и удалённые после штампа since, для источников из текущего штампа.
+
+    Источники, версия которых не изменилась, не запрашиваются; для остальных — выборка по
+    индексам (источник, change_seq) двумя запросами. Возвращает строки TASK_READ_COLUMNS
+    и id удалённых задач.
+    """
+    known = dict(since.families)
+    families = [
+        (family_id, known.get(family_id, 0))
+        for family_id, version in current.families
+        if version != known.get(family_id)
+    ]
+    personal = current.personal_version is not None and current.personal_version != since.personal_version
+
+    def changed_since(entity):
+        conditions = [
+            and_(entity.family_id == family_id, entity.change_seq > version)
+            for family_id, version in families
+        ]
+        if personal:
+            conditions.append(and_(
+                entity.owner_id == user_id,
+                entity.family_id.is_(None),
+                entity.change_seq > (since.personal_version or 0),
+            ))
+        return or_(*conditions)
+
+    if not families and not personal:
+        return [], []
+    rows = (await db.execute(select(*TASK_READ_COLUMNS).where(changed_since(models.Task)))).all()
+    deleted = await db.scalars(select(models.TaskTombstone.task_id).where(changed_since(models.TaskTombstone)))
+    return rows, list(deleted)
+
+
+async def prune_task_tombstones(db: AsyncSession, older_than: datetime) -> int:
+    """Удаление следов задач, удалённых раньше older_than."""
+    result = await db.execute(delete(models.TaskTombstone).where(models.TaskTombstone.deleted_at < older_than))
+    await db.commit()
+    return result.rowcount
+
+
+# ----------------------------------------------------------------------
+# REMINDER FUNCTIONS
+# ----------------------------------------------------------------------
+
+# Время, от которого считаются напоминания для задач без времени начала
+DEFAULT_REMINDER_TIME = time(9, 0)
+
+
+def reminder_due_times(
+    task_date: date,
+    start_time: Optional[time],
+    notify_before_days: Optional[int],
+    notify_before_hours: Optional[int],
+    now: Optional[datetime] = None,
+) -> dict[str, datetime]:
+    """
+    Вычисление моментов отправки напоминаний задачи: {"days": ..., "hours": ...}.
+
+    Напоминание за N дней приходит в то же время суток, что и начало задачи, за N часов — за N часов
+    до начала. Для уже начавшихся задач напоминаний нет; прошедшие моменты не сдвигаются.
+    """
+    now = now or datetime.now()
+    starts_at = datetime.combine(task_date, start_time or DEFAULT_REMINDER_TIME)
+    if starts_at <= now:
+        return {}
+
+    due: dict[str, datetime] = {}
+    if notify_before_days:
+        due["days"] = starts_at - timedelta(days=notify_before_days)
+    if notify_before_hours:
+        due["hours"] = starts_at - timedelta(hours=notify_before_hours)
+    return due
+
+
+async def sync_task_reminders(db: AsyncSession, task: models.Task) -> None:
+    """
+    Приведение строк notification_outbox задачи в соответствие с её датой и настройками.
+    Не коммитит: вызывается в транзакции изменения задачи.
+    """
+    result = await db.execute(
+        select(models.NotificationOutbox).where(models.NotificationOutbox.task_id == task.id)
+    )
+    existing = {row.kind: row for row in result.scalars().all()}
+    await _apply_task_reminders(db, task, existing, datetime.now())
+
+
+async def sync_tasks_reminders(db: AsyncSession, tasks: Sequence[models.Task]) -> None:
+    """То же для пачки задач: строки notification_outbox читаются одним запросом."""
+    if not tasks:
+        return
+    existing: dict[int, dict[str, models.NotificationOutbox]] = {task.id: {} for task in tasks}
+    result = await db.scalars(
+        select(models.NotificationOutbox).where(models.NotificationOutbox.task_id.in_(list(existing)))
+    )
+    for row in result:
+        existing[row.task_id][row.kind] = row
+    now = datetime.now()
+    for task in tasks:
+        await _apply_task_reminders(db, task, existing[task.id], now)
+
+
+async def _apply_task_reminders(
+    db: AsyncSession,
+    task: models.Task,
+    existing: dict[str, models.NotificationOutbox],
+    now: datetime,
+) -> None:
+    if task.rrule:
+        desired = series_reminder_due_times(task, now)
+    else:
+        desired = {
+            kind: (due_at, None)
+            for kind, due_at in reminder_due_times(
+                task.date, task.start_time, task.notify_before_days, task.notify_before_hours, now=now
+            ).items()
+        }
+
+    for kind, row in existing.items():
+        due_at, occurrence_date = desired.get(kind, (None, None))
+        if due_at is None:
+            await db.delete(row)
+        elif row.occurrence_date != occurrence_date:
+            # Напоминание о другом вхождении серии (или задача стала/перестала быть серией)
+            row.due_at = max(due_at, now)
+            row.sent_at = None
+            row.occurrence_date = occurrence_date
+        elif row.sent_at is None:
+            # Опоздавшее напоминание отправляем сразу, пока задача не началась
+            row.due_at = max(due_at, now)
+        elif due_at > row.sent_at:
+            # Задачу перенесли на более позднее время — напоминание нужно отправить ещё раз
+            row.due_at = due_at
+            row.sent_at = None
+
+    for kind, (due_at, occurrence_date) in desired.items():
+        if kind not in existing:
+            db.add(models.NotificationOutbox(
+                task_id=task.id, kind=kind, due_at=max(due_at, now), occurrence_date=occurrence_date,
+            ))
+
+
+def series_reminder_due_times(
+    task: models.Task,
+    now: datetime,
+    after: Optional[date] = None,
+) -> dict[str, tuple[datetime, date]]:
+    """
+    Напоминания серии: для каждого вида — ближайшее вхождение (позже after), напоминание
+    о котором ещё не наступило, и момент отправки. Вхождение находится арифметически
+    (app.recurrence), без перебора прошедших; пропущенные напоминания не догоняются.
+    """
+    rule = recurrence.parse(task.rrule)
+    starts_at = task.start_time or DEFAULT_REMINDER_TIME
+    exdates = _exdates(task.exdates)
+    due: dict[str, tuple[datetime, date]] = {}
+    for kind, lead in (
+        ("days", timedelta(days=task.notify_before_days or 0)),
+        ("hours", timedelta(hours=task.notify_before_hours or 0)),
+    ):
+        if not lead:
+            continue
+        # Первый день, начало которого не раньше now + lead
+        threshold = now + lead
+        first_day = threshold.date() if starts_at >= threshold.time() else threshold.date() + timedelta(days=1)
+        if after is not None:
+            first_day = max(first_day, after + timedelta(days=1))
+        day = next(recurrence.occurrences(task.date, rule, first_day, date.max, exdates), None)
+        if day is not None:
+            due[kind] = (datetime.combine(day, starts_at) - lead, day)
+    return due
 
-    if task.scope == models.TaskScope.personal:
-        if task.owner_id != user_id:
-            raise PermissionError("Forbidden")
-    elif task.scope == models.TaskScope.family:
-        if not task.family_id or not await is_member(db, user_id, task.family_id):
-            raise PermissionError("Forbidden")
 
-    await db.delete(task)
-    await db.commit()
\ No newline at end of file
+def advance_series_reminder(outbox: models.NotificationOutbox, task: models.Task, now: datetime) -> bool:
+    """
+    Перевод наступившего напоминания серии на следующее вхождение (вызывает планировщик
+    вместо пометки sent_at). False — следующих вхождений нет.
+    """
+    after = outbox.occurrence_date or task.date
+    following = series_reminder_due_times(task, now, after=after).get(outbox.kind)
+    if following is None:
+        return False
+    outbox.due_at, outbox.occurrence_date = following
+    return True
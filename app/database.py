@@ -1,6 +1,12 @@
+import time
+from functools import lru_cache
+from typing import Any
+from uuid import uuid4
+
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import get_settings
 
@@ -19,33 +25,144 @@ ASYNC_DATABASE_URL = settings.database_url.replace(
     "postgresql://", "postgresql+asyncpg://"
 )
 
+
+class PoolWaitStats:
+    """Время ожидания свободного соединения при checkout из пула."""
+
+    def __init__(self, slow_threshold_ms: float):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.checkouts = 0
+        self.slow_checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        if wait >= self.slow_threshold:
+            self.slow_checkouts += 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "slow_checkouts": self.slow_checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+pool_wait_stats = PoolWaitStats(settings.db_slow_checkout_ms)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул async-движка, измеряющий ожидание соединения (в т.ч. открытие нового)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_wait_stats.timeouts += 1
+            raise
+        pool_wait_stats.record(time.perf_counter() - started)
+        return connection
+
+
+def _pool_options() -> dict[str, Any]:
+    if settings.database_url.startswith("sqlite"):
+        # SQLite (разработка) — пул по умолчанию
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _asyncpg_connect_args() -> dict[str, Any]:
+    if not ASYNC_DATABASE_URL.startswith("postgresql+asyncpg"):
+        return {}
+    if settings.db_pgbouncer_transaction_mode:
+        # В transaction mode pgbouncer каждая транзакция может попасть на другое серверное
+        # соединение, поэтому именованные prepared statements между запросами не переживают
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+    }
+
+
 # 3. Создание асинхронного движка (Engine)
 # 'future=True' не требуется для async_engine, т.к. он всегда "future"
+_async_pool_options = _pool_options()
 engine = create_async_engine(
     ASYNC_DATABASE_URL,
-    echo=False
+    echo=False,
+    connect_args=_asyncpg_connect_args(),
+    **({"poolclass": TimedQueuePool, **_async_pool_options} if _async_pool_options else {}),
 )
 
 # 4. Создание асинхронной фабрики сессий
 AsyncSessionLocal = async_sessionmaker(
-    bind=engine, 
-    autoflush=False, 
-    autocommit=False, 
+    bind=engine,
+    autoflush=False,
+    autocommit=False,
     expire_on_commit=False # Рекомендуется для AsyncSession
 )
 
-# 5. Создание синхронного движка для бота (использует синхронные операции)
+
+def pool_status() -> dict[str, Any]:
+    """Состояние пула async-движка для /health."""
+    pool = engine.pool
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            idle=pool.checkedin(),
+        )
+    status.update(pool_wait_stats.stats())
+    return status
+
+
+# 5. Синхронный движок создаётся только при первом обращении
+# (приложение и бот работают через async-движок)
 SYNC_DATABASE_URL = settings.database_url
-sync_engine = create_engine(SYNC_DATABASE_URL, echo=False)
 
-# 6. Создание синхронной фабрики сессий для бота
-SessionLocal = sessionmaker(bind=sync_engine, autocommit=False, autoflush=False)
+
+@lru_cache
+def get_sync_engine():
+    return create_engine(SYNC_DATABASE_URL, echo=False, **_pool_options())
+
+
+@lru_cache
+def get_sync_sessionmaker() -> sessionmaker:
+    return sessionmaker(bind=get_sync_engine(), autocommit=False, autoflush=False)
+
+
+def __getattr__(name: str):
+    # Совместимость со старыми импортами: from app.database import sync_engine, SessionLocal
+    if name == "sync_engine":
+        return get_sync_engine()
+    if name == "SessionLocal":
+        return get_sync_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-# 5. Асинхронный генератор зависимостей (Dependency)
+# 6. Асинхронный генератор зависимостей (Dependency)
 async def get_async_db():
     """
     Асинхронный генератор для получения сессии базы данных FastAPI.
     """
     async with AsyncSessionLocal() as db:
-        yield db
\ No newline at end of file
+        yield db
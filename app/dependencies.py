@@ -1,12 +1,27 @@
 from __future__ import annotations
 
+import hashlib
+
 from fastapi import Depends, Header, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession # <-- Используем АСИНХРОННУЮ сессию
 
 from app import crud, schemas
-from app.auth import verify_session_token
+from app.auth import decode_session_token, token_claims
+from app.cache import TTLCache
+from app.config import get_settings
 from app.database import get_async_db # <-- Используем АСИНХРОННЫЙ генератор зависимостей
 
+_settings = get_settings()
+
+# Кэш проверенных токенов: sha256(token) -> CurrentUser.
+# Профиль пользователя upsert-ится только при промахе, т.е. один раз за сессию на воркер.
+# TTL также ограничивает, как долго другой воркер может видеть устаревшие права в семьях при чтении;
+# запись сверяет эпоху членства с БД (verified_family_roles).
+session_cache: TTLCache[schemas.CurrentUser] = TTLCache(
+    max_size=_settings.session_cache_max_size,
+    ttl=_settings.session_cache_ttl_seconds,
+)
+
 
 def _ensure_token(auth_header: str | None) -> str:
     """Извлекает Bearer токен из заголовка Authorization."""
@@ -15,35 +30,80 @@ def _ensure_token(auth_header: str | None) -> str:
     return auth_header.split(" ", 1)[1].strip()
 
 
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def invalidate_user_sessions(user_id: int) -> int:
+    """Сброс закэшированных сессий пользователя (после изменения его данных)."""
+    return session_cache.discard_where(lambda _, user: user.id == user_id)
+
+
+async def verified_family_roles(db: AsyncSession, current_user: schemas.CurrentUser) -> dict[int, str] | None:
+    """
+    Права из сессии для операций записи: только если эпоха членства в БД не изменилась.
+    Закэшированная сессия на другом воркере не узнаёт о блокировке или удалении из семьи
+    до истечения TTL, поэтому запись сверяет эпоху одним запросом по первичному ключу.
+    При расхождении возвращает None (доступ проверяется по БД) и сбрасывает устаревшие сессии.
+    """
+    epoch = await crud.get_membership_epoch(db, current_user.id)
+    if epoch == current_user.membership_epoch:
+        return current_user.family_roles
+    invalidate_user_sessions(current_user.id)
+    return None
+
+
+def _build_current_user(user, claims: schemas.MembershipClaims) -> schemas.CurrentUser:
+    return schemas.CurrentUser(
+        **schemas.UserRead.model_validate(user).model_dump(),
+        family_roles=claims.families,
+        membership_epoch=claims.epoch,
+    )
+
+
 async def get_current_user(
     db: AsyncSession = Depends(get_async_db),
     authorization: str | None = Header(default=None, convert_underscores=False, alias="Authorization"),
     x_debug_user_id: int | None = Header(default=None),
-) -> schemas.UserRead:
-    
+) -> schemas.CurrentUser:
+
     # Debug режим только в development
-    from app.config import get_settings
     settings = get_settings()
-    
+
     if x_debug_user_id and settings.environment == "development":
         payload = schemas.UserCreate(id=x_debug_user_id, first_name="Debug", last_name=None, username="debug")
         user = await crud.create_or_update_user(db, payload)
-        return schemas.UserRead.model_validate(user)
+        claims = await crud.get_membership_claims(db, user.id)
+        return _build_current_user(user, claims)
 
     token = _ensure_token(authorization)
+    cache_key = _token_digest(token)
+    cached = session_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        tg_user = verify_session_token(token) 
-    except Exception as exc: 
+        token_data, remaining = decode_session_token(token)
+    except Exception as exc:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session token") from exc
 
+    tg_user = token_data["tg_user"]
     payload = schemas.UserCreate(
         id=tg_user.get("id"),
         first_name=tg_user.get("first_name"),
         last_name=tg_user.get("last_name"),
         username=tg_user.get("username"),
     )
-    
-    # Асинхронный вызов CRUD требует await
+
+    # Запись в БД происходит только если имя/username в Telegram изменились
     user = await crud.create_or_update_user(db, payload)
-    
-    return schemas.UserRead.model_validate(user)
\ No newline at end of file
+
+    # Права из токена действительны, пока эпоха членства не изменилась
+    claims = token_claims(token_data)
+    if claims is None or claims.epoch != user.membership_epoch:
+        claims = await crud.get_membership_claims(db, user.id)
+    current_user = _build_current_user(user, claims)
+
+    # Запись не должна жить дольше самого токена
+    session_cache.set(cache_key, current_user, ttl=remaining)
+    return current_user
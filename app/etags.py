@@ -0,0 +1,48 @@
+"""
+Условные GET-запросы (ETag / If-None-Match).
+
+ETag строится из версии данных, которую можно получить дешевле самого ответа
+(счётчики изменений в users/families), поэтому при совпадении ответ 304 отдаётся
+без выполнения основного запроса.
+"""
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response, status
+
+# Ответы зависят от пользователя: кэшировать можно только в клиенте и только с перепроверкой
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def request_etag(request: Request, user_id: int, stamp: Any) -> str:
+    """ETag ответа: маршрут, параметры запроса, пользователь и версия данных."""
+    return make_etag(request.url.path, sorted(request.query_params.multi_items()), user_id, stamp)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Сравнение слабое (RFC 9110): префикс W/ не учитывается
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Ответ 304, если клиент прислал совпадающий If-None-Match, иначе None."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+        )
+    return None
+
+
+def set_etag(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,378 @@
+"""
+iCalendar (RFC 5545): выгрузка задач в .ics и разбор .ics при импорте.
+
+Выгрузка: задача — VEVENT (серия — одним событием с RRULE и EXDATE, изменённое вхождение —
+отдельным событием), время без часового пояса, как в задачах. События форматируются по
+одному, поэтому файл пишется потоком.
+
+Разбор: iter_events читает файл кусками байт и отдаёт VEVENT по одному, не держа файл
+в памяти. Понимаются SUMMARY, DESCRIPTION, DTSTART, DTEND или DURATION, RRULE (подмножество
+app.recurrence; FREQ=YEARLY — как MONTHLY с INTERVAL=12), EXDATE, CATEGORIES и RECURRENCE-ID;
+отменённые события (STATUS:CANCELLED) и вложенные компоненты (VALARM) пропускаются.
+Время в UTC или с TZID переводится в локальное время сервера (в нём считаются напоминания).
+"""
+from __future__ import annotations
+
+import codecs
+import hashlib
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterable, AsyncIterator, NamedTuple, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from app import recurrence
+
+# UID задач, созданных в приложении: "<id>@tgcalendar"; импортированные сохраняют свой
+UID_DOMAIN = "tgcalendar"
+COLOR_PROPERTY = "X-TGCALENDAR-COLOR"
+CALENDAR_HEADER = (
+    "BEGIN:VCALENDAR\r\n"
+    "VERSION:2.0\r\n"
+    "PRODID:-//TGCalendar//Tasks//RU\r\n"
+    "CALSCALE:GREGORIAN\r\n"
+)
+CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+
+MAX_UID_LENGTH = 255  # tasks.external_uid
+MAX_TITLE_LENGTH = 120  # tasks.title
+MAX_LINE_LENGTH = 1024 * 1024  # Развёрнутая строка содержимого
+UNTITLED = "Без названия"
+
+_COLOR = re.compile(r"^#[0-9A-Fa-f]{6}$")
+_DURATION = re.compile(r"^\+?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+_UNESCAPE = re.compile(r"\\([\\;,nN])")
+_LIST_ITEM = re.compile(r"(?:\\.|[^,\\])+")
+
+
+class Event(NamedTuple):
+    """VEVENT, приведённый к полям задачи."""
+    uid: Optional[str]  # Ключ дубликатов (tasks.external_uid); у вхождения серии — с датой вхождения
+    title: str
+    description: Optional[str]
+    date: date
+    start_time: Optional[time]
+    end_time: Optional[time]
+    tags: Optional[list[str]]
+    color: Optional[str]
+    rrule: Optional[str]  # Нормализованное правило app.recurrence
+    exdates: Optional[list[str]]  # ISO-даты, как tasks.exdates
+    series_uid: Optional[str] = None  # UID серии изменённого вхождения (RECURRENCE-ID)
+    recurrence_id: Optional[date] = None  # Исходная дата изменённого вхождения
+    rrule_dropped: bool = False  # Правило не поддерживается: импортировано только первое вхождение
+
+
+# -----------------------------------------------------------
+# Выгрузка
+# -----------------------------------------------------------
+def task_uid(task_id: int, external_uid: Optional[str]) -> str:
+    return external_uid or f"{task_id}@{UID_DOMAIN}"
+
+
+def own_task_id(uid: str) -> Optional[int]:
+    """id задачи приложения по её UID ("<id>@tgcalendar") или None для чужого UID."""
+    task_id, sep, domain = uid.partition("@")
+    return int(task_id) if sep and domain == UID_DOMAIN and task_id.isdigit() else None
+
+
+def format_stamp(moment: datetime) -> str:
+    """DTSTAMP в UTC; наивное время — локальное время сервера."""
+    return f"{moment.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+
+
+def _escape(value: str) -> str:
+    value = value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+    return value.replace("\r\n", "\\n").replace("\n", "\\n").replace("\r", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Строка содержимого с CRLF, свёрнутая по 75 октетов (RFC 5545, 3.1) без разрыва символов UTF-8."""
+    if len(line) <= 75 and line.isascii():
+        return line + "\r\n"
+    parts, current, size = [], [], 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            parts.append("".join(current))
+            current, size = [], 1  # Строка продолжения начинается с пробела
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _date_time(day: date, moment: Optional[time]) -> str:
+    return f"{day:%Y%m%d}T{moment:%H%M%S}" if moment is not None else f"{day:%Y%m%d}"
+
+
+def format_event(task, default_stamp: str) -> str:
+    """
+    VEVENT задачи (строки TASK_EXPORT_COLUMNS). Задача без времени — событие на весь день;
+    у серии с временем UNTIL и EXDATE записываются датой-временем, как того требует RFC 5545.
+    """
+    timed = task.start_time is not None
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{_escape(task_uid(task.id, task.external_uid))}",
+        f"DTSTAMP:{format_stamp(task.updated_at) if task.updated_at else default_stamp}",
+        f"DTSTART:{_date_time(task.date, task.start_time)}" if timed else f"DTSTART;VALUE=DATE:{task.date:%Y%m%d}",
+    ]
+    if timed and task.end_time is not None:
+        end_day = task.date if task.end_time >= task.start_time else task.date + timedelta(days=1)
+        lines.append(f"DTEND:{_date_time(end_day, task.end_time)}")
+    lines.append(f"SUMMARY:{_escape(task.title)}")
+    if task.description:
+        lines.append(f"DESCRIPTION:{_escape(task.description)}")
+    tags = [tag for tag in task.tags or () if isinstance(tag, str) and tag.strip()]
+    if tags:
+        lines.append("CATEGORIES:" + ",".join(_escape(tag) for tag in tags))
+    if task.color:
+        lines.append(f"{COLOR_PROPERTY}:{task.color}")
+    if task.rrule:
+        rule = re.sub(r"UNTIL=(\d{8})(?=;|$)", r"UNTIL=\1T235959", task.rrule) if timed else task.rrule
+        lines.append(f"RRULE:{rule}")
+        if task.exdates:
+            days = [date.fromisoformat(day) for day in sorted(task.exdates)]
+            values = ",".join(_date_time(day, task.start_time) for day in days)
+            lines.append(f"EXDATE:{values}" if timed else f"EXDATE;VALUE=DATE:{values}")
+    lines.append("END:VEVENT")
+    return "".join(_fold(line) for line in lines)
+
+
+# -----------------------------------------------------------
+# Разбор
+# -----------------------------------------------------------
+async def _content_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Развёрнутые строки содержимого (RFC 5545, 3.1) из потока байт; ValueError для слишком длинной строки."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    current: Optional[str] = None
+    final = False
+    chunks = aiter(chunks)
+    while not final:
+        try:
+            pending += decoder.decode(await anext(chunks))
+        except StopAsyncIteration:
+            pending += decoder.decode(b"", final=True) + "\n"
+            final = True
+        *lines, pending = pending.split("\n")
+        if len(pending) > MAX_LINE_LENGTH:
+            raise ValueError("iCalendar line is too long")
+        for line in lines:
+            line = line.rstrip("\r")
+            if line[:1] in (" ", "\t"):
+                if current is not None:
+                    current += line[1:]
+                    if len(current) > MAX_LINE_LENGTH:
+                        raise ValueError("iCalendar line is too long")
+                continue
+            if current:
+                yield current
+            current = line
+    if current:
+        yield current
+
+
+def _split_line(line: str) -> tuple[str, dict[str, str], str]:
+    """'NAME;PARAM=value:значение' -> (NAME, {PARAM: value}, значение); ValueError без ':'."""
+    if '"' not in line:
+        head, sep, value = line.partition(":")
+        if not sep:
+            raise ValueError("Invalid content line")
+        name, *params = head.split(";")
+    else:
+        # Значения параметров в кавычках могут содержать ':' и ';'
+        quoted, split_at, params, start = False, None, [], 0
+        for index, char in enumerate(line):
+            if char == '"':
+                quoted = not quoted
+            elif not quoted and char in ";:":
+                params.append(line[start:index])
+                start = index + 1
+                if char == ":":
+                    split_at = index
+                    break
+        if split_at is None:
+            raise ValueError("Invalid content line")
+        name, *params = params
+        value = line[split_at + 1:]
+    parsed = {}
+    for param in params:
+        key, _, param_value = param.partition("=")
+        parsed[key.strip().upper()] = param_value.strip().strip('"')
+    return name.strip().upper(), parsed, value
+
+
+async def iter_events(chunks: AsyncIterable[bytes]) -> AsyncIterator[Optional[Event]]:
+    """
+    События файла .ics по одному; None — событие, которое нельзя импортировать (нет
+    DTSTART, неверная дата). ValueError, если поток не начинается с BEGIN:VCALENDAR.
+    """
+    lines = _content_lines(chunks)
+    first = await anext(lines, "")
+    if first.lstrip("\ufeff").strip().upper() != "BEGIN:VCALENDAR":
+        raise ValueError("Not an iCalendar file")
+
+    props: Optional[dict[str, list[tuple[dict[str, str], str]]]] = None
+    depth = 0  # Вложенность компонентов внутри VEVENT (VALARM)
+    broken = False
+    async for line in lines:
+        try:
+            name, params, value = _split_line(line)
+        except ValueError:
+            broken = broken or props is not None
+            continue
+        if name == "BEGIN":
+            if props is not None:
+                depth += 1
+            elif value.strip().upper() == "VEVENT":
+                props, depth, broken = {}, 0, False
+        elif name == "END" and props is not None:
+            if depth:
+                depth -= 1
+            elif value.strip().upper() == "VEVENT":
+                try:
+                    if broken:
+                        raise ValueError("Invalid content line")
+                    event = _event(props)
+                except ValueError:
+                    yield None
+                else:
+                    if event is not None:
+                        yield event
+                props = None
+        elif props is not None and not depth:
+            props.setdefault(name, []).append((params, value))
+
+
+def _unescape(value: str) -> str:
+    return _UNESCAPE.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def _when(params: dict[str, str], value: str) -> tuple[date, Optional[time]]:
+    """Дата и локальное время DATE или DATE-TIME (UTC и TZID переводятся во время сервера)."""
+    value = value.strip()
+    if params.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8])), None
+    moment = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        moment = moment.replace(tzinfo=timezone.utc)
+    elif tzid := params.get("TZID"):
+        try:
+            moment = moment.replace(tzinfo=ZoneInfo(tzid.lstrip("/")))
+        except (ZoneInfoNotFoundError, ValueError):
+            pass  # Неизвестный пояс (например, описанный только в VTIMEZONE): время как есть
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.date(), moment.time()
+
+
+def _duration(value: str) -> timedelta:
+    match = _DURATION.match(value.strip().upper())
+    if not match:
+        raise ValueError("Invalid DURATION")
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def _rrule(value: str, dtstart: date) -> str:
+    """
+    RRULE события в подмножестве app.recurrence; ValueError, если его не выразить.
+    Ежегодное правило на день DTSTART — MONTHLY с INTERVAL=12·n (в т.ч. 29 февраля),
+    BYMONTHDAY, совпадающий с днём DTSTART, и WKST без влияния на правило опускаются.
+    """
+    parts = {}
+    for item in value.strip().upper().removeprefix("RRULE:").split(";"):
+        key, sep, part = item.partition("=")
+        if sep:
+            parts[key] = part
+    if parts.get("FREQ") == "YEARLY":
+        if (parts.pop("BYMONTH", str(dtstart.month)) != str(dtstart.month)
+                or parts.pop("BYMONTHDAY", str(dtstart.day)) != str(dtstart.day)):
+            raise ValueError("Unsupported yearly RRULE")
+        parts["FREQ"] = "MONTHLY"
+        parts["INTERVAL"] = str(12 * int(parts.get("INTERVAL", "1")))
+    elif parts.get("FREQ") == "MONTHLY" and parts.get("BYMONTHDAY") == str(dtstart.day):
+        del parts["BYMONTHDAY"]
+    if "WKST" in parts and (parts.get("INTERVAL", "1") == "1" or "," not in parts.get("BYDAY", "")):
+        del parts["WKST"]
+    return recurrence.normalize(";".join(f"{key}={part}" for key, part in parts.items()))
+
+
+def _external_uid(uid: str) -> str:
+    """UID длиннее колонки заменяется его SHA-1 (дубликаты по нему по-прежнему находятся)."""
+    return uid if len(uid) <= MAX_UID_LENGTH else "sha1:" + hashlib.sha1(uid.encode()).hexdigest()
+
+
+def _event(props: dict[str, list[tuple[dict[str, str], str]]]) -> Optional[Event]:
+    """Event по свойствам VEVENT; None для отменённого события, ValueError для неверного."""
+    def first(name: str) -> Optional[tuple[dict[str, str], str]]:
+        values = props.get(name)
+        return values[0] if values else None
+
+    if (status := first("STATUS")) and status[1].strip().upper() == "CANCELLED":
+        return None
+    dtstart = first("DTSTART")
+    if dtstart is None:
+        raise ValueError("VEVENT without DTSTART")
+    day, start_time = _when(*dtstart)
+
+    end_time = None
+    if start_time is not None:
+        end = None
+        if dtend := first("DTEND"):
+            end_day, end_moment = _when(*dtend)
+            if end_moment is not None:
+                end = datetime.combine(end_day, end_moment)
+        elif duration := first("DURATION"):
+            end = datetime.combine(day, start_time) + _duration(duration[1])
+        # Задача занимает один день: конец сохраняется, если событие короче суток
+        if end is not None and timedelta(0) < end - datetime.combine(day, start_time) < timedelta(days=1):
+            end_time = end.time()
+
+    rrule = exdates = None
+    rrule_dropped = False
+    if rule := first("RRULE"):
+        try:
+            rrule = _rrule(rule[1], day)
+        except ValueError:
+            rrule_dropped = True
+    if rrule:
+        days = {
+            _when(params, item)[0]
+            for params, value in props.get("EXDATE", ())
+            for item in value.split(",") if item.strip()
+        }
+        exdates = sorted(excluded.isoformat() for excluded in days) or None
+
+    tags: dict[str, None] = {}
+    for _, value in props.get("CATEGORIES", ()):
+        for item in _LIST_ITEM.findall(value):
+            if tag := _unescape(item).strip():
+                tags.setdefault(tag)
+
+    uid = series_uid = recurrence_id = None
+    if (raw_uid := first("UID")) and raw_uid[1].strip():
+        uid = raw_uid[1].strip()
+    if uid and (original := first("RECURRENCE-ID")):
+        recurrence_id = _when(*original)[0]
+        series_uid = _external_uid(uid)
+        uid = f"{uid}/{recurrence_id:%Y%m%d}"
+
+    summary = first("SUMMARY")
+    description = first("DESCRIPTION")
+    color = first(COLOR_PROPERTY)
+    return Event(
+        uid=_external_uid(uid) if uid else None,
+        title=(_unescape(summary[1]).strip() if summary else "")[:MAX_TITLE_LENGTH] or UNTITLED,
+        description=(_unescape(description[1]).strip() or None) if description else None,
+        date=day,
+        start_time=start_time,
+        end_time=end_time,
+        tags=list(tags) or None,
+        color=color[1].strip() if color and _COLOR.match(color[1].strip()) else None,
+        rrule=rrule,
+        exdates=exdates,
+        series_uid=series_uid,
+        recurrence_id=recurrence_id,
+        rrule_dropped=rrule_dropped,
+    )
@@ -0,0 +1,225 @@
+"""
+Очередь фоновых задач поверх таблицы jobs.
+
+Роутеры ставят задачи через enqueue() и сразу отвечают клиенту, а воркер
+(python -m app.worker или встроенный в API) забирает их через FOR UPDATE SKIP LOCKED.
+Пока обработчик работает, воркер продлевает аренду; задача, аренда которой не продлевалась
+job_visibility_timeout_seconds (воркер упал), снова становится доступной. После max_attempts
+неудачных попыток задача переводится в статус "dead". Обработчик может изменить payload
+перед исключением (например, оставить в нём только недоставленное): повтор получит
+изменённый payload.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+JobHandler = Callable[[dict[str, Any]], Awaitable[None]]
+
+_handlers: dict[str, JobHandler] = {}
+
+# Счётчики для /health (на процесс)
+stats: dict[str, int] = {"claimed": 0, "succeeded": 0, "retried": 0, "dead": 0, "lease_lost": 0}
+
+
+def handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Регистрация обработчика задач определённого вида."""
+    def register(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict[str, Any],
+    delay_seconds: float = 0,
+    max_attempts: Optional[int] = None,
+    commit: bool = True,
+) -> models.Job:
+    """
+    Постановка задачи в очередь.
+
+    С commit=False задача записывается в текущей транзакции вызывающего и станет
+    видна воркерам только вместе с остальными изменениями.
+    """
+    now = datetime.now()
+    job = models.Job(
+        kind=kind,
+        payload=payload,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts or settings.job_max_attempts,
+        run_at=now + timedelta(seconds=delay_seconds),
+        created_at=now,
+    )
+    db.add(job)
+    if commit:
+        await db.commit()
+    return job
+
+
+async def claim_jobs(db: AsyncSession, limit: int) -> list[models.Job]:
+    """
+    Захват готовых задач: новых и тех, у которых истёк срок аренды. Задача с истёкшей арендой
+    после последней попытки (воркер падал на ней max_attempts раз) не выдаётся, а переводится
+    в статус "dead": иначе она захватывалась бы бесконечно.
+    """
+    now = datetime.now()
+    stmt = (
+        select(models.Job)
+        .where(
+            models.Job.status.in_(("queued", "running")),
+            models.Job.run_at <= now,
+        )
+        .order_by(models.Job.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(stmt)
+
+    lease_until = now + timedelta(seconds=settings.job_visibility_timeout_seconds)
+    jobs = []
+    for job in result.scalars().all():
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            job.status = "dead"
+            job.last_error = f"Lease expired during attempt {job.attempts}: worker did not finish the job"
+            stats["dead"] += 1
+            logger.error(f"✗ Задача {job.id} ({job.kind}) перемещена в dead letter: аренда истекла после {job.attempts} попыток")
+            continue
+        job.status = "running"
+        job.attempts += 1
+        job.run_at = lease_until
+        jobs.append(job)
+    await db.commit()
+    stats["claimed"] += len(jobs)
+    return jobs
+
+
+async def _execute(job: models.Job) -> Optional[str]:
+    """Выполнение задачи; возвращает текст ошибки или None при успехе."""
+    func = _handlers.get(job.kind)
+    if func is None:
+        return f"No handler registered for job kind {job.kind!r}"
+    try:
+        await func(job.payload)
+        return None
+    except Exception as e:
+        logger.exception(f"Ошибка выполнения задачи {job.id} ({job.kind})")
+        return f"{type(e).__name__}: {e}"
+
+
+async def _finish(db: AsyncSession, job: models.Job, error: Optional[str]) -> None:
+    """
+    Фиксация результата попытки, только пока аренда у этого воркера. Если обработчик работал
+    дольше job_visibility_timeout_seconds, задачу мог забрать другой воркер (attempts уже
+    увеличен): тогда результат этой попытки не записывается, чтобы не затереть его состояние.
+    """
+    owned = (models.Job.id == job.id, models.Job.status == "running", models.Job.attempts == job.attempts)
+    if error is None:
+        stmt = delete(models.Job).where(*owned)
+        outcome = "succeeded"
+    elif job.attempts >= job.max_attempts:
+        stmt = update(models.Job).where(*owned).values(status="dead", last_error=error[:2000], payload=job.payload)
+        outcome = "dead"
+    else:
+        backoff = min(2 ** job.attempts, 300) + random.uniform(0, 1)
+        stmt = update(models.Job).where(*owned).values(
+            status="queued",
+            last_error=error[:2000],
+            payload=job.payload,
+            run_at=datetime.now() + timedelta(seconds=backoff),
+        )
+        outcome = "retried"
+
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    if not result.rowcount:
+        stats["lease_lost"] += 1
+        logger.warning(f"Аренда задачи {job.id} ({job.kind}) истекла до завершения попытки {job.attempts}, результат не записан")
+        return
+    stats[outcome] += 1
+    if outcome == "dead":
+        logger.error(f"✗ Задача {job.id} ({job.kind}) перемещена в dead letter после {job.attempts} попыток: {error}")
+
+
+async def _extend_lease(job: models.Job) -> None:
+    """
+    Продление аренды, пока выполняется обработчик: каждую треть job_visibility_timeout_seconds
+    run_at сдвигается на полный таймаут. Долгая доставка (RetryAfter, очередь конвейера) не даёт
+    другому воркеру забрать задачу и разослать уведомление повторно.
+    """
+    timeout = settings.job_visibility_timeout_seconds
+    while True:
+        await asyncio.sleep(timeout / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    update(models.Job)
+                    .where(models.Job.id == job.id, models.Job.status == "running", models.Job.attempts == job.attempts)
+                    .values(run_at=datetime.now() + timedelta(seconds=timeout))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Ошибка продления аренды задачи {job.id}: {e}")
+            continue
+        if not result.rowcount:
+            return
+
+
+async def _run(job: models.Job) -> None:
+    """Выполнение одной задачи с продлением аренды и фиксацией результата в своей сессии."""
+    heartbeat = asyncio.create_task(_extend_lease(job))
+    try:
+        error = await _execute(job)
+    finally:
+        heartbeat.cancel()
+        try:
+            await heartbeat
+        except asyncio.CancelledError:
+            pass
+    async with AsyncSessionLocal() as db:
+        await _finish(db, job, error)
+        await db.commit()
+
+
+async def work_once(batch_size: Optional[int] = None) -> int:
+    """
+    Один проход воркера: захват пачки и параллельное выполнение. Результат каждой задачи
+    фиксируется сразу по её завершении, не дожидаясь остальных задач пачки.
+    """
+    async with AsyncSessionLocal() as db:
+        jobs = await claim_jobs(db, batch_size or settings.job_batch_size)
+    if not jobs:
+        return 0
+
+    results = await asyncio.gather(*(_run(job) for job in jobs), return_exceptions=True)
+    for job, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.error(f"Не удалось зафиксировать результат задачи {job.id} ({job.kind}): {result}")
+    return len(jobs)
+
+
+async def run_worker(stop: Optional[asyncio.Event] = None) -> None:
+    """Бесконечный цикл обработки очереди (до установки stop)."""
+    logger.info("Воркер фоновых задач запущен")
+    while stop is None or not stop.is_set():
+        try:
+            processed = await work_once()
+        except Exception as e:
+            logger.error(f"Ошибка в воркере фоновых задач: {e}")
+            processed = 0
+        if not processed:
+            await asyncio.sleep(settings.job_poll_interval_seconds)
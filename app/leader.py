@@ -0,0 +1,136 @@
+"""
+Выбор лидера среди процессов через advisory lock PostgreSQL.
+
+Лидер держит session-level блокировку на выделенном соединении и периодически
+проверяет его (heartbeat). Если соединение потеряно, лидерство считается потерянным,
+фоновая работа останавливается, а остальные процессы при следующей попытке
+захватывают блокировку (failover).
+"""
+import asyncio
+import logging
+import zlib
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElector:
+    """Запускает work() только в одном процессе из всех, использующих тот же name."""
+
+    def __init__(self, name: str, heartbeat_interval: float, retry_interval: float):
+        self.name = name
+        # Ключ advisory lock — 32-битный хэш имени
+        self.lock_key = zlib.crc32(f"tgcalendar:{name}".encode())
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self.leader_since: Optional[datetime] = None
+        self.last_heartbeat: Optional[datetime] = None
+        self.enabled = False
+
+    async def _try_acquire(self) -> Optional[AsyncConnection]:
+        conn = await engine.connect()
+        try:
+            acquired = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key})
+            # Блокировка сессионная и переживает транзакцию; не держим соединение в "idle in transaction"
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return None
+        return conn
+
+    async def _heartbeat(self, conn: AsyncConnection) -> bool:
+        """Проверка, что соединение живо и блокировка всё ещё у нас."""
+        held = await conn.scalar(
+            text("""
+                SELECT count(*) FROM pg_locks
+                WHERE locktype = 'advisory' AND objid = :key AND pid = pg_backend_pid() AND granted
+            """),
+            {"key": self.lock_key},
+        )
+        await conn.commit()
+        return bool(held)
+
+    async def _release(self, conn: AsyncConnection, healthy: bool) -> None:
+        try:
+            if healthy:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+                await conn.commit()
+            else:
+                # Соединение с неизвестным состоянием не должно вернуться в пул с блокировкой
+                await conn.invalidate()
+        except Exception as e:
+            logger.warning(f"Не удалось корректно освободить блокировку {self.name}: {e}")
+        finally:
+            await conn.close()
+
+    def _set_leader(self, value: bool) -> None:
+        self.is_leader = value
+        self.leader_since = datetime.now() if value else None
+
+    async def _lead(self, work: Callable[[], Awaitable[Any]], conn: Optional[AsyncConnection]) -> None:
+        """Выполнение work() пока лидерство подтверждается heartbeat-ом."""
+        self._set_leader(True)
+        logger.info(f"Процесс стал лидером для {self.name}")
+        task = asyncio.create_task(work())
+        healthy = True
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if done:
+                    # Работа завершилась сама (в т.ч. с ошибкой) — отдаём лидерство и перевыбираемся
+                    if task.exception():
+                        logger.error(f"Фоновая работа {self.name} упала: {task.exception()}")
+                    return
+                if conn is not None:
+                    try:
+                        if not await self._heartbeat(conn):
+                            logger.error(f"Блокировка {self.name} потеряна")
+                            return
+                    except Exception as e:
+                        healthy = False
+                        logger.error(f"Heartbeat лидера {self.name} не прошёл: {e}")
+                        return
+                self.last_heartbeat = datetime.now()
+        finally:
+            self._set_leader(False)
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            if conn is not None:
+                await self._release(conn, healthy)
+
+    async def run(self, work: Callable[[], Awaitable[Any]]) -> None:
+        """Бесконечный цикл выборов: лидер выполняет work(), остальные ждут своей очереди."""
+        self.enabled = True
+        # Advisory locks есть только в PostgreSQL; на других БД процесс считается единственным
+        use_lock = engine.dialect.name == "postgresql"
+        while True:
+            conn = None
+            try:
+                if use_lock:
+                    conn = await self._try_acquire()
+                if conn is not None or not use_lock:
+                    await self._lead(work, conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка выборов лидера {self.name}: {e}")
+            await asyncio.sleep(self.retry_interval)
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "is_leader": self.is_leader,
+            "leader_since": self.leader_since.isoformat() if self.leader_since else None,
+            "last_heartbeat": self.last_heartbeat.isoformat() if self.last_heartbeat else None,
+        }
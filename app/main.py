@@ -12,14 +12,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.responses import RedirectResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import schemas
-from app.auth import create_session_token
+from app import crud, jobs, realtime, schemas
+from app.auth import create_session_token, verify_init_data
 from app.config import get_settings
-from app.database import Base, engine
-from app.dependencies import get_current_user
+from app.database import Base, engine, get_async_db, pool_status
+from app.dependencies import get_current_user, session_cache
 from app.routers import families, tasks, users
-from app.routers.migrations import run_migrations
+from app.routers.migrations import ensure_schema, run_migrations
+from app.task_cache import task_cache
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -28,22 +30,54 @@ app = FastAPI(title="TGCalendar API", version="0.1.0")
 
 @app.on_event("startup")
 async def startup_event():
-    """Выполнение миграций и запуск планировщика при старте приложения."""
+    """Проверка версии схемы и запуск планировщика при старте приложения."""
     try:
-        logger.info("Запуск миграций базы данных...")
-        await run_migrations()
-        logger.info("Миграции выполнены успешно")
+        # Один запрос к alembic_version; сами миграции запускаются отдельной командой
+        # (python -m app.routers.migrations) или здесь при MIGRATE_ON_STARTUP=true
+        await ensure_schema()
     except Exception as e:
-        logger.error(f"Ошибка при выполнении миграций: {e}")
+        logger.error(f"Ошибка при проверке схемы базы данных: {e}")
         # Не прерываем запуск приложения, но логируем ошибку
     
-    # Запускаем планировщик уведомлений в фоновом режиме
-    try:
-        from app.scheduler import run_scheduler
-        asyncio.create_task(run_scheduler())
-        logger.info("Планировщик уведомлений запущен")
-    except Exception as e:
-        logger.error(f"Ошибка при запуске планировщика уведомлений: {e}")
+    # Запускаем планировщик уведомлений в фоновом режиме: работать он будет только
+    # в процессе, выигравшем выборы лидера (advisory lock), остальные ждут failover
+    if settings.embedded_scheduler:
+        try:
+            from app.scheduler import run_scheduler_as_leader
+            asyncio.create_task(run_scheduler_as_leader())
+            logger.info("Планировщик уведомлений запущен (выборы лидера)")
+        except Exception as e:
+            logger.error(f"Ошибка при запуске планировщика уведомлений: {e}")
+    else:
+        logger.info("Встроенный планировщик отключен (EMBEDDED_SCHEDULER=false)")
+
+    # Встроенный воркер фоновых задач (можно отключить и запускать python -m app.worker)
+    if settings.embedded_job_worker:
+        try:
+            from app import jobs, notifications  # noqa: F401 — регистрирует обработчики задач
+            asyncio.create_task(jobs.run_worker())
+            logger.info("Воркер фоновых задач запущен")
+        except Exception as e:
+            logger.error(f"Ошибка при запуске воркера фоновых задач: {e}")
+
+    # Слушатель событий задач для GET /tasks/stream (LISTEN/NOTIFY между воркерами)
+    if settings.realtime_enabled and realtime.uses_notify():
+        asyncio.create_task(realtime.listener.run())
+        logger.info("Слушатель событий задач запущен")
+
+    # Webhook бота: обновления Telegram обрабатываются в этом процессе
+    if settings.bot_webhook_enabled:
+        from app.routers import telegram
+        await telegram.setup_webhook()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Остановка обработки обновлений бота и воркеров доставки уведомлений."""
+    from app.notifications import get_delivery_pipeline
+    if settings.bot_webhook_enabled:
+        from app.routers import telegram
+        await telegram.shutdown_webhook()
+    await get_delivery_pipeline().close()
 
 # Настройка CORS
 cors_origins = ["*"]  # По умолчанию разрешаем все (для разработки)
@@ -58,17 +92,42 @@ app.add_middleware(
     allow_origins=cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    # Курсор следующей страницы (GET /tasks/search)
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(users.router)
 app.include_router(families.router)
 app.include_router(tasks.router)
 
+if settings.bot_webhook_enabled:
+    from app.routers import telegram
+    app.include_router(telegram.router)
+
 
 @app.get("/health")
 def healthcheck():
-    return {"status": "ok"}
+    from app.notifications import get_delivery_pipeline
+    from app.scheduler import scheduler_leader
+    return {
+        "status": "ok",
+        "scheduler": scheduler_leader.status(),
+        "session_cache": session_cache.stats(),
+        "db_pool": pool_status(),
+        "task_cache": task_cache.stats() if task_cache else None,
+        "realtime": realtime.broker.stats(),
+        "delivery": get_delivery_pipeline().stats(),
+        "jobs": jobs.stats,
+        "bot_updates": _bot_update_stats(),
+    }
+
+
+def _bot_update_stats() -> dict | None:
+    if not settings.bot_webhook_enabled:
+        return None
+    from app.routers import telegram
+    return telegram.stats()
 
 @app.get("/miniapp", include_in_schema=False)
 def miniapp_redirect():
@@ -101,8 +160,14 @@ class WebAppAuthRequest(BaseModel):
 
 
 @app.post("/auth/verify")
-def auth_verify(payload: WebAppAuthRequest):
-    token = create_session_token(payload.init_data)
+async def auth_verify(
+    payload: WebAppAuthRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    tg_user = verify_init_data(payload.init_data)
+    # Подписываем в токен семьи пользователя, чтобы не проверять членство на каждом запросе
+    claims = await crud.get_membership_claims(db, tg_user.get("id"))
+    token = create_session_token(tg_user, claims)
     return {"token": token}
 
 
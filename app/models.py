@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from datetime import date, time
+from datetime import date, datetime, time
 from enum import Enum as PyEnum
 from typing import Optional
 
-from sqlalchemy import String, ForeignKey, UniqueConstraint, Date, Time, Enum as SAEnum, Text, JSON, Integer
+from sqlalchemy import String, ForeignKey, UniqueConstraint, Date, Time, DateTime, Enum as SAEnum, Text, JSON, Integer, Index, text, event, DDL
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from app import search
 from app.database import Base
 
 
@@ -18,6 +20,11 @@ class User(Base):
     last_name: Mapped[str | None] = mapped_column(String(64))
     username: Mapped[str | None] = mapped_column(String(64))
     telegram_notifications_enabled: Mapped[bool] = mapped_column(default=True, nullable=False)
+    # Увеличивается при любом изменении членства пользователя в семьях (вход, выход, блокировка).
+    # Сессионные токены с устаревшей эпохой перечитывают членство из БД.
+    membership_epoch: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    # Увеличивается при изменении личных задач пользователя (для ETag в GET /tasks)
+    data_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     families: Mapped[list[FamilyMembership]] = relationship("FamilyMembership", back_populates="user")
     tasks: Mapped[list[Task]] = relationship("Task", back_populates="owner")
@@ -30,6 +37,8 @@ class Family(Base):
     name: Mapped[str] = mapped_column(String(100), nullable=False)
     invite_code: Mapped[str] = mapped_column(String(10), unique=True, nullable=False)
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # Увеличивается при изменении задач семьи (для ETag в GET /tasks)
+    data_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     owner: Mapped[User] = relationship("User")
     members: Mapped[list[FamilyMembership]] = relationship("FamilyMembership", back_populates="family")
@@ -38,7 +47,11 @@ class Family(Base):
 
 class FamilyMembership(Base):
     __tablename__ = "family_memberships"
-    __table_args__ = (UniqueConstraint("user_id", "family_id", name="uq_membership"),)
+    # Поиск по user_id обслуживает uq_membership (user_id — первая колонка), по family_id — отдельный индекс
+    __table_args__ = (
+        UniqueConstraint("user_id", "family_id", name="uq_membership"),
+        Index("ix_family_memberships_family_id", "family_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -57,6 +70,67 @@ class TaskScope(str, PyEnum):  # type: ignore[misc]
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Месячные выборки: личные задачи владельца и задачи семьи за диапазон дат
+        Index("ix_tasks_owner_id_date", "owner_id", "date"),
+        Index("ix_tasks_family_id_date", "family_id", "date"),
+        # Дельта-синхронизация (GET /tasks/changes): изменения источника после версии курсора
+        Index("ix_tasks_family_id_change_seq", "family_id", "change_seq"),
+        Index(
+            "ix_tasks_personal_change_seq",
+            "owner_id",
+            "change_seq",
+            postgresql_where=text("family_id IS NULL"),
+            sqlite_where=text("family_id IS NULL"),
+        ),
+        # Повторяющиеся серии: выбираются по источнику для любого периода (их немного)
+        Index(
+            "ix_tasks_series_owner_id",
+            "owner_id",
+            postgresql_where=text("rrule IS NOT NULL"),
+            sqlite_where=text("rrule IS NOT NULL"),
+        ),
+        Index(
+            "ix_tasks_series_family_id",
+            "family_id",
+            postgresql_where=text("rrule IS NOT NULL"),
+            sqlite_where=text("rrule IS NOT NULL"),
+        ),
+        # Изменённые вхождения серии
+        Index(
+            "ix_tasks_series_id",
+            "series_id",
+            postgresql_where=text("series_id IS NOT NULL"),
+            sqlite_where=text("series_id IS NOT NULL"),
+        ),
+        # Фильтр по тегам (tags @> '["..."]'); jsonb_path_ops — только для @>, зато компактнее
+        Index(
+            "ix_tasks_tags",
+            "tags",
+            postgresql_using="gin",
+            postgresql_ops={"tags": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # UID импортированного события уникален в источнике (дубликаты при импорте .ics пропускаются)
+        Index(
+            "uq_tasks_personal_external_uid",
+            "owner_id",
+            "external_uid",
+            unique=True,
+            postgresql_where=text("family_id IS NULL AND external_uid IS NOT NULL"),
+            sqlite_where=text("family_id IS NULL AND external_uid IS NOT NULL"),
+        ),
+        Index(
+            "uq_tasks_family_external_uid",
+            "family_id",
+            "external_uid",
+            unique=True,
+            postgresql_where=text("family_id IS NOT NULL AND external_uid IS NOT NULL"),
+            sqlite_where=text("family_id IS NOT NULL AND external_uid IS NOT NULL"),
+        ),
+        # В SQLite без AUTOINCREMENT id последней удалённой задачи выдаётся снова, а на id
+        # ссылаются следы удаления (task_tombstones) и UID выгрузки .ics
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -67,10 +141,133 @@ class Task(Base):
     start_time: Mapped[time | None] = mapped_column(Time)
     end_time: Mapped[time | None] = mapped_column(Time)
     scope: Mapped[TaskScope] = mapped_column(SAEnum(TaskScope), default=TaskScope.personal, nullable=False)
-    tags: Mapped[list[str] | None] = mapped_column(JSON, nullable=True)  # Список тегов
+    # Список тегов; в PostgreSQL — jsonb (GIN-индекс ix_tasks_tags), копия по тегу — в task_tags
+    tags: Mapped[list[str] | None] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     color: Mapped[str | None] = mapped_column(String(7), nullable=True)  # HEX цвет (#RRGGBB)
     notify_before_days: Mapped[int | None] = mapped_column(Integer, nullable=True)  # Уведомить за N дней
     notify_before_hours: Mapped[int | None] = mapped_column(Integer, nullable=True)  # Уведомить за N часов
+    # Версия источника (users/families.data_version), в которой задача изменилась последний раз
+    change_seq: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Повторение (см. app.recurrence): у серии date — первое вхождение, rrule — правило,
+    # exdates — исключённые даты (удалённые или изменённые вхождения), recurrence_end —
+    # последняя возможная дата вхождения (NULL — серия бесконечна)
+    rrule: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    exdates: Mapped[list[str] | None] = mapped_column(JSON, nullable=True)  # ISO-даты
+    recurrence_end: Mapped[date | None] = mapped_column(Date, nullable=True)
+    # Изменённое вхождение серии — обычная задача с series_id серии и исходной датой вхождения
+    series_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    occurrence_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+    # UID события .ics, из которого задача импортирована (см. app.ical)
+    external_uid: Mapped[str | None] = mapped_column(String(255), nullable=True)
 
     owner: Mapped[User] = relationship("User", back_populates="tasks")
     family: Mapped[Family | None] = relationship("Family", back_populates="tasks")
+
+
+# Полнотекстовый поиск (app.search): tsvector-колонка с GIN-индексом в PostgreSQL,
+# FTS5-таблица с триггерами в SQLite. В ORM не отображаются, создаются вместе с tasks
+event.listen(Task.__table__, "after_create", DDL(search.POSTGRESQL_COLUMN_DDL).execute_if(dialect="postgresql"))
+event.listen(Task.__table__, "after_create", DDL(search.POSTGRESQL_INDEX_DDL).execute_if(dialect="postgresql"))
+for _statement in search.SQLITE_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+event.listen(Task.__table__, "before_drop", DDL(f"DROP TABLE IF EXISTS {search.FTS_TABLE}").execute_if(dialect="sqlite"))
+
+
+class TaskTag(Base):
+    """
+    Теги задач по строке на тег (пишутся вместе с задачей, см. crud.sync_tasks_tags).
+    Источник подсказок и сводок по тегам на любой СУБД; в SQLite по ней же фильтруется
+    GET /tasks?tags=. key — тег в нижнем регистре; в PostgreSQL с collation "C", чтобы
+    поиск по префиксу шёл диапазоном по индексу (побайтовое сравнение, без правил локали).
+    """
+    __tablename__ = "task_tags"
+    __table_args__ = (
+        Index(
+            "ix_task_tags_personal_key",
+            "owner_id",
+            "key",
+            postgresql_where=text("family_id IS NULL"),
+            sqlite_where=text("family_id IS NULL"),
+        ),
+        Index("ix_task_tags_family_id_key", "family_id", "key"),
+    )
+
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
+    key: Mapped[str] = mapped_column(Text().with_variant(Text(collation="C"), "postgresql"), primary_key=True)
+    tag: Mapped[str] = mapped_column(Text, nullable=False)  # Как у задачи (первое написание)
+    owner_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    family_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+
+class TaskTombstone(Base):
+    """
+    След удалённой задачи для GET /tasks/changes.
+    Хранится task_tombstone_retention_days, затем удаляется планировщиком.
+    """
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index("ix_task_tombstones_owner_id_change_seq", "owner_id", "change_seq"),
+        Index("ix_task_tombstones_family_id_change_seq", "family_id", "change_seq"),
+    )
+
+    task_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    owner_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    family_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    change_seq: Mapped[int] = mapped_column(Integer, nullable=False)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class NotificationOutbox(Base):
+    """
+    Запланированные напоминания о задачах с заранее вычисленным временем отправки.
+    Строки пишутся при создании/изменении задачи, планировщик забирает только наступившие.
+    """
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        UniqueConstraint("task_id", "kind", name="uq_outbox_task_kind"),
+        # Планировщик ищет только неотправленные строки, поэтому индекс частичный
+        Index(
+            "ix_notification_outbox_pending_due_at",
+            "due_at",
+            postgresql_where=text("sent_at IS NULL"),
+            sqlite_where=text("sent_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)  # "days" | "hours"
+    due_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Для серии — вхождение, о котором напоминание; после отправки строка переходит к следующему
+    occurrence_date: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+    task: Mapped[Task] = relationship("Task")
+
+
+class Job(Base):
+    """
+    Фоновая задача (например, отправка уведомления), выполняемая воркером app.worker.
+    run_at — момент, когда задачу можно взять; для выполняющейся задачи — срок аренды,
+    после которого она снова становится видимой другим воркерам.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index(
+            "ix_jobs_ready_run_at",
+            "run_at",
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False, default=dict)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")  # queued | running | dead
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=5)
+    run_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
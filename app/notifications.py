@@ -1,14 +1,32 @@
 """
 Модуль для отправки Telegram-уведомлений.
+
+Все сообщения проходят через DeliveryPipeline: ограниченный пул воркеров с общим
+token bucket (лимит Bot API ~30 сообщений/с), ограничением частоты на чат,
+повторами с учётом retry_after и отключением уведомлений для заблокировавших бота.
 """
+import asyncio
 import logging
-from typing import Optional
+import random
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Optional
 
 from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
-from app import crud, models
+from app import crud, jobs, models
+from app.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -25,6 +43,269 @@ def get_bot() -> Bot:
     return _bot
 
 
+class TokenBucket:
+    """Асинхронный token bucket: rate токенов в секунду, не более capacity подряд."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class _Delivery:
+    chat_id: int
+    text: str
+    future: Optional[asyncio.Future] = None
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class DeliveryPipeline:
+    """
+    Очередь отправки сообщений в Telegram с ограниченным пулом воркеров.
+
+    - общий лимит скорости (token bucket) и минимальный интервал между сообщениями в один чат;
+    - TelegramRetryAfter и временные ошибки — повтор с задержкой и случайным джиттером;
+    - TelegramForbiddenError (бот заблокирован) — отключение telegram_notifications_enabled.
+
+    У каждого чата своя очередь (FIFO). Чат попадает в общую очередь готовых, только когда
+    истёк его интервал или задержка повтора, и не чаще одного раза: сообщения одному
+    пользователю уходят в порядке постановки, а повтор задерживает следующие за ним.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        rate_per_second: float,
+        per_chat_interval: float,
+        max_queue: int,
+        max_attempts: int,
+    ):
+        self.workers = workers
+        self.per_chat_interval = per_chat_interval
+        self.max_attempts = max_attempts
+        self._max_queue = max_queue
+        self._bucket = TokenBucket(rate_per_second)
+        self._chats: dict[int, deque[_Delivery]] = {}
+        self._ready: Optional[asyncio.Queue[int]] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: list[asyncio.Task] = []
+        # Таймеры выхода чатов из паузы: event loop держит задачи только по слабой ссылке
+        self._timers: set[asyncio.Task] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._chat_next_at: dict[int, float] = {}
+        self._pending = 0
+        self._in_flight = 0
+        self._sent_at: deque[float] = deque()
+        self.counters = {"sent": 0, "failed": 0, "retried": 0, "blocked": 0}
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Первый вызов или новый event loop (например, повторный asyncio.run)
+            self._loop = loop
+            self._chats = {}
+            self._ready = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self._max_queue)
+            self._pending = 0
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def enqueue(self, chat_id: int, text: str) -> asyncio.Future:
+        """
+        Постановка сообщения в очередь его чата. Ждёт только при переполненной очереди
+        (backpressure). Возвращает future с результатом доставки (True/False).
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._slots.acquire()
+        self._pending += 1
+        item = _Delivery(chat_id=chat_id, text=text, future=future)
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            self._chats[chat_id] = deque([item])
+            self._release(chat_id, self._chat_next_at.get(chat_id, 0.0) - time.monotonic())
+        else:
+            queue.append(item)
+        return future
+
+    async def deliver(self, chat_id: int, text: str) -> bool:
+        """Постановка в очередь и ожидание результата доставки."""
+        return await (await self.enqueue(chat_id, text))
+
+    async def close(self) -> None:
+        """
+        Остановка воркеров и таймеров. Сообщения, оставшиеся в очередях чатов (в том числе
+        ожидающие повтора), считаются недоставленными: их future получают False, чтобы
+        ожидающие deliver() (планировщик, воркер задач) не зависали при остановке.
+        """
+        tasks = [*self._tasks, *self._timers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._timers.clear()
+        for queue in self._chats.values():
+            for item in queue:
+                self._resolve(item, False)
+        self._chats = {}
+        self._pending = 0
+        self._loop = None
+
+    def _release(self, chat_id: int, delay: float) -> None:
+        """Чат становится готовым к отправке своего первого сообщения через delay секунд."""
+        if delay <= 0:
+            self._ready.put_nowait(chat_id)
+            return
+
+        async def release_later() -> None:
+            await asyncio.sleep(delay)
+            self._ready.put_nowait(chat_id)
+
+        task = self._loop.create_task(release_later())
+        self._timers.add(task)
+        task.add_done_callback(self._timers.discard)
+
+    @staticmethod
+    def _resolve(item: _Delivery, result: bool) -> None:
+        if item.future is not None and not item.future.done():
+            item.future.set_result(result)
+
+    def _backoff(self, attempts: int) -> float:
+        return min(2 ** attempts, 60) + random.uniform(0, 1)
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._chats[chat_id]
+            # Первое сообщение остаётся в очереди чата до завершения: новые встают за ним
+            item = queue[0]
+            self._in_flight += 1
+            try:
+                retry_in = await self._process(item)
+            except Exception as e:
+                logger.error(f"Ошибка отправки уведомления пользователю {item.chat_id}: {e}")
+                self.counters["failed"] += 1
+                self._resolve(item, False)
+                retry_in = None
+            finally:
+                self._in_flight -= 1
+
+            if retry_in is None:
+                queue.popleft()
+                self._pending -= 1
+                self._slots.release()
+                if not queue:
+                    del self._chats[chat_id]
+                    continue
+                retry_in = self._chat_next_at.get(chat_id, 0.0) - time.monotonic()
+            self._release(chat_id, retry_in)
+
+    async def _process(self, item: _Delivery) -> Optional[float]:
+        """Одна попытка отправки. Возвращает задержку до повтора или None, если сообщение завершено."""
+        await self._bucket.acquire()
+        self._chat_next_at[item.chat_id] = time.monotonic() + self.per_chat_interval
+        if len(self._chat_next_at) > 10000:
+            self._prune_chat_limits()
+        item.attempts += 1
+
+        try:
+            await get_bot().send_message(chat_id=item.chat_id, text=item.text)
+        except TelegramRetryAfter as e:
+            delay = e.retry_after + random.uniform(0, 1)
+            self._chat_next_at[item.chat_id] = time.monotonic() + delay
+            return self._retry_or_fail(item, delay, f"flood control, retry after {e.retry_after}s")
+        except TelegramForbiddenError:
+            logger.info(f"Пользователь {item.chat_id} заблокировал бота, отключаем уведомления")
+            self.counters["blocked"] += 1
+            await disable_user_notifications(item.chat_id)
+            self._resolve(item, False)
+            return None
+        except (TelegramNetworkError, TelegramServerError) as e:
+            return self._retry_or_fail(item, self._backoff(item.attempts), str(e))
+        except TelegramBadRequest as e:
+            logger.error(f"Ошибка отправки уведомления пользователю {item.chat_id}: {e}")
+            self.counters["failed"] += 1
+            self._resolve(item, False)
+            return None
+
+        self.counters["sent"] += 1
+        self._sent_at.append(time.monotonic())
+        logger.info(f"Уведомление отправлено пользователю {item.chat_id}")
+        self._resolve(item, True)
+        return None
+
+    def _retry_or_fail(self, item: _Delivery, delay: float, reason: str) -> Optional[float]:
+        if item.attempts >= self.max_attempts:
+            logger.error(f"Ошибка отправки уведомления пользователю {item.chat_id}: {reason} (попыток: {item.attempts})")
+            self.counters["failed"] += 1
+            self._resolve(item, False)
+            return None
+        logger.warning(f"Повтор отправки пользователю {item.chat_id} через {delay:.1f}с: {reason}")
+        self.counters["retried"] += 1
+        return delay
+
+    def _prune_chat_limits(self) -> None:
+        now = time.monotonic()
+        self._chat_next_at = {chat_id: at for chat_id, at in self._chat_next_at.items() if at > now}
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        while self._sent_at and self._sent_at[0] < now - 60:
+            self._sent_at.popleft()
+        return {
+            **self.counters,
+            "queue_depth": self._pending - self._in_flight,
+            "in_flight": self._in_flight,
+            "workers": self.workers,
+            "throughput_per_second_1m": round(len(self._sent_at) / 60, 2),
+        }
+
+
+_pipeline: Optional[DeliveryPipeline] = None
+
+
+def get_delivery_pipeline() -> DeliveryPipeline:
+    """Получение общего для процесса конвейера доставки."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = DeliveryPipeline(
+            workers=settings.delivery_workers,
+            rate_per_second=settings.delivery_rate_per_second,
+            per_chat_interval=settings.delivery_per_chat_interval_seconds,
+            max_queue=settings.delivery_queue_size,
+            max_attempts=settings.delivery_max_attempts,
+        )
+    return _pipeline
+
+
+async def disable_user_notifications(user_id: int) -> None:
+    """Отключение уведомлений пользователю, который заблокировал бота."""
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(models.User)
+                .where(models.User.id == user_id)
+                .values(telegram_notifications_enabled=False)
+            )
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Не удалось отключить уведомления пользователю {user_id}: {e}")
+
+
 async def send_telegram_notification(
     user_id: int,
     message: str,
@@ -49,45 +330,146 @@ async def send_telegram_notification(
                 logger.info(f"Уведомления отключены для пользователя {user_id}")
                 return False
         
-        bot = get_bot()
-        await bot.send_message(chat_id=user_id, text=message)
-        logger.info(f"Уведомление отправлено пользователю {user_id}")
-        return True
+        return await get_delivery_pipeline().deliver(user_id, message)
     except Exception as e:
         logger.error(f"Ошибка отправки уведомления пользователю {user_id}: {e}")
         return False
 
 
+class Recipients:
+    """Получатели уведомлений, разрешённые одним запросом для пачки задач."""
+
+    def __init__(self, rows: Iterable[tuple[Optional[int], int]]):
+        self._owners: set[int] = set()
+        self._families: dict[int, list[int]] = defaultdict(list)
+        for family_id, user_id in rows:
+            if family_id is None:
+                self._owners.add(user_id)
+            else:
+                self._families[family_id].append(user_id)
+
+    def for_task(self, owner_id: int, family_id: Optional[int]) -> list[int]:
+        """Личная задача — владелец, семейная — все незаблокированные участники семьи."""
+        if family_id is not None:
+            return list(self._families.get(family_id, ()))
+        return [owner_id] if owner_id in self._owners else []
+
+
+async def resolve_recipients(
+    db: AsyncSession,
+    tasks: Iterable[tuple[int, Optional[int]]],
+) -> Recipients:
+    """Получатели для пачки задач, заданных парами (owner_id, family_id)."""
+    owner_ids: set[int] = set()
+    family_ids: set[int] = set()
+    for owner_id, family_id in tasks:
+        if family_id is None:
+            owner_ids.add(owner_id)
+        else:
+            family_ids.add(family_id)
+    return Recipients(await crud.list_notification_recipients(db, owner_ids, family_ids))
+
+
+async def send_to_recipients(user_ids: Iterable[int], message: str) -> bool:
+    """
+    Рассылка одного сообщения нескольким пользователям.
+    Настройки уведомлений не проверяются — получатели уже отфильтрованы.
+    """
+    results = await asyncio.gather(*(send_telegram_notification(user_id, message) for user_id in user_ids))
+    return any(results)
+
+
+async def _notify_task_audience(
+    user_id: int,
+    family_id: Optional[int],
+    message: str,
+    db: Optional[AsyncSession],
+) -> bool:
+    """Уведомление по задаче: для семейной — всем участникам семьи, для личной — пользователю."""
+    if db is None:
+        return await send_telegram_notification(user_id, message)
+    recipients = await resolve_recipients(db, [(user_id, family_id)])
+    return await send_to_recipients(recipients.for_task(user_id, family_id), message)
+
+
+def task_created_message(task_title: str, task_date: str) -> str:
+    return f"✅ Создана новая задача: {task_title}\n📅 Дата: {task_date}"
+
+
+def task_updated_message(task_title: str, task_date: str) -> str:
+    return f"✏️ Задача обновлена: {task_title}\n📅 Дата: {task_date}"
+
+
+def task_deleted_message(task_title: str) -> str:
+    return f"🗑️ Задача удалена: {task_title}"
+
+
 async def notify_task_created(
     user_id: int,
     task_title: str,
     task_date: str,
-    db: Optional[AsyncSession] = None
+    db: Optional[AsyncSession] = None,
+    family_id: Optional[int] = None
 ) -> bool:
     """Уведомление о создании новой задачи."""
-    message = f"✅ Создана новая задача: {task_title}\n📅 Дата: {task_date}"
-    return await send_telegram_notification(user_id, message, db)
+    return await _notify_task_audience(user_id, family_id, task_created_message(task_title, task_date), db)
 
 
 async def notify_task_updated(
     user_id: int,
     task_title: str,
     task_date: str,
-    db: Optional[AsyncSession] = None
+    db: Optional[AsyncSession] = None,
+    family_id: Optional[int] = None
 ) -> bool:
     """Уведомление об обновлении задачи."""
-    message = f"✏️ Задача обновлена: {task_title}\n📅 Дата: {task_date}"
-    return await send_telegram_notification(user_id, message, db)
+    return await _notify_task_audience(user_id, family_id, task_updated_message(task_title, task_date), db)
 
 
 async def notify_task_deleted(
     user_id: int,
     task_title: str,
-    db: Optional[AsyncSession] = None
+    db: Optional[AsyncSession] = None,
+    family_id: Optional[int] = None
 ) -> bool:
     """Уведомление об удалении задачи."""
-    message = f"🗑️ Задача удалена: {task_title}"
-    return await send_telegram_notification(user_id, message, db)
+    return await _notify_task_audience(user_id, family_id, task_deleted_message(task_title), db)
+
+
+# Сколько названий задач перечислять в сводке пакетного изменения
+BATCH_NOTICE_TITLES = 5
+
+
+def _batch_notice_line(icon: str, label: str, titles: list[str]) -> str:
+    line = f"{icon} {label}: {len(titles)}"
+    shown = ", ".join(titles[:BATCH_NOTICE_TITLES])
+    if len(titles) > BATCH_NOTICE_TITLES:
+        shown += f" и ещё {len(titles) - BATCH_NOTICE_TITLES}"
+    return f"{line} — {shown}"
+
+
+def task_batch_message(created: list[str], updated: list[str], deleted: list[str]) -> Optional[str]:
+    lines = [
+        _batch_notice_line(icon, label, titles)
+        for icon, label, titles in (("✅", "Создано", created), ("✏️", "Обновлено", updated), ("🗑️", "Удалено", deleted))
+        if titles
+    ]
+    return "\n".join(lines) if lines else None
+
+
+async def notify_task_batch(
+    user_id: int,
+    created: list[str],
+    updated: list[str],
+    deleted: list[str],
+    db: Optional[AsyncSession] = None,
+    family_id: Optional[int] = None
+) -> bool:
+    """Одно уведомление о пакетном изменении задач (POST /tasks/batch) вместо сообщения на каждую."""
+    message = task_batch_message(created, updated, deleted)
+    if message is None:
+        return False
+    return await _notify_task_audience(user_id, family_id, message, db)
 
 
 async def notify_family_member_added(
@@ -101,6 +483,11 @@ async def notify_family_member_added(
     return await send_telegram_notification(user_id, message, db)
 
 
+def upcoming_task_message(task_title: str, task_date: str, task_time: Optional[str] = None) -> str:
+    time_str = f" в {task_time}" if task_time else ""
+    return f"⏰ Напоминание: {task_title}\n📅 {task_date}{time_str}"
+
+
 async def notify_upcoming_task(
     user_id: int,
     task_title: str,
@@ -109,6 +496,75 @@ async def notify_upcoming_task(
     db: Optional[AsyncSession] = None
 ) -> bool:
     """Уведомление о предстоящей задаче."""
-    time_str = f" в {task_time}" if task_time else ""
-    message = f"⏰ Напоминание: {task_title}\n📅 {task_date}{time_str}"
-    return await send_telegram_notification(user_id, message, db)
+    return await send_telegram_notification(user_id, upcoming_task_message(task_title, task_date, task_time), db)
+
+
+# ----------------------------------------------------------------------
+# Обработчики фоновых задач (выполняются воркером app.worker)
+# ----------------------------------------------------------------------
+
+class NoticeDeliveryError(Exception):
+    """Уведомление о задаче не доставлено части получателей; задача очереди будет повторена."""
+
+
+def _task_notice_message(payload: dict[str, Any]) -> Optional[str]:
+    event = payload["event"]
+    if event == "created":
+        return task_created_message(payload["task_title"], payload["task_date"])
+    if event == "updated":
+        return task_updated_message(payload["task_title"], payload["task_date"])
+    if event == "deleted":
+        return task_deleted_message(payload["task_title"])
+    if event == "batch":
+        return task_batch_message(payload.get("created", []), payload.get("updated", []), payload.get("deleted", []))
+    raise ValueError(f"Unknown task notice event: {event}")
+
+
+async def _deliver_to_audience(payload: dict[str, Any], message: str) -> None:
+    """
+    Рассылка по задаче из очереди: для семейной — всем участникам семьи, для личной — владельцу.
+
+    Если доставка не удалась части получателей (кроме заблокировавших бота — им уведомления
+    уже отключены), в payload остаются только они и выбрасывается NoticeDeliveryError:
+    воркер повторит задачу с задержкой, после max_attempts она уйдёт в dead letter.
+    Получившим сообщение повтор его не дублирует.
+    """
+    user_id, family_id = payload["user_id"], payload.get("family_id")
+
+    async def current_recipients() -> list[int]:
+        # Отдельная короткая сессия: соединение не держится, пока сообщения ждут отправки
+        async with AsyncSessionLocal() as db:
+            return (await resolve_recipients(db, [(user_id, family_id)])).for_task(user_id, family_id)
+
+    recipients = await current_recipients()
+    if "pending_user_ids" in payload:
+        pending = set(payload["pending_user_ids"])
+        recipients = [recipient for recipient in recipients if recipient in pending]
+
+    results = await asyncio.gather(*(send_telegram_notification(recipient, message) for recipient in recipients))
+    failed = [recipient for recipient, sent in zip(recipients, results) if not sent]
+    if failed:
+        still_enabled = set(await current_recipients())
+        failed = [recipient for recipient in failed if recipient in still_enabled]
+    if failed:
+        payload["pending_user_ids"] = failed
+        raise NoticeDeliveryError(f"Not delivered to {len(failed)} of {len(recipients)} recipients")
+
+
+@jobs.handler("task_notice")
+async def handle_task_notice(payload: dict[str, Any]) -> None:
+    """Уведомление о создании/изменении/удалении задачи, поставленное роутером в очередь."""
+    message = _task_notice_message(payload)
+    if message is None:
+        return
+    await _deliver_to_audience(payload, message)
+
+
+@jobs.handler("task_reminder")
+async def handle_task_reminder(payload: dict[str, Any]) -> None:
+    """
+    Напоминание о предстоящей задаче, поставленное планировщиком в очередь в той же
+    транзакции, в которой строка notification_outbox помечена отправленной.
+    """
+    message = upcoming_task_message(payload["task_title"], payload["task_date"], payload.get("task_time"))
+    await _deliver_to_audience(payload, message)
@@ -0,0 +1,216 @@
+"""
+Realtime-события об изменениях задач для GET /tasks/stream (Server-Sent Events).
+
+События компактные: что изменилось и в каком источнике, без содержимого задачи.
+Клиент догружает изменения через GET /tasks/changes, где права проверяются как обычно.
+
+Между воркерами события идут через PostgreSQL LISTEN/NOTIFY: каждый воркер держит одно
+слушающее соединение и раздаёт события своим подписчикам. На других БД (SQLite в
+разработке) рассылка только внутри процесса.
+
+У подписчика очередь ограниченного размера. Если клиент не успевает читать, подписка
+закрывается событием reset (клиент переподключается и синхронизируется), поэтому медленные
+соединения не копят память. Тот же reset получают все подписчики воркера после
+переподключения слушателя: события, пришедшие в разрыве, потеряны.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CHANNEL = "tgcalendar_task_changes"
+# Маркер в очереди подписчика: подписка закрывается событием reset
+RESET = None
+
+
+class Subscriber:
+    def __init__(self, user_id: int, family_ids: Iterable[int], queue_size: int):
+        self.user_id = user_id
+        self.family_ids = frozenset(family_ids)
+        self.queue: asyncio.Queue[Optional[str]] = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+
+class Broker:
+    """Подписчики воркера по пользователям (личные задачи) и семьям."""
+
+    def __init__(self, queue_size: int, max_connections: int):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self._by_user: dict[int, set[Subscriber]] = defaultdict(set)
+        self._by_family: dict[int, set[Subscriber]] = defaultdict(set)
+        self.connections = 0
+        self.events = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: int, family_ids: Iterable[int]) -> Optional[Subscriber]:
+        """Новая подписка или None, если лимит соединений воркера исчерпан."""
+        if self.connections >= self.max_connections:
+            return None
+        subscriber = Subscriber(user_id, family_ids, self.queue_size)
+        self._by_user[user_id].add(subscriber)
+        for family_id in subscriber.family_ids:
+            self._by_family[family_id].add(subscriber)
+        self.connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for index, key in [(self._by_user, subscriber.user_id)] + [
+            (self._by_family, family_id) for family_id in subscriber.family_ids
+        ]:
+            subscribers = index.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del index[key]
+        self.connections -= 1
+
+    def dispatch(self, event: dict[str, Any]) -> None:
+        """Раздача события подписчикам семьи (семейная задача) или владельца (личная)."""
+        self.events += 1
+        family_id = event.get("family_id")
+        if family_id is not None:
+            subscribers = self._by_family.get(family_id)
+        else:
+            subscribers = self._by_user.get(event.get("owner_id"))
+        if not subscribers:
+            return
+        data = json.dumps(event, separators=(",", ":"))
+        for subscriber in list(subscribers):
+            self._offer(subscriber, data)
+
+    def _offer(self, subscriber: Subscriber, data: Optional[str]) -> None:
+        if subscriber.closed:
+            return
+        if data is RESET:
+            subscriber.closed = True
+        try:
+            subscriber.queue.put_nowait(data)
+            if data is not RESET:
+                self.delivered += 1
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: закрываем подписку, он догонит через /tasks/changes
+            subscriber.closed = True
+            self.overflows += 1
+
+    def reset_all(self) -> None:
+        for subscribers in list(self._by_user.values()):
+            for subscriber in list(subscribers):
+                self._offer(subscriber, RESET)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "connections": self.connections,
+            "max_connections": self.max_connections,
+            "events": self.events,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "listening": listener.listening,
+        }
+
+
+class NotifyListener:
+    """Слушающее соединение воркера (LISTEN) с переподключением."""
+
+    def __init__(self, heartbeat_interval: float, retry_interval: float):
+        self.heartbeat_interval = heartbeat_interval
+        self.retry_interval = retry_interval
+        self.listening = False
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        try:
+            broker.dispatch(json.loads(payload))
+        except ValueError:
+            logger.warning(f"Некорректное событие в канале {channel}: {payload!r}")
+
+    async def run(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await engine.connect()
+                raw = await conn.get_raw_connection()
+                await raw.driver_connection.add_listener(CHANNEL, self._on_notify)
+                self.listening = True
+                # Пока соединения не было, события могли потеряться
+                broker.reset_all()
+                while True:
+                    await asyncio.sleep(self.heartbeat_interval)
+                    await conn.execute(text("SELECT 1"))
+                    await conn.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка слушателя событий задач: {e}")
+            finally:
+                self.listening = False
+                if conn is not None:
+                    # Соединение с LISTEN не должно вернуться в пул
+                    try:
+                        await conn.invalidate()
+                        await conn.close()
+                    except Exception as e:
+                        logger.warning(f"Не удалось закрыть соединение слушателя: {e}")
+            await asyncio.sleep(self.retry_interval)
+
+
+broker = Broker(queue_size=settings.realtime_queue_size, max_connections=settings.realtime_max_connections)
+listener = NotifyListener(
+    heartbeat_interval=settings.realtime_heartbeat_seconds,
+    retry_interval=settings.leader_retry_seconds,
+)
+
+
+def uses_notify() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+async def publish(db: AsyncSession, event: dict[str, Any], commit: bool = True) -> None:
+    """
+    Событие об изменении задачи всем подключённым участникам.
+
+    В PostgreSQL это NOTIFY в транзакции вызывающего: событие уходит только при commit.
+    С commit=False оно будет отправлено вместе со следующим commit вызывающего.
+    """
+    if not settings.realtime_enabled:
+        return
+    if uses_notify():
+        await db.execute(select(func.pg_notify(CHANNEL, json.dumps(event, separators=(",", ":")))))
+        if commit:
+            await db.commit()
+    else:
+        broker.dispatch(event)
+
+
+def task_event(action: str, task) -> dict[str, Any]:
+    return {
+        "action": action,
+        "task_id": task.id,
+        "owner_id": task.owner_id,
+        "family_id": task.family_id,
+        "date": task.date.isoformat(),
+    }
+
+
+def batch_event(owner_id: int, family_id: Optional[int], count: int) -> dict[str, Any]:
+    """Одно событие на источник для пакета POST /tasks/batch (и импорта .ics) вместо события на каждую задачу."""
+    return {
+        "action": "batch",
+        "task_id": None,
+        "owner_id": owner_id,
+        "family_id": family_id,
+        "date": None,
+        "count": count,
+    }
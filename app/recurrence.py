@@ -0,0 +1,201 @@
+"""
+Повторяющиеся задачи: подмножество RRULE (RFC 5545) и развёртывание вхождений.
+
+Поддерживаются FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, UNTIL или COUNT и BYDAY (только WEEKLY,
+без номеров: BYDAY=MO,WE). Исключения (EXDATE) хранятся отдельно, в tasks.exdates.
+
+Серия — одна строка tasks; вхождения вычисляются генератором только для запрошенного периода.
+Для DAILY, WEEKLY и MONTHLY с днём месяца до 28-го первое вхождение периода и его номер
+(для COUNT) находятся арифметически, поэтому стоимость не зависит от давности начала серии.
+"""
+from __future__ import annotations
+
+import calendar
+from datetime import date, timedelta
+from typing import Collection, Iterator, NamedTuple, Optional
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_INTERVAL = 1000
+MAX_COUNT = 1000
+
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int = 1
+    until: Optional[date] = None
+    count: Optional[int] = None
+    byday: tuple[int, ...] = ()  # Дни недели для WEEKLY, 0 — понедельник
+
+
+def parse(value: str) -> Rule:
+    """Разбор RRULE ("FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10", префикс "RRULE:" допустим); ValueError при ошибке."""
+    parts: dict[str, str] = {}
+    for item in value.strip().upper().removeprefix("RRULE:").split(";"):
+        if not item:
+            continue
+        key, sep, val = item.partition("=")
+        if not sep or key in parts:
+            raise ValueError(f"Invalid RRULE part: {item!r}")
+        parts[key] = val.strip()
+
+    freq = parts.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError("RRULE FREQ must be DAILY, WEEKLY or MONTHLY")
+    interval = _positive_int(parts.pop("INTERVAL", "1"), "INTERVAL", MAX_INTERVAL)
+    until = count = None
+    if "UNTIL" in parts:
+        until = _parse_until(parts.pop("UNTIL"))
+    if "COUNT" in parts:
+        count = _positive_int(parts.pop("COUNT"), "COUNT", MAX_COUNT)
+    if until is not None and count is not None:
+        raise ValueError("RRULE cannot have both UNTIL and COUNT")
+    byday: tuple[int, ...] = ()
+    if "BYDAY" in parts:
+        if freq != "WEEKLY":
+            raise ValueError("RRULE BYDAY is supported only with FREQ=WEEKLY")
+        try:
+            byday = tuple(sorted({WEEKDAYS.index(day) for day in parts.pop("BYDAY").split(",")}))
+        except ValueError:
+            raise ValueError("RRULE BYDAY must list weekdays MO..SU") from None
+    # Недели всегда начинаются с понедельника
+    if parts.pop("WKST", "MO") != "MO":
+        raise ValueError("RRULE WKST other than MO is not supported")
+    if parts:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(sorted(parts))}")
+    return Rule(freq, interval, until, count, byday)
+
+
+def format_rule(rule: Rule) -> str:
+    """Каноническая запись правила (её и хранит tasks.rrule)."""
+    parts = [f"FREQ={rule.freq}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.byday:
+        parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in rule.byday))
+    if rule.until is not None:
+        parts.append(f"UNTIL={rule.until:%Y%m%d}")
+    if rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    return ";".join(parts)
+
+
+def normalize(value: str) -> str:
+    return format_rule(parse(value))
+
+
+def _positive_int(value: str, name: str, limit: int) -> int:
+    if not value.isdigit() or not 1 <= int(value) <= limit:
+        raise ValueError(f"RRULE {name} must be an integer from 1 to {limit}")
+    return int(value)
+
+
+def _parse_until(value: str) -> date:
+    # Дата или дата-время (YYYYMMDD[THHMMSS[Z]]): задачи календаря привязаны к дням
+    try:
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    except ValueError:
+        raise ValueError("RRULE UNTIL must be a date YYYYMMDD") from None
+
+
+def _add_months(day: date, months: int) -> Optional[date]:
+    """Тот же день месяца через months месяцев или None, если такого дня в месяце нет."""
+    index = day.month - 1 + months
+    year, month = day.year + index // 12, index % 12 + 1
+    if year > date.max.year or day.day > calendar.monthrange(year, month)[1]:
+        return None
+    return date(year, month, day.day)
+
+
+def _candidates(dtstart: date, rule: Rule, start: date) -> Iterator[tuple[int, date]]:
+    """
+    Вхождения без учёта UNTIL/COUNT/EXDATE не раньше start: пары (номер вхождения, дата).
+    Номер считается от dtstart с нуля и нужен для COUNT.
+    """
+    if rule.freq == "DAILY":
+        index = max(0, -(-(start - dtstart).days // rule.interval))
+        step = timedelta(days=rule.interval)
+        day = dtstart + index * step
+        while True:
+            yield index, day
+            index += 1
+            day += step
+
+    elif rule.freq == "WEEKLY":
+        weekdays = rule.byday or (dtstart.weekday(),)
+        first_monday = dtstart - timedelta(days=dtstart.weekday())
+        # В первой неделе вхождения до dtstart не считаются
+        in_first_week = sum(1 for weekday in weekdays if weekday >= dtstart.weekday())
+        period = max(0, ((start - first_monday).days // 7) // rule.interval)
+        while True:
+            monday = first_monday + timedelta(weeks=period * rule.interval)
+            index = 0 if period == 0 else in_first_week + (period - 1) * len(weekdays)
+            for weekday in weekdays:
+                day = monday + timedelta(days=weekday)
+                if day < dtstart:
+                    continue
+                if day >= start:
+                    yield index, day
+                index += 1
+            period += 1
+
+    else:
+        period = 0
+        if dtstart.day <= 28:
+            # Такой день есть в каждом месяце: номер вхождения равен номеру периода
+            months = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+            period = max(0, months // rule.interval)
+        index = period
+        while True:
+            day = _add_months(dtstart, period * rule.interval)
+            if day is not None:
+                if day >= start:
+                    yield index, day
+                index += 1
+            elif dtstart.year + (period * rule.interval) // 12 > date.max.year:
+                return
+            period += 1
+
+
+def occurrences(
+    dtstart: date,
+    rule: Rule,
+    start: date,
+    end: date,
+    exdates: Collection[date] = (),
+) -> Iterator[date]:
+    """Даты вхождений серии в [start, end] по возрастанию, без исключённых."""
+    start = max(start, dtstart)
+    if rule.until is not None:
+        end = min(end, rule.until)
+    if start > end:
+        return
+    try:
+        for index, day in _candidates(dtstart, rule, start):
+            if day > end or (rule.count is not None and index >= rule.count):
+                return
+            if day not in exdates:
+                yield day
+    except OverflowError:
+        # Дошли до date.max
+        return
+
+
+def is_occurrence(dtstart: date, rule: Rule, day: date) -> bool:
+    """Приходится ли на day вхождение серии (исключения не учитываются)."""
+    return next(occurrences(dtstart, rule, day, day), None) == day
+
+
+def series_end(dtstart: date, rule: Rule) -> Optional[date]:
+    """
+    Дата, после которой вхождений нет (tasks.recurrence_end), или None для бесконечной серии.
+    Для UNTIL это сам UNTIL, для COUNT — последнее вхождение (не больше MAX_COUNT шагов).
+    """
+    if rule.until is not None:
+        return max(rule.until, dtstart)
+    if rule.count is not None:
+        last = dtstart
+        for last in occurrences(dtstart, rule, dtstart, date.max):
+            pass
+        return last
+    return None
@@ -1,12 +1,13 @@
 import uuid
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
 from app import schemas, crud, models
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, invalidate_user_sessions, verified_family_roles
+from app.etags import not_modified, request_etag, set_etag
 from app.database import get_async_db
 
 router = APIRouter(prefix="/families", tags=["families"])
@@ -17,13 +18,22 @@ logger = logging.getLogger(__name__)
 # -----------------------------------------------------------
 @router.get("", response_model=list[schemas.FamilyRead])
 async def list_families(
+    request: Request,
+    response: Response,
     current_user: models.User = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db),
 ):
     """
     Асинхронно возвращает список групп, в которых состоит текущий пользователь.
     Для асинхронной загрузки связей используем selectinload.
+    Список меняется только вместе с эпохой членства, по ней строится ETag (If-None-Match -> 304).
     """
+    epoch = await crud.get_membership_epoch(db, current_user.id)
+    etag = request_etag(request, current_user.id, epoch)
+    if cached := not_modified(request, etag):
+        return cached
+    set_etag(response, etag)
+
     # Загружаем пользователя с его членством в группах
     # selectinload(User.families) загружает FamilyMembership за один запрос
     user_stmt = select(models.User).where(models.User.id == current_user.id).options(
@@ -70,7 +80,9 @@ async def create_family(
         role="owner"
     )
     db.add(membership)
+    await crud.bump_membership_epoch(db, current_user.id)
     await db.commit()
+    invalidate_user_sessions(current_user.id)
     await db.refresh(new_family)
 
     return new_family
@@ -91,6 +103,7 @@ async def join_family_by_invite(
     logger.info(f"User {current_user.id} attempting to join family with code: {payload.invite_code}")
     try:
         family = await crud.add_user_to_family(db, current_user.id, payload.invite_code)
+        invalidate_user_sessions(current_user.id)
         logger.info(f"User {current_user.id} joined family {family.id}")
         return family
     except ValueError as e:
@@ -126,6 +139,7 @@ async def leave_family(
             raise HTTPException(status_code=404, detail="Family membership not found")
             
         await crud.remove_user_from_family(db, current_user.id, family_id)
+        invalidate_user_sessions(current_user.id)
         logger.info(f"User {current_user.id} left family {family_id}")
         return None
     except HTTPException:
@@ -145,14 +159,16 @@ async def leave_family(
 @router.get("/{family_id}/members", response_model=list[schemas.FamilyMemberRead])
 async def list_family_members(
     family_id: int,
-    current_user: models.User = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db),
 ):
     """
     Получение списка участников семьи.
     """
-    # Проверяем, что пользователь является участником
-    if not await crud.is_member(db, current_user.id, family_id):
+    # Проверяем, что пользователь является участником: по правам из сессии, если эпоха членства
+    # не изменилась (иначе его могли заблокировать или удалить на другом воркере), или по БД
+    family_roles = await verified_family_roles(db, current_user)
+    if (family_roles is None or family_id not in family_roles) and not await crud.is_member(db, current_user.id, family_id):
         raise HTTPException(status_code=404, detail="Family not found or access denied")
     
     memberships = await crud.list_family_members(db, family_id)
@@ -187,6 +203,7 @@ async def block_family_member(
     """
     try:
         await crud.block_family_member(db, current_user.id, family_id, user_id)
+        invalidate_user_sessions(user_id)
         return None
     except PermissionError:
         raise HTTPException(status_code=403, detail="Only owner can block members")
@@ -209,6 +226,7 @@ async def unblock_family_member(
     """
     try:
         await crud.unblock_family_member(db, current_user.id, family_id, user_id)
+        invalidate_user_sessions(user_id)
         return None
     except PermissionError:
         raise HTTPException(status_code=403, detail="Only owner can unblock members")
@@ -231,6 +249,7 @@ async def remove_family_member(
     """
     try:
         await crud.remove_family_member(db, current_user.id, family_id, user_id)
+        invalidate_user_sessions(user_id)
         return None
     except PermissionError:
         raise HTTPException(status_code=403, detail="Only owner can remove members")
@@ -1,106 +1,118 @@
 """
 Модуль для выполнения миграций базы данных.
+
+Схема версионируется Alembic (ревизии в migrations/versions). Миграции запускаются
+один раз перед выкаткой отдельной командой:
+
+    python -m app.routers.migrations      # или: alembic upgrade head
+
+Воркеры API при старте только сверяют версию схемы (один запрос к alembic_version).
 """
 import asyncio
 import logging
 import sys
+import zlib
+from pathlib import Path
+from typing import Optional
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
 from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.config import get_settings
 from app.database import engine
 
 logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Ключ advisory lock: одновременный запуск миграций из нескольких процессов выполняется по очереди
+MIGRATIONS_LOCK_KEY = zlib.crc32(b"tgcalendar:migrations")
+
+
+def alembic_config() -> Config:
+    cfg = Config(str(ALEMBIC_INI))
+    # Логирование уже настроено приложением, не перезаписываем его из alembic.ini
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def head_revision() -> str:
+    """Последняя ревизия в migrations/versions (без обращения к БД)."""
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
 
-async def column_exists(conn, table_name: str, column_name: str) -> bool:
-    """Проверка существования колонки в таблице."""
-    result = await conn.execute(
-        text("""
-            SELECT 1 FROM information_schema.columns 
-            WHERE table_name = :table_name 
-            AND column_name = :column_name
-        """),
-        {"table_name": table_name, "column_name": column_name}
-    )
-    return result.scalar() is not None
 
+async def get_schema_version(conn) -> Optional[str]:
+    """Текущая ревизия схемы или None, если база ещё не версионирована."""
+    try:
+        return await conn.scalar(text("SELECT version_num FROM alembic_version"))
+    except DBAPIError:
+        # Таблицы alembic_version нет: пустая база или схема до перехода на Alembic
+        await conn.rollback()
+        return None
 
-async def run_migrations():
+
+def _upgrade(sync_conn) -> None:
+    cfg = alembic_config()
+    cfg.attributes["connection"] = sync_conn
+    command.upgrade(cfg, "head")
+
+
+async def run_migrations() -> None:
+    """Обновление схемы до последней ревизии."""
+    head = head_revision()
+    is_postgres = engine.dialect.name == "postgresql"
+    async with engine.connect() as conn:
+        current = await get_schema_version(conn)
+        if current == head:
+            logger.info(f"✓ Схема БД актуальна ({head})")
+            return
+
+        logger.info(f"Начало выполнения миграций: {current or 'нет версии'} -> {head}")
+        await conn.commit()
+        if is_postgres:
+            # Ждём через pg_try_advisory_lock вне транзакции: ожидающий pg_advisory_lock держал бы
+            # снапшот, и CREATE INDEX CONCURRENTLY у владельца блокировки ждал бы нас (deadlock)
+            while not await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY}):
+                await conn.commit()
+                await asyncio.sleep(1)
+            await conn.commit()
+        try:
+            # Alembic сам пропускает уже применённые ревизии, в т.ч. применённые процессом,
+            # который держал блокировку до нас
+            await conn.run_sync(_upgrade)
+            await conn.commit()
+        finally:
+            if is_postgres:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+                await conn.commit()
+    logger.info("Миграции завершены!")
+
+
+async def ensure_schema() -> bool:
     """
-    Выполнение миграций для добавления новых колонок.
+    Проверка версии схемы при старте процесса.
+
+    Если схема устарела, миграции применяются только при MIGRATE_ON_STARTUP=true;
+    иначе ошибка пишется в лог, а процесс продолжает работу.
     """
-    logger.info("Начало выполнения миграций...")
-    
-    async with engine.begin() as conn:
-        # Миграция 1: Добавление колонки telegram_notifications_enabled в таблицу users
-        if not await column_exists(conn, "users", "telegram_notifications_enabled"):
-            try:
-                await conn.execute(
-                    text("ALTER TABLE users ADD COLUMN telegram_notifications_enabled BOOLEAN NOT NULL DEFAULT TRUE")
-                )
-                logger.info("✓ Добавлена колонка telegram_notifications_enabled в таблицу users")
-            except Exception as e:
-                logger.error(f"✗ Ошибка при добавлении telegram_notifications_enabled: {e}")
-        else:
-            logger.info("✓ Колонка telegram_notifications_enabled уже существует")
-        
-        # Миграция 2: Добавление колонки blocked в таблицу family_memberships
-        if not await column_exists(conn, "family_memberships", "blocked"):
-            try:
-                await conn.execute(
-                    text("ALTER TABLE family_memberships ADD COLUMN blocked BOOLEAN NOT NULL DEFAULT FALSE")
-                )
-                logger.info("✓ Добавлена колонка blocked в таблицу family_memberships")
-            except Exception as e:
-                logger.error(f"✗ Ошибка при добавлении blocked: {e}")
-        else:
-            logger.info("✓ Колонка blocked уже существует")
-        
-        # Миграция 3: Добавление колонок для тегов, цвета и уведомлений в таблицу tasks
-        if not await column_exists(conn, "tasks", "tags"):
-            try:
-                await conn.execute(
-                    text("ALTER TABLE tasks ADD COLUMN tags JSON")
-                )
-                logger.info("✓ Добавлена колонка tags в таблицу tasks")
-            except Exception as e:
-                logger.error(f"✗ Ошибка при добавлении tags: {e}")
-        else:
-            logger.info("✓ Колонка tags уже существует")
-        
-        if not await column_exists(conn, "tasks", "color"):
-            try:
-                await conn.execute(
-                    text("ALTER TABLE tasks ADD COLUMN color VARCHAR(7)")
-                )
-                logger.info("✓ Добавлена колонка color в таблицу tasks")
-            except Exception as e:
-                logger.error(f"✗ Ошибка при добавлении color: {e}")
-        else:
-            logger.info("✓ Колонка color уже существует")
-        
-        if not await column_exists(conn, "tasks", "notify_before_days"):
-            try:
-                await conn.execute(
-                    text("ALTER TABLE tasks ADD COLUMN notify_before_days INTEGER")
-                )
-                logger.info("✓ Добавлена колонка notify_before_days в таблицу tasks")
-            except Exception as e:
-                logger.error(f"✗ Ошибка при добавлении notify_before_days: {e}")
-        else:
-            logger.info("✓ Колонка notify_before_days уже существует")
-        
-        if not await column_exists(conn, "tasks", "notify_before_hours"):
-            try:
-                await conn.execute(
-                    text("ALTER TABLE tasks ADD COLUMN notify_before_hours INTEGER")
-                )
-                logger.info("✓ Добавлена колонка notify_before_hours в таблицу tasks")
-            except Exception as e:
-                logger.error(f"✗ Ошибка при добавлении notify_before_hours: {e}")
-        else:
-            logger.info("✓ Колонка notify_before_hours уже существует")
-    
-    logger.info("Миграции завершены!")
+    head = head_revision()
+    async with engine.connect() as conn:
+        current = await get_schema_version(conn)
+    if current == head:
+        return True
+    if settings.migrate_on_startup:
+        await run_migrations()
+        return True
+    logger.error(
+        f"Схема БД устарела ({current or 'нет версии'}, ожидается {head}). "
+        f"Выполните `python -m app.routers.migrations` перед запуском приложения"
+    )
+    return False
 
 
 if __name__ == "__main__":
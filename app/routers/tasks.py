@@ -1,33 +1,399 @@
-from datetime import date
+import asyncio
+import base64
+import time
+from datetime import date, datetime, time as dt_time
 
-from fastapi import APIRouter, Depends, Query, status, HTTPException
+from pydantic_core import from_json, to_json
+from fastapi import APIRouter, Depends, Query, Request, Response, status, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession # 👈 1. Меняем импорт сессии SQLAlchemy
 
-from app import schemas, crud, models, notifications
-from app.dependencies import get_current_user
-from app.database import get_async_db # 👈 2. Меняем импорт генератора зависимостей
+from app import schemas, crud, models, jobs, realtime, ical
+from app.etags import not_modified, request_etag, set_etag
+from app.serializers import rows_to_json, rows_to_json_stream
+from app.task_cache import invalidate_tasks, task_cache
+from app.dependencies import get_current_user, invalidate_user_sessions, verified_family_roles
+from app.database import AsyncSessionLocal, get_async_db # 👈 2. Меняем импорт генератора зависимостей
+from app.config import get_settings
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
+MAX_TAG_FILTERS = 10
+
 
 # -----------------------------------------------------------
 # 1. GET /tasks
 # -----------------------------------------------------------
 @router.get("", response_model=list[schemas.TaskRead])
 async def list_tasks( # 👈 3. Функция стала async
+    request: Request,
     start: date = Query(...),
     end: date = Query(...),
     scope: str = Query("personal"),
     family_id: int | None = Query(default=None),
-    current_user: schemas.UserRead = Depends(get_current_user),
+    tags: list[str] = Query(default=[], max_length=MAX_TAG_FILTERS),
+    limit: int | None = Query(default=None, ge=1),
+    cursor: str | None = Query(default=None),
+    stream: bool = Query(False),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db), # 👈 4. Используем AsyncSession и get_async_db
 ):
     """
     Асинхронно возвращает список задач для заданного периода и области (личные/групповые).
+
+    Только для чтения: колонки TaskRead выбираются без ORM-объектов и сериализуются
+    сразу в JSON (response_model остаётся для схемы OpenAPI).
+    Поддерживает If-None-Match: если версии задач не менялись, отвечает 304 без выборки.
+    Помесячные выборки по личным задачам и семьям берутся из app.task_cache.
+    tags (можно несколько раз) — только задачи со всеми этими тегами; такие выборки не кэшируются.
+
+    С limit или cursor, а также для периода длиннее tasks_unpaged_max_days ответ — страница
+    (не больше tasks_page_size_max задач) в порядке даты, времени и id; курсор следующей
+    приходит в заголовке X-Next-Cursor. stream=true отдаёт весь период одним ответом,
+    который пишется по мере чтения строк серверным курсором.
+    """
+    stamp = await crud.get_tasks_stamp(db, current_user.id, scope, family_id)
+    etag = request_etag(request, current_user.id, stamp)
+    if cached := not_modified(request, etag):
+        return cached
+
+    settings = get_settings()
+    if stream:
+        # Поток читает свою сессию: соединение запроса освобождается сразу
+        await db.close()
+        response = StreamingResponse(
+            _stream_tasks_json(current_user.id, start, end, scope, family_id, tags),
+            media_type="application/json",
+        )
+        set_etag(response, etag)
+        return response
+    if limit is not None or cursor or (end - start).days >= settings.tasks_unpaged_max_days:
+        page_size = min(limit or settings.tasks_page_size, settings.tasks_page_size_max)
+        after = None
+        if cursor:
+            try:
+                day, start_time, task_id = _unpack_cursor(cursor)
+                after = (
+                    date.fromisoformat(day),
+                    dt_time.fromisoformat(start_time) if start_time is not None else None,
+                    int(task_id),
+                )
+            except (ValueError, TypeError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        rows = await crud.list_task_page(db, current_user.id, start, end, scope, family_id, page_size + 1, after, tags)
+        response = Response(content=rows_to_json(crud.TASK_READ_FIELDS, rows[:page_size]), media_type="application/json")
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            response.headers["X-Next-Cursor"] = _pack_cursor([last.date, last.start_time, last.id])
+        set_etag(response, etag)
+        return response
+
+    body = None
+    if task_cache is not None and not tags:
+        body = await task_cache.list_json(db, current_user.id, start, end, stamp)
+    if body is None:
+        rows = await crud.list_task_rows(db, current_user.id, start, end, scope, family_id, tags)
+        body = rows_to_json(crud.TASK_READ_FIELDS, rows)
+    response = Response(content=body, media_type="application/json")
+    set_etag(response, etag)
+    return response
+
+
+async def _stream_tasks_json(user_id: int, start: date, end: date, scope: str, family_id: int | None, tags: list[str]):
+    settings = get_settings()
+    async with AsyncSessionLocal() as db:
+        batches = crud.stream_task_rows(
+            db, user_id, start, end, scope, family_id, tags, batch_size=settings.tasks_stream_batch_size,
+        )
+        async for chunk in rows_to_json_stream(crud.TASK_READ_FIELDS, batches):
+            yield chunk
+
+
+@router.get("/export.ics")
+async def export_tasks(
+    request: Request,
+    scope: str = Query("personal"),
+    family_id: int | None = Query(default=None),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Все задачи области в формате iCalendar для Google/Apple Календаря: серии — событиями
+    с RRULE и EXDATE. Файл пишется потоком по мере чтения строк серверным курсором, поэтому
+    память не зависит от числа задач. Поддерживает If-None-Match, как GET /tasks.
+    """
+    stamp = await crud.get_tasks_stamp(db, current_user.id, scope, family_id)
+    etag = request_etag(request, current_user.id, stamp)
+    if cached := not_modified(request, etag):
+        return cached
+
+    # Поток читает свою сессию: соединение запроса освобождается сразу
+    await db.close()
+    response = StreamingResponse(
+        _stream_ics(current_user.id, scope, family_id),
+        media_type="text/calendar; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="tgcalendar.ics"'},
+    )
+    set_etag(response, etag)
+    return response
+
+
+async def _stream_ics(user_id: int, scope: str, family_id: int | None):
+    settings = get_settings()
+    stamp = ical.format_stamp(datetime.now())
+    yield ical.CALENDAR_HEADER
+    async with AsyncSessionLocal() as db:
+        batches = crud.stream_export_rows(db, user_id, scope, family_id, batch_size=settings.tasks_stream_batch_size)
+        async for rows in batches:
+            yield "".join(ical.format_event(row, stamp) for row in rows)
+    yield ical.CALENDAR_FOOTER
+
+
+@router.post("/import", response_model=schemas.TaskImportResult)
+async def import_tasks(
+    request: Request,
+    family_id: int | None = Query(default=None),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Импорт файла .ics (тело запроса как есть, text/calendar) в личные задачи или в семью family_id.
+
+    Файл разбирается по мере чтения тела и вставляется пачками по ics_import_batch_size
+    событий, каждая в своей транзакции. События с UID, который уже есть в календаре,
+    пропускаются, поэтому прерванный импорт можно повторить с тем же файлом.
+    """
+    settings = get_settings()
+    if int(request.headers.get("content-length") or 0) > settings.ics_import_max_bytes:
+        raise HTTPException(status_code=413, detail="File is too large")
+    events = ical.iter_events(_request_chunks(request, settings.ics_import_max_bytes))
+    try:
+        result = await crud.import_tasks(
+            db, current_user.id, events, family_id,
+            member_family_ids=await verified_family_roles(db, current_user),
+            batch_size=settings.ics_import_batch_size,
+        )
+    except PermissionError as exc:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    finally:
+        # Пачки, вставленные до ошибки, остаются: кэш сбрасывается в любом случае
+        await invalidate_tasks(current_user.id, family_id)
+
+    if result.imported:
+        await realtime.publish(db, realtime.batch_event(current_user.id, family_id, result.imported))
+    return result
+
+
+async def _request_chunks(request: Request, max_bytes: int):
+    """Тело запроса по кускам; 413, если оно больше max_bytes (Content-Length может не быть)."""
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail="File is too large")
+        yield chunk
+
+
+@router.get("/summary", response_model=list[schemas.DaySummary])
+async def tasks_summary(
+    request: Request,
+    response: Response,
+    start: date = Query(...),
+    end: date = Query(...),
+    scope: str = Query("personal"),
+    family_id: int | None = Query(default=None),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Сводка по дням для сетки календаря: количество задач, цвета и самое раннее время.
+    Полные задачи Mini App загружает через GET /tasks только для выбранного дня.
+    """
+    stamp = await crud.get_tasks_stamp(db, current_user.id, scope, family_id)
+    etag = request_etag(request, current_user.id, stamp)
+    if cached := not_modified(request, etag):
+        return cached
+
+    set_etag(response, etag)
+    return await crud.summarize_tasks(db, current_user.id, start, end, scope, family_id)
+
+
+@router.get("/tags", response_model=list[schemas.TagCount])
+async def tags_summary(
+    request: Request,
+    response: Response,
+    start: date = Query(...),
+    end: date = Query(...),
+    scope: str = Query("personal"),
+    family_id: int | None = Query(default=None),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Теги задач области за период с числом задач (фасеты для фильтра), по убыванию числа."""
+    stamp = await crud.get_tasks_stamp(db, current_user.id, scope, family_id)
+    etag = request_etag(request, current_user.id, stamp)
+    if cached := not_modified(request, etag):
+        return cached
+
+    set_etag(response, etag)
+    return await crud.summarize_tags(db, current_user.id, start, end, scope, family_id)
+
+
+@router.get("/tags/suggest", response_model=list[schemas.TagCount])
+async def suggest_tags(
+    prefix: str = Query("", max_length=100),
+    scope: str = Query("personal"),
+    family_id: int | None = Query(default=None),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Автодополнение тегов: теги области, начинающиеся с prefix, самые частые первыми."""
+    return await crud.suggest_tags(db, current_user.id, prefix, scope, family_id, limit)
+
+
+def _pack_cursor(values: list) -> str:
+    """Непрозрачный курсор: JSON-массив в base64url без выравнивания."""
+    return base64.urlsafe_b64encode(to_json(values)).decode().rstrip("=")
+
+
+def _unpack_cursor(cursor: str):
+    """Значения курсора; ValueError, если он повреждён."""
+    return from_json(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+
+def _encode_cursor(stamp: crud.TasksStamp) -> str:
+    return _pack_cursor([stamp.epoch, stamp.personal_version, stamp.families, int(time.time())])
+
+
+def _decode_cursor(cursor: str) -> tuple[crud.TasksStamp, int] | None:
+    try:
+        epoch, personal_version, families, issued_at = _unpack_cursor(cursor)
+        stamp = crud.TasksStamp(epoch, personal_version, tuple((int(f), int(v)) for f, v in families))
+        return stamp, int(issued_at)
+    except (ValueError, TypeError):
+        return None
+
+
+@router.get("/changes", response_model=schemas.TaskChanges)
+async def task_changes(
+    since: str | None = Query(default=None),
+    scope: str = Query("personal"),
+    family_id: int | None = Query(default=None),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Дельта-синхронизация: задачи области, изменённые и удалённые после курсора since.
+
+    Курсор — штамп версий источников (тот же, что у ETag) и время выдачи. Если since нет,
+    он выдан для другого набора семей или старше срока хранения следов удалённых задач,
+    ответ приходит с reset=true: клиент загружает задачи заново и продолжает с нового курсора.
+    """
+    stamp = await crud.get_tasks_stamp(db, current_user.id, scope, family_id)
+    changes = schemas.TaskChanges(cursor=_encode_cursor(stamp), reset=True)
+    decoded = _decode_cursor(since) if since else None
+    if decoded is None:
+        return changes
+
+    previous, issued_at = decoded
+    retention = get_settings().task_tombstone_retention_days * 86400
+    if (
+        previous.epoch != stamp.epoch
+        or (previous.personal_version is None) != (stamp.personal_version is None)
+        or {f for f, _ in previous.families} != {f for f, _ in stamp.families}
+        or time.time() - issued_at > retention
+    ):
+        return changes
+
+    rows, deleted = await crud.list_task_changes(db, current_user.id, previous, stamp)
+    changes.reset = False
+    changes.changed = [schemas.TaskRead.model_validate(row) for row in rows]
+    changes.deleted = deleted
+    return changes
+
+
+@router.get("/search", response_model=list[schemas.TaskRead])
+async def search_tasks(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: str = Query("personal"),
+    family_id: int | None = Query(default=None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(default=None),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Поиск задач области по названию, тегам и описанию (каждое слово q — префикс).
+
+    Результаты по убыванию релевантности. Если есть следующая страница, её курсор
+    приходит в заголовке X-Next-Cursor и передаётся обратно параметром cursor.
+    Серия находится одной задачей (с датой первого вхождения).
+    """
+    after = None
+    if cursor:
+        try:
+            rank, task_id = _unpack_cursor(cursor)
+            after = (float(rank), int(task_id))
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = await crud.search_tasks(db, current_user.id, q, scope, family_id, limit + 1, after)
+    response = Response(content=rows_to_json(crud.TASK_READ_FIELDS, rows[:limit]), media_type="application/json")
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers["X-Next-Cursor"] = _pack_cursor([last.rank, last.id])
+    return response
+
+
+async def _event_stream(subscriber: realtime.Subscriber):
+    """События подписчика в формате SSE; в простое — комментарии-heartbeat."""
+    settings = get_settings()
+    deadline = time.monotonic() + settings.realtime_max_stream_seconds
+    try:
+        while time.monotonic() < deadline:
+            try:
+                data = await asyncio.wait_for(subscriber.queue.get(), timeout=settings.realtime_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if data is realtime.RESET or subscriber.closed:
+                yield "event: reset\ndata: {}\n\n"
+                return
+            yield f"data: {data}\n\n"
+    finally:
+        realtime.broker.unsubscribe(subscriber)
+
+
+@router.get("/stream")
+async def task_stream(
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    # 5. Добавляем await перед вызовом асинхронной CRUD-функции
-    tasks = await crud.list_tasks(db, current_user.id, start, end, scope, family_id)
-    return tasks
+    Поток событий об изменениях задач пользователя и его семей (Server-Sent Events).
+
+    Событие — {"action", "task_id", "owner_id", "family_id", "date"}; сами изменения клиент
+    забирает через GET /tasks/changes. Событие reset означает, что часть событий потеряна:
+    клиент синхронизируется и переподключается. Поток закрывается через
+    realtime_max_stream_seconds, чтобы права в семьях перепроверялись при переподключении.
+    """
+    # Семьи сверяются с эпохой членства: закэшированная сессия могла устареть на этом воркере
+    family_roles = await verified_family_roles(db, current_user)
+    if family_roles is None:
+        family_roles = (await crud.get_membership_claims(db, current_user.id)).families
+    # Соединение с БД не должно удерживаться на время потока
+    await db.close()
+    subscriber = realtime.broker.subscribe(current_user.id, family_roles)
+    if subscriber is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many open streams")
+    return StreamingResponse(
+        _event_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # -----------------------------------------------------------
@@ -36,26 +402,37 @@ async def list_tasks( # 👈 3. Функция стала async
 @router.post("", response_model=schemas.TaskRead, status_code=status.HTTP_201_CREATED)
 async def create_task( # 👈 3. Функция стала async
     payload: schemas.TaskCreate,
-    current_user: schemas.UserRead = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db), # 👈 4. Используем AsyncSession и get_async_db
 ):
     """
     Асинхронное создание новой задачи.
     """
-    # Создаем задачу
-    task = await crud.create_task(db, current_user.id, payload)
+    # Создаем задачу; событие потока и уведомление (его отправит фоновый воркер)
+    # фиксируются в той же транзакции
+    try:
+        task = await crud.create_task(
+            db, current_user.id, payload,
+            member_family_ids=await verified_family_roles(db, current_user),
+            commit=False,
+        )
+    except PermissionError as exc:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
+    await realtime.publish(db, realtime.task_event("created", task), commit=False)
+    await jobs.enqueue(db, "task_notice", {
+        "event": "created",
+        "user_id": current_user.id,
+        "task_title": task.title,
+        "task_date": str(task.date),
+        "family_id": task.family_id,
+    }, commit=False)
+    await db.commit()
+    await invalidate_tasks(task.owner_id, task.family_id)
     
     # Если выбраны уведомления (за день или за час), автоматически включаем уведомления для пользователя
     if payload.notify_before_days or payload.notify_before_hours:
         await crud.enable_user_notifications(db, current_user.id)
-    
-    # Отправляем уведомление о создании задачи
-    await notifications.notify_task_created(
-        user_id=current_user.id,
-        task_title=task.title,
-        task_date=str(task.date),
-        db=db
-    )
+        invalidate_user_sessions(current_user.id)
     
     return task
 
@@ -64,23 +441,31 @@ async def create_task( # 👈 3. Функция стала async
 async def update_task(
     task_id: int,
     payload: schemas.TaskUpdate,
-    current_user: schemas.UserRead = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db),
 ):
     try:
-        task = await crud.update_task(db, current_user.id, task_id, payload)
+        task = await crud.update_task(
+            db, current_user.id, task_id, payload,
+            member_family_ids=await verified_family_roles(db, current_user),
+            commit=False,
+        )
+        await realtime.publish(db, realtime.task_event("updated", task), commit=False)
+        # Уведомление об обновлении задачи отправит фоновый воркер
+        await jobs.enqueue(db, "task_notice", {
+            "event": "updated",
+            "user_id": current_user.id,
+            "task_title": task.title,
+            "task_date": str(task.date),
+            "family_id": task.family_id,
+        }, commit=False)
+        await db.commit()
+        await invalidate_tasks(task.owner_id, task.family_id)
         
         # Если выбраны уведомления (за день или за час), автоматически включаем уведомления для пользователя
         if payload.notify_before_days or payload.notify_before_hours:
             await crud.enable_user_notifications(db, current_user.id)
-        
-        # Отправляем уведомление об обновлении задачи
-        await notifications.notify_task_updated(
-            user_id=current_user.id,
-            task_title=task.title,
-            task_date=str(task.date),
-            db=db
-        )
+            invalidate_user_sessions(current_user.id)
         
         return task
     except PermissionError as exc:
@@ -89,27 +474,161 @@ async def update_task(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
 
 
+@router.patch("/{task_id}/occurrences/{occurrence_date}", response_model=schemas.TaskRead)
+async def update_occurrence(
+    task_id: int,
+    occurrence_date: date,
+    payload: schemas.TaskUpdate,
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Изменение одного вхождения повторяющейся серии (например, перенос в канбане).
+    Возвращает изменённое вхождение — отдельную задачу с series_id и occurrence_date.
+    """
+    try:
+        task = await crud.override_occurrence(
+            db, current_user.id, task_id, occurrence_date, payload,
+            member_family_ids=await verified_family_roles(db, current_user),
+            commit=False,
+        )
+    except PermissionError as exc:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+
+    await realtime.publish(db, realtime.task_event("updated", task), commit=False)
+    await jobs.enqueue(db, "task_notice", {
+        "event": "updated",
+        "user_id": current_user.id,
+        "task_title": task.title,
+        "task_date": str(task.date),
+        "family_id": task.family_id,
+    }, commit=False)
+    await db.commit()
+    await invalidate_tasks(task.owner_id, task.family_id)
+    return task
+
+
+@router.delete("/{task_id}/occurrences/{occurrence_date}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_occurrence(
+    task_id: int,
+    occurrence_date: date,
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Удаление одного вхождения повторяющейся серии; остальные вхождения остаются."""
+    try:
+        series = await crud.delete_occurrence(
+            db, current_user.id, task_id, occurrence_date,
+            member_family_ids=await verified_family_roles(db, current_user),
+            commit=False,
+        )
+    except PermissionError as exc:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+
+    await realtime.publish(db, realtime.task_event("updated", series), commit=False)
+    await jobs.enqueue(db, "task_notice", {
+        "event": "deleted",
+        "user_id": current_user.id,
+        "task_title": f"{series.title} ({occurrence_date:%d.%m.%Y})",
+        "family_id": series.family_id,
+    }, commit=False)
+    await db.commit()
+    await invalidate_tasks(series.owner_id, series.family_id)
+
+
 @router.delete("/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_task(
     task_id: int,
-    current_user: schemas.UserRead = Depends(get_current_user),
+    current_user: schemas.CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db),
 ):
     try:
         # Получаем задачу перед удалением для уведомления
         task = await db.get(models.Task, task_id)
         task_title = task.title if task else "Задача"
+        task_family_id = task.family_id if task else None
+        event = realtime.task_event("deleted", task) if task else None
         
-        await crud.delete_task(db, current_user.id, task_id)
-        
-        # Отправляем уведомление об удалении задачи
+        await crud.delete_task(
+            db, current_user.id, task_id,
+            member_family_ids=await verified_family_roles(db, current_user),
+            commit=False,
+        )
+        # Уведомление об удалении задачи отправит фоновый воркер
         if task:
-            await notifications.notify_task_deleted(
-                user_id=current_user.id,
-                task_title=task_title,
-                db=db
-            )
+            await realtime.publish(db, event, commit=False)
+            await jobs.enqueue(db, "task_notice", {
+                "event": "deleted",
+                "user_id": current_user.id,
+                "task_title": task_title,
+                "family_id": task_family_id,
+            }, commit=False)
+        await db.commit()
+        if task:
+            await invalidate_tasks(task.owner_id, task_family_id)
     except PermissionError as exc:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
     except ValueError as exc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+
+
+# -----------------------------------------------------------
+# 3. POST /tasks/batch
+# -----------------------------------------------------------
+@router.post("/batch", response_model=list[schemas.TaskBatchResult])
+async def batch_tasks(
+    payload: schemas.TaskBatch,
+    current_user: schemas.CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Пакет create/update/delete одним запросом и одной транзакцией (канбан, импорт списков).
+
+    Возвращает результат каждой операции в порядке operations: status — код, который вернул бы
+    одиночный запрос. Ошибочные операции не применяются, остальные применяются; с atomic=true
+    при любой ошибке не применяется ни одна (status 424). Кэш, события потока и уведомление
+    в Telegram — по одному на затронутый источник (личные задачи или семья), а не на задачу.
+    """
+    outcome = await crud.apply_task_batch(
+        db, current_user.id, payload.operations,
+        member_family_ids=await verified_family_roles(db, current_user),
+        atomic=payload.atomic,
+        commit=False,
+    )
+    if not outcome.applied:
+        return outcome.results
+
+    # Личные задачи пакета принадлежат текущему пользователю, поэтому источник — family_id или None
+    notices: dict[int | None, dict[str, list[str]]] = {}
+    deleted_ids = {task.id for action, task in outcome.applied if action == "deleted"}
+    for action, task in outcome.applied:
+        if action == "updated" and task.id in deleted_ids:
+            continue
+        notices.setdefault(task.family_id, {"created": [], "updated": [], "deleted": []})[action].append(task.title)
+
+    for family_id, titles in notices.items():
+        count = sum(len(items) for items in titles.values())
+        await realtime.publish(db, realtime.batch_event(current_user.id, family_id, count), commit=False)
+        # Уведомление о пакете отправит фоновый воркер: одно сообщение на источник
+        await jobs.enqueue(db, "task_notice", {
+            "event": "batch",
+            "user_id": current_user.id,
+            "family_id": family_id,
+            **titles,
+        }, commit=False)
+
+    await db.commit()
+    for family_id in notices:
+        await invalidate_tasks(current_user.id, family_id)
+
+    if any(
+        operation.op != "delete" and (operation.notify_before_days or operation.notify_before_hours)
+        for operation in payload.operations
+    ):
+        await crud.enable_user_notifications(db, current_user.id)
+        invalidate_user_sessions(current_user.id)
+    return outcome.results
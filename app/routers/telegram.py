@@ -0,0 +1,93 @@
+"""
+Webhook Telegram-бота (BOT_WEBHOOK_ENABLED=true): обновления принимает API-процесс вместо
+отдельного python -m bot.main с long polling.
+
+Dispatcher и обработчики — из bot.main, Bot (и его HTTP-сессия) — общий с доставкой
+уведомлений (app.notifications.get_bot), обработчики работают с БД через тот же
+AsyncSessionLocal и пул соединений. Запрос проверяет секрет X-Telegram-Bot-Api-Secret-Token,
+ставит обновление в пул обработки (bot/updates.py, порядок внутри чата сохраняется) и
+сразу отвечает 200: Telegram не ждёт обработчиков и не шлёт обновление повторно из-за
+медленной БД. Ответ задерживается только при заполненной очереди пула.
+"""
+import hmac
+import logging
+from urllib.parse import urlsplit
+
+from aiogram.types import Update
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+
+from app.config import get_settings
+from app.notifications import get_bot
+from bot.main import dp, get_update_pool, register_handlers
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/telegram", tags=["telegram"])
+
+WEBHOOK_PATH = "/telegram/webhook"
+
+
+def webhook_url() -> str:
+    """BOT_WEBHOOK_URL или тот же хост, что у WEBAPP_URL."""
+    settings = get_settings()
+    if settings.bot_webhook_url:
+        return settings.bot_webhook_url
+    parts = urlsplit(settings.webapp_url)
+    return f"{parts.scheme}://{parts.netloc}{WEBHOOK_PATH}"
+
+
+async def setup_webhook() -> None:
+    """
+    Подключает обработчики бота и регистрирует webhook в Telegram. Воркеры API стартуют
+    одновременно и регистрируют один и тот же адрес и секрет, поэтому ошибка (например,
+    лимит частоты setWebhook) только логируется.
+
+    max_connections=1: Telegram отправляет следующее обновление только после ответа на
+    предыдущее, иначе параллельные соединения доставляют обновления одного чата в разные
+    воркеры не по порядку. Маршрут отвечает сразу после постановки в пул, поэтому
+    пропускная способность почти не меняется.
+    """
+    settings = get_settings()
+    register_handlers()
+    if not settings.bot_webhook_secret:
+        logger.error("BOT_WEBHOOK_SECRET не задан: webhook отклоняет все обновления")
+        return
+    url = webhook_url()
+    try:
+        await get_bot().set_webhook(
+            url,
+            secret_token=settings.bot_webhook_secret,
+            max_connections=1,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+        logger.info(f"Webhook бота установлен: {url}")
+    except Exception as e:
+        logger.warning(f"Не удалось установить webhook бота {url}: {e}")
+
+
+async def shutdown_webhook(timeout: float = 10) -> None:
+    """Дожидается обработки очереди. Webhook не снимается: его обслуживают остальные воркеры."""
+    await get_update_pool().close(timeout)
+
+
+def stats() -> dict:
+    return get_update_pool().stats()
+
+
+@router.post("/webhook", include_in_schema=False)
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: str | None = Header(default=None),
+):
+    """Обновление от Telegram: проверка секрета, постановка в пул обработки, ответ 200."""
+    secret = get_settings().bot_webhook_secret
+    token = x_telegram_bot_api_secret_token or ""
+    if not secret or not hmac.compare_digest(token.encode(), secret.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid secret token")
+    try:
+        update = Update.model_validate(await request.json(), context={"bot": get_bot()})
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid update")
+
+    # Повторная доставка того же update_id (Telegram не дождался ответа) отбрасывается пулом
+    await get_update_pool().submit(update)
+    return Response(status_code=status.HTTP_200_OK)
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
 from app import schemas, crud, models
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, invalidate_user_sessions
+from app.etags import make_etag, not_modified, set_etag
 from app.database import get_async_db
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -11,6 +12,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/me", response_model=schemas.UserRead)
 async def read_me( # 👈 3. Функция стала async
+    request: Request,
     current_user: schemas.UserRead = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_db), # 👈 4. Используем AsyncSession и get_async_db
 ):
@@ -19,7 +21,17 @@ async def read_me( # 👈 3. Функция стала async
     """
     # 5. Добавляем await перед вызовом асинхронной CRUD-функции
     user = await crud.get_user(db, current_user.id)
-    return user
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Профиль — одна строка, поэтому ETag строится по самому ответу: 304 экономит только трафик
+    body = schemas.UserRead.model_validate(user).model_dump_json().encode()
+    etag = make_etag(body)
+    if cached := not_modified(request, etag):
+        return cached
+    response = Response(content=body, media_type="application/json")
+    set_etag(response, etag)
+    return response
 
 
 @router.patch("/me/notifications", response_model=schemas.UserRead)
@@ -38,6 +50,7 @@ async def update_notification_settings(
     user.telegram_notifications_enabled = payload.telegram_notifications_enabled
     await db.commit()
     await db.refresh(user)
+    invalidate_user_sessions(current_user.id)
     return user
 
 
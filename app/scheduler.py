@@ -1,107 +1,143 @@
 """
 Модуль для планирования уведомлений о предстоящих задачах.
+
+Моменты отправки заранее вычисляются при создании/изменении задачи и хранятся
+в таблице notification_outbox, поэтому стоимость одного прохода планировщика
+зависит от числа наступивших напоминаний, а не от числа задач. У повторяющейся серии
+одна строка на вид напоминания: после отправки она переводится на следующее вхождение.
+Сами сообщения доставляет воркер фоновых задач (app.jobs, вид "task_reminder").
 """
 import asyncio
 import logging
-from datetime import datetime, date, time, timedelta
-from typing import Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
 
-from app import models, crud, notifications
+from app import crud, jobs, models
+from app.config import get_settings
 from app.database import AsyncSessionLocal
+from app.leader import LeaderElector
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Как часто удаляются устаревшие следы удалённых задач (task_tombstones)
+TOMBSTONE_PRUNE_INTERVAL_SECONDS = 3600
+
+# Во всех воркерах uvicorn/gunicorn и отдельных процессах планировщик работает только у лидера
+scheduler_leader = LeaderElector(
+    "scheduler",
+    heartbeat_interval=settings.leader_heartbeat_seconds,
+    retry_interval=settings.leader_retry_seconds,
+)
 
 
-async def check_and_send_upcoming_notifications():
+async def dispatch_due_notifications(batch_size: int | None = None) -> int:
     """
-    Проверяет задачи, для которых нужно отправить уведомления, и отправляет их.
-    Вызывается периодически (каждые 30 минут).
+    Забирает пачку наступивших напоминаний и ставит их в очередь фоновых задач.
+
+    Строки блокируются через FOR UPDATE SKIP LOCKED и помечаются отправленными (строки серий —
+    переводятся на следующее вхождение) в той же транзакции, в которой для каждой строки
+    ставится задача "task_reminder". Напоминание не теряется при падении процесса и не
+    дублируется параллельными планировщиками; доставку с повторами недоставленным получателям
+    выполняет воркер задач. Возвращает количество обработанных строк.
     """
+    batch_size = batch_size or settings.scheduler_batch_size
     async with AsyncSessionLocal() as db:
         now = datetime.now()
-        today = now.date()
-        tomorrow = today + timedelta(days=1)
-        
-        # Находим все задачи с настройками уведомлений, которые начинаются сегодня или завтра
-        stmt = select(models.Task).where(
-            and_(
-                models.Task.date >= today,
-                models.Task.date <= tomorrow,
-                or_(
-                    models.Task.notify_before_days.isnot(None),
-                    models.Task.notify_before_hours.isnot(None)
-                )
+        stmt = (
+            select(models.NotificationOutbox, models.Task)
+            .join(models.Task, models.Task.id == models.NotificationOutbox.task_id)
+            .where(
+                models.NotificationOutbox.sent_at.is_(None),
+                models.NotificationOutbox.due_at <= now,
             )
+            .order_by(models.NotificationOutbox.due_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True, of=models.NotificationOutbox)
         )
-        
         result = await db.execute(stmt)
-        tasks = result.scalars().all()
-        
-        sent_count = 0
-        for task in tasks:
-            try:
-                # Уведомление за день до начала задачи
-                if task.notify_before_days and task.date == tomorrow:
-                    # Проверяем, что сейчас подходящее время (в течение дня)
-                    # Отправляем уведомление в первой половине дня (до 12:00)
-                    if now.hour < 12:
-                        task_time = task.start_time.strftime("%H:%M") if task.start_time else None
-                        await notifications.notify_upcoming_task(
-                            user_id=task.owner_id,
-                            task_title=task.title,
-                            task_date=task.date.strftime("%d.%m.%Y"),
-                            task_time=task_time,
-                            db=db
-                        )
-                        sent_count += 1
-                        logger.info(f"✓ Отправлено уведомление за день для задачи '{task.title}' (ID: {task.id})")
-                
-                # Уведомление за час до начала задачи
-                if task.notify_before_hours and task.start_time:
-                    # Вычисляем время начала задачи
-                    task_datetime = datetime.combine(task.date, task.start_time)
-                    notification_time = task_datetime - timedelta(hours=1)
-                    
-                    # Проверяем, что текущее время в пределах окна уведомления
-                    # (от времени уведомления до времени начала задачи, но не более чем за 2 часа)
-                    time_diff = (task_datetime - now).total_seconds() / 3600  # разница в часах
-                    
-                    if 0.5 <= time_diff <= 1.5:  # От 30 минут до 1.5 часов до начала
-                        await notifications.notify_upcoming_task(
-                            user_id=task.owner_id,
-                            task_title=task.title,
-                            task_date=task.date.strftime("%d.%m.%Y"),
-                            task_time=task.start_time.strftime("%H:%M"),
-                            db=db
-                        )
-                        sent_count += 1
-                        logger.info(f"✓ Отправлено уведомление за час для задачи '{task.title}' (ID: {task.id})")
-            
-            except Exception as e:
-                logger.error(f"✗ Ошибка при отправке уведомления для задачи {task.id}: {e}")
-        
-        if sent_count > 0:
-            logger.info(f"Всего отправлено {sent_count} уведомлений о предстоящих задачах")
+        rows = result.all()
+        if not rows:
+            return 0
+
+        for outbox, task in rows:
+            # Дата вхождения, о котором напоминание, — до перевода строки серии на следующее
+            task_date = outbox.occurrence_date or task.date
+            await jobs.enqueue(db, "task_reminder", {
+                "task_id": task.id,
+                "kind": outbox.kind,
+                "user_id": task.owner_id,
+                "family_id": task.family_id,
+                "task_title": task.title,
+                "task_date": task_date.strftime("%d.%m.%Y"),
+                "task_time": task.start_time.strftime("%H:%M") if task.start_time else None,
+            }, commit=False)
+            if not task.rrule or not crud.advance_series_reminder(outbox, task, now):
+                outbox.sent_at = now
+        await db.commit()
+
+        logger.info(f"Поставлено в очередь {len(rows)} напоминаний о предстоящих задачах")
+        return len(rows)
+
+
+async def seconds_until_next_due() -> float | None:
+    """Сколько секунд до ближайшего неотправленного напоминания (None — очередь пуста)."""
+    async with AsyncSessionLocal() as db:
+        next_due = await db.scalar(
+            select(func.min(models.NotificationOutbox.due_at)).where(
+                models.NotificationOutbox.sent_at.is_(None)
+            )
+        )
+    if next_due is None:
+        return None
+    return max((next_due - datetime.now()).total_seconds(), 0.0)
+
+
+async def prune_task_tombstones() -> int:
+    """Удаляет следы задач старше task_tombstone_retention_days (курсоры старше этого срока сбрасываются)."""
+    older_than = datetime.now() - timedelta(days=settings.task_tombstone_retention_days)
+    async with AsyncSessionLocal() as db:
+        return await crud.prune_task_tombstones(db, older_than)
 
 
 async def run_scheduler():
     """
     Запускает планировщик уведомлений.
-    Проверяет задачи каждые 15 минут для более точного тайминга.
+
+    После постановки наступивших напоминаний в очередь спит до ближайшего следующего, но не дольше
+    scheduler_max_sleep_seconds, чтобы подхватывать только что созданные задачи.
     """
     logger.info("Планировщик уведомлений запущен")
+    max_sleep = settings.scheduler_max_sleep_seconds
+    next_prune = 0.0
     while True:
+        delay = max_sleep
         try:
-            await check_and_send_upcoming_notifications()
+            if time.monotonic() >= next_prune:
+                next_prune = time.monotonic() + TOMBSTONE_PRUNE_INTERVAL_SECONDS
+                pruned = await prune_task_tombstones()
+                if pruned:
+                    logger.info(f"Удалено {pruned} следов удалённых задач")
+            # Выгребаем все наступившие напоминания пачками
+            while await dispatch_due_notifications() >= settings.scheduler_batch_size:
+                pass
+            next_due = await seconds_until_next_due()
+            if next_due is not None:
+                # Не меньше секунды: строки могли быть заблокированы другим планировщиком
+                delay = max(min(next_due, max_sleep), 1.0)
         except Exception as e:
             logger.error(f"Ошибка в планировщике уведомлений: {e}")
-        
-        # Ждем 15 минут до следующей проверки (для более точного тайминга уведомлений за час)
-        await asyncio.sleep(15 * 60)
+
+        await asyncio.sleep(delay)
+
+
+async def run_scheduler_as_leader():
+    """Участие в выборах лидера; планировщик работает, только пока процесс — лидер."""
+    await scheduler_leader.run(run_scheduler)
 
 
 if __name__ == "__main__":
+    # Отдельный процесс планировщика (для API при этом EMBEDDED_SCHEDULER=false)
     logging.basicConfig(level=logging.INFO)
-    asyncio.run(run_scheduler())
+    asyncio.run(run_scheduler_as_leader())
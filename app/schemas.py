@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from datetime import date, time
 import datetime
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
 
 from pydantic import BaseModel, Field, field_validator
 
+from app import recurrence
+
 
 class UserCreate(BaseModel):
     id: int
@@ -25,6 +27,17 @@ class UserRead(BaseModel):
         from_attributes = True
 
 
+class CurrentUser(UserRead):
+    """Пользователь текущего запроса вместе с подписанными в токене правами в семьях."""
+    family_roles: dict[int, str] = Field(default_factory=dict)  # family_id -> role (только незаблокированные)
+    membership_epoch: int = 0
+
+
+class MembershipClaims(BaseModel):
+    epoch: int = 0
+    families: dict[int, str] = Field(default_factory=dict)
+
+
 class NotificationSettingsUpdate(BaseModel):
     telegram_notifications_enabled: bool
 
@@ -70,6 +83,12 @@ class TaskBase(BaseModel):
     color: Optional[str] = Field(None, pattern=r"^#[0-9A-Fa-f]{6}$")  # HEX цвет
     notify_before_days: Optional[int] = Field(None, ge=0, le=365)
     notify_before_hours: Optional[int] = Field(None, ge=0, le=24)
+    rrule: Optional[str] = Field(None, max_length=255)  # Повторение: RRULE, например "FREQ=WEEKLY;BYDAY=MO,WE"
+
+    @field_validator("rrule")
+    @classmethod
+    def normalize_rrule(cls, value: Optional[str]) -> Optional[str]:
+        return recurrence.normalize(value) if value else None
 
 
 class TaskCreate(TaskBase):
@@ -78,6 +97,10 @@ class TaskCreate(TaskBase):
 
 class TaskRead(TaskBase):
     id: int
+    # Изменённое вхождение серии: id серии. Развёрнутые вхождения серии приходят с id серии,
+    # её rrule и датой вхождения в date и occurrence_date
+    series_id: Optional[int] = None
+    occurrence_date: Optional[datetime.date] = None
 
     class Config:
         from_attributes = True
@@ -95,3 +118,74 @@ class TaskUpdate(BaseModel):
     color: Optional[str] = Field(None, pattern=r"^#[0-9A-Fa-f]{6}$")
     notify_before_days: Optional[int] = Field(None, ge=0, le=365)
     notify_before_hours: Optional[int] = Field(None, ge=0, le=24)
+    rrule: Optional[str] = Field(None, max_length=255)  # "" — убрать повторение
+
+    @field_validator("rrule")
+    @classmethod
+    def normalize_rrule(cls, value: Optional[str]) -> Optional[str]:
+        return recurrence.normalize(value) if value else value
+
+
+class DaySummary(BaseModel):
+    """Сводка по дню для сетки календаря: без описаний и тегов."""
+    date: date
+    count: int
+    colors: list[Optional[str]]  # Различные цвета задач дня, по времени начала (None — цвет по умолчанию)
+    first_start_time: Optional[time] = None
+
+
+class TagCount(BaseModel):
+    """Тег и число задач с ним (GET /tasks/tags и /tasks/tags/suggest)."""
+    tag: str
+    count: int
+
+
+class TaskImportResult(BaseModel):
+    """Итог POST /tasks/import."""
+    imported: int = 0
+    duplicates: int = 0  # UID уже есть в календаре (или повторяется в файле)
+    invalid: int = 0  # События без даты начала или с ошибками разбора
+    rrule_dropped: int = 0  # Повторение не поддерживается: импортировано только первое вхождение
+
+
+class TaskChanges(BaseModel):
+    """Изменения задач области после курсора (GET /tasks/changes)."""
+    cursor: str  # Передаётся в следующий запрос как since
+    reset: bool = False  # Курсор недействителен: клиент заново загружает задачи целиком
+    changed: list[TaskRead] = Field(default_factory=list)
+    deleted: list[int] = Field(default_factory=list)  # id удалённых задач
+
+
+class TaskBatchCreate(TaskCreate):
+    op: Literal["create"]
+
+
+class TaskBatchUpdate(TaskUpdate):
+    op: Literal["update"]
+    id: int
+
+
+class TaskBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+
+TaskBatchOperation = Annotated[
+    Union[TaskBatchCreate, TaskBatchUpdate, TaskBatchDelete],
+    Field(discriminator="op"),
+]
+
+
+class TaskBatch(BaseModel):
+    """Набор операций POST /tasks/batch; выполняются по порядку в одной транзакции."""
+    operations: list[TaskBatchOperation] = Field(min_length=1, max_length=1000)
+    atomic: bool = False  # При ошибке хотя бы одной операции не применять ни одну
+
+
+class TaskBatchResult(BaseModel):
+    """Результат операции пакета, в порядке operations."""
+    op: str
+    status: int  # HTTP-код, который вернул бы одиночный запрос; 424 — не применена из-за atomic
+    id: Optional[int] = None
+    task: Optional[TaskRead] = None  # Для create и update
+    error: Optional[str] = None
@@ -0,0 +1,82 @@
+"""
+Полнотекстовый поиск по задачам: название, теги и описание.
+
+PostgreSQL: хранимая генерируемая колонка tasks.search_vector (tsvector с весами A/B/C
+для названия, тегов и описания) и GIN-индекс по ней; ранжирование — ts_rank.
+SQLite (разработка): FTS5-таблица tasks_fts (rowid — id задачи), которую ведут триггеры;
+ранжирование — bm25 с теми же приоритетами полей.
+
+Колонка, индекс и FTS5-таблица не отображаются в ORM: их создают DDL-события при
+create_all (см. app.models) и ревизии 0006 и 0007. Поисковая строка разбивается на слова,
+каждое ищется как префикс (поиск по мере ввода), все слова должны встретиться.
+"""
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+TEXT_SEARCH_CONFIG = "russian"
+MAX_TERMS = 8
+
+SEARCH_VECTOR_COLUMN = "search_vector"
+SEARCH_VECTOR_INDEX = "ix_tasks_search_vector"
+FTS_TABLE = "tasks_fts"
+
+# tags (jsonb) индексируется текстом массива: кавычки и скобки парсер пропускает
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(tags::text, '')), 'B') || "
+    f"setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')), 'C')"
+)
+
+POSTGRESQL_COLUMN_DDL = (
+    f"ALTER TABLE tasks ADD COLUMN IF NOT EXISTS {SEARCH_VECTOR_COLUMN} tsvector "
+    f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+)
+
+POSTGRESQL_INDEX_DDL = f"CREATE INDEX IF NOT EXISTS {SEARCH_VECTOR_INDEX} ON tasks USING gin ({SEARCH_VECTOR_COLUMN})"
+
+# Порядок колонок FTS5 задаёт веса bm25 (см. FTS_WEIGHTS). Таблица без хранимого текста
+# (content=''): rowid — id задачи, теги индексируются значениями массива, а не JSON-текстом
+_FTS_COLUMNS = "title, tags, description"
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+
+def _fts_values(row: str) -> str:
+    return f"{row}.id, {row}.title, (SELECT group_concat(value, ' ') FROM json_each({row}.tags)), {row}.description"
+
+
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_FTS_COLUMNS}, content='', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_FTS_COLUMNS}) VALUES ({_fts_values('new')}); END",
+    f"CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_FTS_COLUMNS}) VALUES ('delete', {_fts_values('old')}); END",
+    f"CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, tags, description ON tasks BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_FTS_COLUMNS}) VALUES ('delete', {_fts_values('old')}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_FTS_COLUMNS}) VALUES ({_fts_values('new')}); END",
+)
+
+
+def terms(query: str) -> list[str]:
+    """Слова запроса в нижнем регистре (не больше MAX_TERMS, без повторов)."""
+    words = [word for word in re.split(r"[\W_]+", query.lower()) if word]
+    return list(dict.fromkeys(words))[:MAX_TERMS]
+
+
+def tsquery_text(query: str) -> Optional[str]:
+    """Аргумент to_tsquery: все слова префиксами ('встреч':* & 'клиент':*) или None."""
+    words = terms(query)
+    return " & ".join(f"'{word}':*" for word in words) if words else None
+
+
+def fts5_query(query: str) -> Optional[str]:
+    """Выражение FTS5 MATCH с тем же смыслом ("встреч"* AND "клиент"*) или None."""
+    words = terms(query)
+    return " AND ".join(f'"{word}"*' for word in words) if words else None
+
+
+def is_search_object(name: Optional[str]) -> bool:
+    """Объекты поиска вне ORM, которые Alembic не должен сравнивать с моделями."""
+    return bool(name) and (name in (SEARCH_VECTOR_COLUMN, SEARCH_VECTOR_INDEX) or name.startswith(FTS_TABLE))
@@ -0,0 +1,28 @@
+"""
+Сериализация строк БД сразу в JSON без ORM-объектов и pydantic-валидации.
+
+Используется на горячих путях чтения, где ответ — большой список однотипных записей.
+pydantic_core.to_json — тот же сериализатор, которым FastAPI кодирует response_model,
+поэтому даты, время, enum и строки форматируются побайтово так же.
+"""
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Sequence
+
+from pydantic_core import to_json
+
+
+def rows_to_json(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    """JSON-массив объектов {field: value} из строк с колонками в порядке fields."""
+    return to_json([dict(zip(fields, row)) for row in rows])
+
+
+async def rows_to_json_stream(fields: Sequence[str], batches: AsyncIterable[Sequence[Sequence[Any]]]) -> AsyncIterator[bytes]:
+    """Тот же JSON-массив, что rows_to_json, по частям: батч строк — кусок ответа."""
+    yield b"["
+    first = True
+    async for rows in batches:
+        if not rows:
+            continue
+        body = rows_to_json(fields, rows)[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
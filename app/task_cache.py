@@ -0,0 +1,248 @@
+"""
+Кэш выборок GET /tasks по месяцам.
+
+Корзина — задачи одного источника (личные задачи пользователя или задачи семьи) за месяц,
+уже сериализованные в JSON (по строке на задачу, см. _bucket_line). Ключ содержит версию данных источника из crud.get_tasks_stamp
+(тот же запрос, что строит ETag), поэтому:
+  * запись задачи повышает версию, и старые корзины перестают читаться во всех воркерах сразу;
+  * изменения членства не требуют сброса: доступные семьи берутся из штампа на каждом запросе,
+    участники одной семьи делят её корзины, а заблокированные их не получают.
+invalidate() лишь освобождает память от корзин устаревших версий.
+
+Хранилище подключаемое: по умолчанию in-process LRU с TTL и лимитом памяти,
+при заданном TASK_CACHE_URL — Redis (нужен пакет redis). Любой объект с методами
+MemoryBackend (get_many/set_many/delete_prefix/stats) можно подставить в task_cache.backend.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from datetime import date, timedelta
+from typing import Any, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.cache import TTLCache
+from app.config import get_settings
+from app.serializers import rows_to_json
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process хранилище: LRU + TTL с лимитом числа корзин и суммарного размера в байтах."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self._cache: TTLCache[bytes] = TTLCache(max_size=max_entries, ttl=ttl, max_weight=max_bytes, weigher=len)
+
+    async def get_many(self, keys: Sequence[str]) -> list[Optional[bytes]]:
+        return [self._cache.get(key) for key in keys]
+
+    async def set_many(self, items: dict[str, bytes], ttl: float) -> None:
+        for key, value in items.items():
+            self._cache.set(key, value, ttl=ttl)
+
+    async def delete_prefix(self, prefix: str) -> int:
+        return self._cache.discard_where(lambda key, _: key.startswith(prefix))
+
+    def stats(self) -> dict[str, Any]:
+        stats = self._cache.stats()
+        return {
+            "backend": "memory",
+            "size": stats["size"],
+            "bytes": stats["weight"],
+            "max_bytes": stats["max_weight"],
+            "evictions": stats["evictions"],
+        }
+
+
+class RedisBackend:
+    """
+    Общее для всех воркеров хранилище в Redis.
+
+    Вытеснением управляет сам Redis (maxmemory-policy allkeys-lru), поэтому delete_prefix
+    ничего не сканирует: корзины старых версий недостижимы и истекают по TTL.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as exc:
+            raise RuntimeError("TASK_CACHE_URL is set but the 'redis' package is not installed") from exc
+        return cls(aioredis.from_url(url))
+
+    async def get_many(self, keys: Sequence[str]) -> list[Optional[bytes]]:
+        return await self.client.mget(keys)
+
+    async def set_many(self, items: dict[str, bytes], ttl: float) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.set(key, value, ex=max(1, math.ceil(ttl)))
+        await pipe.execute()
+
+    async def delete_prefix(self, prefix: str) -> int:
+        return 0
+
+    def stats(self) -> dict[str, Any]:
+        # Счётчик вытеснений ведёт сервер: INFO stats -> evicted_keys
+        return {"backend": "redis", "evictions": None}
+
+
+def _months(start: date, end: date) -> list[date]:
+    months = []
+    month = start.replace(day=1)
+    while month <= end:
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def _month_end(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def _bucket_line(row) -> bytes:
+    """
+    Строка корзины: ключ сортировки и JSON задачи через табуляцию.
+
+    Ключ повторяет ORDER BY date, start_time, id из crud (задачи без времени — в конце дня),
+    поэтому строки сортируются и сливаются побайтово, без разбора JSON.
+    Табуляция внутри JSON всегда экранирована.
+    """
+    start_time = row.start_time.isoformat() if row.start_time is not None else "~"
+    key = f"{row.date.isoformat()}\t{start_time}\t{row.id:020d}\t".encode()
+    return key + rows_to_json(crud.TASK_READ_FIELDS, [row])[1:-1]
+
+
+class TaskCache:
+    def __init__(self, backend, ttl: float, max_months: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_months = max_months
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def list_json(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        start: date,
+        end: date,
+        stamp: crud.TasksStamp,
+    ) -> Optional[bytes]:
+        """
+        JSON-ответ GET /tasks для области, описанной штампом, побайтово совпадающий с
+        crud.list_task_rows + rows_to_json. None — период слишком длинный для кэша.
+        """
+        sources = [(f"f{family_id}", version) for family_id, version in stamp.families]
+        if stamp.personal_version is not None:
+            sources.insert(0, (f"u{user_id}", stamp.personal_version))
+        if not sources or start > end:
+            return b"[]"
+        months = _months(start, end)
+        if len(months) > self.max_months:
+            return None
+
+        keys = {
+            (source, month): f"tasks:{source}:{version}:{month:%Y-%m}"
+            for source, version in sources
+            for month in months
+        }
+        values = dict(zip(keys, await self._get_many(list(keys.values()))))
+        missing = [bucket for bucket, value in values.items() if value is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            loaded = await self._load(db, user_id, missing)
+            values.update(loaded)
+            await self._set_many({keys[bucket]: value for bucket, value in loaded.items()})
+
+        start_iso, end_iso = start.isoformat().encode(), end.isoformat().encode()
+        lines = sorted(
+            line
+            for value in values.values() if value
+            for line in value.split(b"\n")
+            if start_iso <= line[:10] <= end_iso
+        )
+        return b"[" + b",".join(line.split(b"\t", 3)[3] for line in lines) + b"]"
+
+    async def _load(self, db: AsyncSession, user_id: int, missing: list[tuple[str, date]]) -> dict:
+        """Недостающие корзины одним запросом; пустые корзины тоже кэшируются."""
+        owner_id = user_id if any(source[0] == "u" for source, _ in missing) else None
+        family_ids = {int(source[1:]) for source, _ in missing if source[0] == "f"}
+        rows = await crud.list_task_month_rows(
+            db, owner_id, family_ids,
+            min(month for _, month in missing),
+            _month_end(max(month for _, month in missing)),
+        )
+        buckets: dict[tuple[str, date], list[bytes]] = {bucket: [] for bucket in missing}
+        for row in rows:
+            source = f"u{user_id}" if row.family_id is None else f"f{row.family_id}"
+            bucket = buckets.get((source, row.date.replace(day=1)))
+            if bucket is not None:
+                bucket.append(_bucket_line(row))
+        return {bucket: b"\n".join(sorted(lines)) for bucket, lines in buckets.items()}
+
+    async def invalidate(self, owner_id: int, family_id: Optional[int]) -> None:
+        """Сброс корзин источника после записи задачи (после commit)."""
+        prefix = f"tasks:f{family_id}:" if family_id is not None else f"tasks:u{owner_id}:"
+        try:
+            await self.backend.delete_prefix(prefix)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Task cache invalidation failed for {prefix}: {exc}")
+
+    # Недоступность хранилища не должна ломать чтение: работаем как при промахе
+    async def _get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        try:
+            return await self.backend.get_many(keys)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Task cache read failed: {exc}")
+            return [None] * len(keys)
+
+    async def _set_many(self, items: dict[str, bytes]) -> None:
+        try:
+            await self.backend.set_many(items, self.ttl)
+        except Exception as exc:
+            self.errors += 1
+            logger.warning(f"Task cache write failed: {exc}")
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _build_task_cache() -> Optional[TaskCache]:
+    settings = get_settings()
+    if not settings.task_cache_enabled:
+        return None
+    if settings.task_cache_url:
+        backend = RedisBackend.from_url(settings.task_cache_url)
+    else:
+        backend = MemoryBackend(
+            max_entries=settings.task_cache_max_entries,
+            max_bytes=settings.task_cache_max_bytes,
+            ttl=settings.task_cache_ttl_seconds,
+        )
+    return TaskCache(backend, ttl=settings.task_cache_ttl_seconds, max_months=settings.task_cache_max_months)
+
+
+task_cache = _build_task_cache()
+
+
+async def invalidate_tasks(owner_id: int, family_id: Optional[int]) -> None:
+    if task_cache is not None:
+        await task_cache.invalidate(owner_id, family_id)
@@ -0,0 +1,24 @@
+"""
+Отдельный процесс для фоновых задач: python -m app.worker
+
+При запуске отдельно имеет смысл выставить EMBEDDED_JOB_WORKER=false для API.
+"""
+import asyncio
+import logging
+
+from app import jobs
+from app import notifications  # noqa: F401 — регистрирует обработчики задач
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    try:
+        await jobs.run_worker()
+    finally:
+        await notifications.get_delivery_pipeline().close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,14 +1,16 @@
 import asyncio
 import logging
 from pathlib import Path
+from typing import Optional
 
-from aiogram import Bot, Dispatcher, Router
+from aiogram import Dispatcher, Router
 from aiogram.filters import Command, CommandStart
 from aiogram.filters.command import CommandObject
 from aiogram.types import (
     KeyboardButton,
     Message,
     ReplyKeyboardMarkup,
+    Update,
     WebAppInfo,
 )
 from dotenv import load_dotenv
@@ -16,16 +18,23 @@ from dotenv import load_dotenv
 from app import crud, schemas
 from app.config import get_settings
 from app.database import AsyncSessionLocal
+from app.notifications import get_bot
+from bot.updates import UpdatePool
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(PROJECT_ROOT / ".env")
 logging.basicConfig(level=logging.INFO)
 
 settings = get_settings()
-bot = Bot(settings.bot_token)
 dp = Dispatcher()
 router = Router()
 
+# Таймаут long polling (getUpdates) и интервал записи статистики обработки в лог
+POLLING_TIMEOUT_SECONDS = 30
+STATS_LOG_INTERVAL_SECONDS = 60
+
+_update_pool: Optional[UpdatePool] = None
+
 async def upsert_user(message: Message):
     """Асинхронное создание или обновление пользователя."""
     user = message.from_user
@@ -115,9 +124,75 @@ def register_handlers():
     dp.include_router(router)
 
 
+async def handle_update(update: Update) -> None:
+    await dp.feed_update(get_bot(), update)
+
+
+def get_update_pool() -> UpdatePool:
+    """Общий для процесса пул обработки обновлений (polling или webhook)."""
+    global _update_pool
+    if _update_pool is None:
+        _update_pool = UpdatePool(
+            handle_update,
+            workers=settings.bot_update_workers,
+            max_queue=settings.bot_update_queue_size,
+            dedupe_window=settings.bot_update_dedupe_window,
+        )
+    return _update_pool
+
+
+async def poll_updates(pool: UpdatePool) -> None:
+    """
+    Long polling вместо dp.start_polling: обновления уходят в пул, а не в отдельную задачу
+    на каждое, поэтому сохраняется порядок внутри чата, а заполненная очередь
+    приостанавливает getUpdates.
+    """
+    bot = get_bot()
+    allowed_updates = dp.resolve_used_update_types()
+    offset = None
+    delay = 1
+    while True:
+        try:
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=POLLING_TIMEOUT_SECONDS,
+                allowed_updates=allowed_updates,
+                request_timeout=int(bot.session.timeout + POLLING_TIMEOUT_SECONDS),
+            )
+        except Exception as e:
+            logging.error(f"Ошибка получения обновлений: {e}, повтор через {delay}с")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+            continue
+        delay = 1
+        for update in updates:
+            offset = update.update_id + 1
+            await pool.submit(update)
+
+
+async def log_stats(pool: UpdatePool) -> None:
+    while True:
+        await asyncio.sleep(STATS_LOG_INTERVAL_SECONDS)
+        logging.info(f"Обработка обновлений: {pool.stats()}")
+
+
 async def main():
+    if settings.bot_webhook_enabled:
+        # Обновления принимает API (POST /telegram/webhook, app/routers/telegram.py)
+        logging.error("BOT_WEBHOOK_ENABLED=true: бот работает через webhook в API, polling не запускается")
+        return
     register_handlers()
-    await dp.start_polling(bot)
+    bot = get_bot()
+    # После работы в режиме webhook getUpdates возвращает конфликт, пока webhook не снят
+    await bot.delete_webhook()
+    pool = get_update_pool()
+    stats_task = asyncio.create_task(log_stats(pool))
+    try:
+        await poll_updates(pool)
+    finally:
+        stats_task.cancel()
+        await pool.close()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+"""
+Пул обработки обновлений бота (long polling в bot.main и webhook в app/routers/telegram.py).
+
+Обновления одного чата обрабатываются строго по очереди, разные чаты — параллельно
+ограниченным числом воркеров: медленный запрос к БД одного пользователя не задерживает
+остальных. Очередь ограничена (submit ждёт свободного места), повторно присланные
+update_id отбрасываются, stats() отдаёт задержки обработчиков и размер очереди.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних обработок учитывается в перцентилях задержки
+LATENCY_SAMPLES = 1000
+
+
+def chat_key(update: Update) -> Hashable:
+    """Ключ очереди: чат события, иначе его автор; прочие обновления друг от друга не зависят."""
+    try:
+        event = update.event
+    except Exception:
+        return ("update", update.update_id)
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        # id личного чата совпадает с id пользователя
+        return user.id
+    return ("update", update.update_id)
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+@dataclass
+class _Queued:
+    update: Update
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class UpdatePool:
+    """
+    Очереди обновлений по чатам и пул воркеров над ними.
+
+    Чат с ожидающими обновлениями стоит в общей очереди готовых не более одного раза и
+    не попадает туда, пока его текущее обновление обрабатывается; после обработки чат
+    с непустой очередью встаёт в конец, так что загруженный чат не занимает воркер целиком.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Update], Awaitable[Any]],
+        workers: int,
+        max_queue: int,
+        dedupe_window: int,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self._max_queue = max_queue
+        self._dedupe_window = dedupe_window
+        self._chats: dict[Hashable, deque[_Queued]] = {}
+        self._ready: Optional[asyncio.Queue[Hashable]] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._drained: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seen: set[int] = set()
+        self._seen_order: deque[int] = deque()
+        self._pending = 0
+        self._in_flight = 0
+        self._latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._waits: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.counters = {"processed": 0, "failed": 0, "duplicates": 0}
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Первый вызов или новый event loop (например, повторный asyncio.run)
+            self._loop = loop
+            self._chats = {}
+            self._ready = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self._max_queue)
+            self._drained = asyncio.Event()
+            self._drained.set()
+            self._pending = 0
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, update: Update) -> bool:
+        """
+        Постановка обновления в очередь его чата. Ждёт только при заполненной очереди
+        (backpressure). Возвращает False для уже полученного update_id.
+        """
+        self._ensure_started()
+        if update.update_id in self._seen:
+            self.counters["duplicates"] += 1
+            return False
+        self._remember(update.update_id)
+
+        await self._slots.acquire()
+        self._pending += 1
+        self._drained.clear()
+        key = chat_key(update)
+        queue = self._chats.get(key)
+        if queue is None:
+            self._chats[key] = deque([_Queued(update)])
+            self._ready.put_nowait(key)
+        else:
+            queue.append(_Queued(update))
+        return True
+
+    def _remember(self, update_id: int) -> None:
+        self._seen.add(update_id)
+        self._seen_order.append(update_id)
+        if len(self._seen_order) > self._dedupe_window:
+            self._seen.discard(self._seen_order.popleft())
+
+    async def close(self, timeout: float = 10) -> None:
+        """Дожидается обработки очереди (не дольше timeout) и останавливает воркеров."""
+        if self._drained is not None:
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Не дождались обработки {self._pending} обновлений бота")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            queue = self._chats[key]
+            item = queue.popleft()
+            self._in_flight += 1
+            started = time.monotonic()
+            self._waits.append(started - item.enqueued_at)
+            try:
+                await self.handler(item.update)
+                self.counters["processed"] += 1
+            except Exception:
+                logger.exception(f"Ошибка обработки обновления {item.update.update_id}")
+                self.counters["failed"] += 1
+            finally:
+                self._latencies.append(time.monotonic() - started)
+                self._in_flight -= 1
+                self._pending -= 1
+                self._slots.release()
+                if queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._chats[key]
+                if not self._pending:
+                    self._drained.set()
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        heads = [queue[0].enqueued_at for queue in self._chats.values() if queue]
+        latencies = sorted(self._latencies)
+        waits = sorted(self._waits)
+        return {
+            **self.counters,
+            "queue_depth": self._pending - self._in_flight,
+            "queue_max": self._max_queue,
+            "chats_waiting": len(heads),
+            "oldest_wait_ms": round((now - min(heads)) * 1000, 1) if heads else 0.0,
+            "in_flight": self._in_flight,
+            "workers": self.workers,
+            "handler_ms_p50": round(_percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+            "handler_ms_p95": round(_percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+            "handler_ms_max": round(latencies[-1] * 1000, 1) if latencies else None,
+            "wait_ms_p95": round(_percentile(waits, 0.95) * 1000, 1) if waits else None,
+        }
@@ -0,0 +1,74 @@
+"""
+Окружение Alembic.
+
+Используется двумя способами:
+- из командной строки: `alembic upgrade head` (создаёт собственное async-подключение);
+- из app.routers.migrations.run_migrations, который передаёт готовое соединение
+  через config.attributes["connection"].
+"""
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+
+from app import models, search  # noqa: F401 — models регистрирует таблицы в Base.metadata
+from app.database import ASYNC_DATABASE_URL, Base, engine
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    # Объекты полнотекстового поиска создаются вне ORM (см. app.search)
+    return not (reflected and compare_to is None and search.is_search_object(name))
+
+
+def run_migrations_offline() -> None:
+    """Генерация SQL без подключения к БД: `alembic upgrade head --sql`."""
+    context.configure(
+        url=ASYNC_DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    # Каждая ревизия в своей транзакции: ревизии с CREATE INDEX CONCURRENTLY
+    # выходят из неё через autocommit_block()
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+        await connection.commit()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is None:
+        asyncio.run(run_async_migrations())
+    else:
+        do_run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,182 @@
+"""baseline schema
+
+Схема на момент перехода на Alembic. Ревизия идемпотентна: на базах, которые раньше
+мигрировались скриптом app.routers.migrations (проверки information_schema), она
+создаёт только отсутствующие таблицы и колонки.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_users() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("first_name", sa.String(64)),
+        sa.Column("last_name", sa.String(64)),
+        sa.Column("username", sa.String(64)),
+        sa.Column("telegram_notifications_enabled", sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column("membership_epoch", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def _create_families() -> None:
+    op.create_table(
+        "families",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("invite_code", sa.String(10), nullable=False, unique=True),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    )
+
+
+def _create_family_memberships() -> None:
+    op.create_table(
+        "family_memberships",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("family_id", sa.Integer(), sa.ForeignKey("families.id"), nullable=False),
+        sa.Column("role", sa.String(20), nullable=False),
+        sa.Column("blocked", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.UniqueConstraint("user_id", "family_id", name="uq_membership"),
+    )
+
+
+def _create_tasks() -> None:
+    op.create_table(
+        "tasks",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("family_id", sa.Integer(), sa.ForeignKey("families.id")),
+        sa.Column("title", sa.String(120), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("start_time", sa.Time()),
+        sa.Column("end_time", sa.Time()),
+        sa.Column("scope", sa.Enum("personal", "family", name="taskscope"), nullable=False),
+        sa.Column("tags", sa.JSON()),
+        sa.Column("color", sa.String(7)),
+        sa.Column("notify_before_days", sa.Integer()),
+        sa.Column("notify_before_hours", sa.Integer()),
+    )
+
+
+def _create_notification_outbox() -> None:
+    op.create_table(
+        "notification_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("kind", sa.String(16), nullable=False),
+        sa.Column("due_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime()),
+        sa.UniqueConstraint("task_id", "kind", name="uq_outbox_task_kind"),
+    )
+    op.create_index(
+        "ix_notification_outbox_pending_due_at",
+        "notification_outbox",
+        ["due_at"],
+        postgresql_where=sa.text("sent_at IS NULL"),
+        sqlite_where=sa.text("sent_at IS NULL"),
+    )
+
+
+def _create_jobs() -> None:
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("kind", sa.String(64), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("max_attempts", sa.Integer(), nullable=False),
+        sa.Column("run_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.Text()),
+    )
+    op.create_index(
+        "ix_jobs_ready_run_at",
+        "jobs",
+        ["run_at"],
+        postgresql_where=sa.text("status IN ('queued', 'running')"),
+        sqlite_where=sa.text("status IN ('queued', 'running')"),
+    )
+
+
+# Колонки, которые старый скрипт миграций добавлял к уже существующим таблицам
+LEGACY_COLUMNS = [
+    ("users", sa.Column("telegram_notifications_enabled", sa.Boolean(), nullable=False, server_default=sa.true())),
+    ("users", sa.Column("membership_epoch", sa.Integer(), nullable=False, server_default="0")),
+    ("family_memberships", sa.Column("blocked", sa.Boolean(), nullable=False, server_default=sa.false())),
+    ("tasks", sa.Column("tags", sa.JSON())),
+    ("tasks", sa.Column("color", sa.String(7))),
+    ("tasks", sa.Column("notify_before_days", sa.Integer())),
+    ("tasks", sa.Column("notify_before_hours", sa.Integer())),
+]
+
+
+def _backfill_notification_outbox() -> None:
+    """Напоминания для будущих задач, созданных до появления notification_outbox."""
+    from app.crud import reminder_due_times
+
+    bind = op.get_bind()
+    now = datetime.now()
+    tasks = sa.table(
+        "tasks",
+        sa.column("id"), sa.column("date"), sa.column("start_time"),
+        sa.column("notify_before_days"), sa.column("notify_before_hours"),
+    )
+    outbox = sa.table("notification_outbox", sa.column("task_id"), sa.column("kind"), sa.column("due_at"))
+    result = bind.execute(
+        sa.select(tasks).where(
+            tasks.c.date >= now.date(),
+            sa.or_(tasks.c.notify_before_days.isnot(None), tasks.c.notify_before_hours.isnot(None)),
+        )
+    )
+    rows = []
+    for task_id, task_date, start_time, days, hours in result:
+        due = reminder_due_times(task_date, start_time, days, hours, now=now)
+        rows.extend({"task_id": task_id, "kind": kind, "due_at": max(due_at, now)} for kind, due_at in due.items())
+    if rows:
+        op.bulk_insert(outbox, rows)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+    legacy_database = "tasks" in existing
+
+    for name, create in [
+        ("users", _create_users),
+        ("families", _create_families),
+        ("family_memberships", _create_family_memberships),
+        ("tasks", _create_tasks),
+        ("notification_outbox", _create_notification_outbox),
+        ("jobs", _create_jobs),
+    ]:
+        if name not in existing:
+            create()
+
+    for table, column in LEGACY_COLUMNS:
+        if table in existing and column.name not in {c["name"] for c in inspector.get_columns(table)}:
+            op.add_column(table, column)
+
+    if legacy_database and "notification_outbox" not in existing:
+        _backfill_notification_outbox()
+
+
+def downgrade() -> None:
+    for name in ["jobs", "notification_outbox", "tasks", "family_memberships", "families", "users"]:
+        op.drop_table(name)
+    sa.Enum(name="taskscope").drop(op.get_bind(), checkfirst=True)
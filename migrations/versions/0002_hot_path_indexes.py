@@ -0,0 +1,59 @@
+"""indexes for task month views, reminders and family members
+
+Строятся через CREATE INDEX CONCURRENTLY, чтобы не блокировать запись в tasks.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+REMINDERS_PREDICATE = "notify_before_days IS NOT NULL OR notify_before_hours IS NOT NULL"
+
+INDEXES = [
+    ("ix_tasks_owner_id_date", "tasks", ["owner_id", "date"], None),
+    ("ix_tasks_family_id_date", "tasks", ["family_id", "date"], None),
+    ("ix_tasks_reminders_date", "tasks", ["date"], REMINDERS_PREDICATE),
+    ("ix_family_memberships_family_id", "family_memberships", ["family_id"], None),
+]
+
+
+def create_index_concurrently(name: str, table: str, columns: list[str], where: str | None = None) -> None:
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS вне транзакции ревизии.
+    Недостроенный (INVALID) индекс от прерванной попытки пересоздаётся.
+    """
+    bind = op.get_bind()
+    predicate = sa.text(where) if where else None
+    with op.get_context().autocommit_block():
+        if bind.dialect.name == "postgresql":
+            invalid = bind.scalar(
+                sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                {"name": name},
+            )
+            if invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            name, table, columns,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=predicate,
+            sqlite_where=predicate,
+        )
+
+
+def upgrade() -> None:
+    for name, table, columns, where in INDEXES:
+        create_index_concurrently(name, table, columns, where)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
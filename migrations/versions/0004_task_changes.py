@@ -0,0 +1,69 @@
+"""task change sequence and tombstones for delta sync
+
+tasks.change_seq — версия источника (users/families.data_version), в которой задача
+изменилась последний раз; task_tombstones хранит удалённые задачи. Индексы по tasks
+строятся через CREATE INDEX CONCURRENTLY.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_tasks_family_id_change_seq", "tasks", ["family_id", "change_seq"], None),
+    ("ix_tasks_personal_change_seq", "tasks", ["owner_id", "change_seq"], "family_id IS NULL"),
+]
+
+
+def create_index_concurrently(name: str, table: str, columns: list[str], where: str | None = None) -> None:
+    """То же, что в ревизии 0002 (ревизии не импортируют друг друга)."""
+    bind = op.get_bind()
+    predicate = sa.text(where) if where else None
+    with op.get_context().autocommit_block():
+        if bind.dialect.name == "postgresql":
+            invalid = bind.scalar(
+                sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                {"name": name},
+            )
+            if invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            name, table, columns,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=predicate,
+            sqlite_where=predicate,
+        )
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("change_seq", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("tasks", sa.Column("updated_at", sa.DateTime(), nullable=True))
+    op.create_table(
+        "task_tombstones",
+        sa.Column("task_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("family_id", sa.Integer(), nullable=True),
+        sa.Column("change_seq", sa.Integer(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_task_tombstones_owner_id_change_seq", "task_tombstones", ["owner_id", "change_seq"])
+    op.create_index("ix_task_tombstones_family_id_change_seq", "task_tombstones", ["family_id", "change_seq"])
+    for name, table, columns, where in INDEXES:
+        create_index_concurrently(name, table, columns, where)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_table("task_tombstones")
+    op.drop_column("tasks", "updated_at")
+    op.drop_column("tasks", "change_seq")
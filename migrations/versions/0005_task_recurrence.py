@@ -0,0 +1,67 @@
+"""recurring tasks
+
+tasks.rrule / exdates / recurrence_end описывают серию, series_id / occurrence_date —
+изменённое вхождение; notification_outbox.occurrence_date — вхождение серии, о котором
+напоминание. Индексы по tasks строятся через CREATE INDEX CONCURRENTLY.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_tasks_series_owner_id", "tasks", ["owner_id"], "rrule IS NOT NULL"),
+    ("ix_tasks_series_family_id", "tasks", ["family_id"], "rrule IS NOT NULL"),
+    ("ix_tasks_series_id", "tasks", ["series_id"], "series_id IS NOT NULL"),
+]
+
+
+def create_index_concurrently(name: str, table: str, columns: list[str], where: str | None = None) -> None:
+    """То же, что в ревизии 0002 (ревизии не импортируют друг друга)."""
+    bind = op.get_bind()
+    predicate = sa.text(where) if where else None
+    with op.get_context().autocommit_block():
+        if bind.dialect.name == "postgresql":
+            invalid = bind.scalar(
+                sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                {"name": name},
+            )
+            if invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            name, table, columns,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=predicate,
+            sqlite_where=predicate,
+        )
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("rrule", sa.String(length=255), nullable=True))
+    op.add_column("tasks", sa.Column("exdates", sa.JSON(), nullable=True))
+    op.add_column("tasks", sa.Column("recurrence_end", sa.Date(), nullable=True))
+    op.add_column("tasks", sa.Column("series_id", sa.Integer(), nullable=True))
+    op.add_column("tasks", sa.Column("occurrence_date", sa.Date(), nullable=True))
+    op.add_column("notification_outbox", sa.Column("occurrence_date", sa.Date(), nullable=True))
+    for name, table, columns, where in INDEXES:
+        create_index_concurrently(name, table, columns, where)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_column("notification_outbox", "occurrence_date")
+    op.drop_column("tasks", "occurrence_date")
+    op.drop_column("tasks", "series_id")
+    op.drop_column("tasks", "recurrence_end")
+    op.drop_column("tasks", "exdates")
+    op.drop_column("tasks", "rrule")
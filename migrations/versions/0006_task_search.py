@@ -0,0 +1,77 @@
+"""full-text search over tasks
+
+PostgreSQL: генерируемая колонка tasks.search_vector (заполняется при добавлении, это
+перезапись таблицы) и GIN-индекс через CREATE INDEX CONCURRENTLY.
+SQLite: FTS5-таблица tasks_fts с триггерами, заполняется из существующих задач.
+Выражения совпадают с app.search на момент ревизии (ревизии не импортируют приложение).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(tags::jsonb::text, '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+)
+INDEX = "ix_tasks_search_vector"
+
+
+def fts_values(row: str) -> str:
+    return f"{row}.id, {row}.title, (SELECT group_concat(value, ' ') FROM json_each({row}.tags)), {row}.description"
+
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, tags, description, content='', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+    f"INSERT INTO tasks_fts(rowid, title, tags, description) VALUES ({fts_values('new')}); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+    f"INSERT INTO tasks_fts(tasks_fts, rowid, title, tags, description) VALUES ('delete', {fts_values('old')}); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, tags, description ON tasks BEGIN "
+    f"INSERT INTO tasks_fts(tasks_fts, rowid, title, tags, description) VALUES ('delete', {fts_values('old')}); "
+    f"INSERT INTO tasks_fts(rowid, title, tags, description) VALUES ({fts_values('new')}); END",
+    f"INSERT INTO tasks_fts(rowid, title, tags, description) SELECT {fts_values('tasks')} FROM tasks",
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+        return
+    if bind.dialect.name != "postgresql":
+        return
+    op.execute(
+        f"ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+    )
+    with op.get_context().autocommit_block():
+        # Как create_index_concurrently в 0002: недостроенный индекс после сбоя строим заново
+        invalid = bind.scalar(
+            sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": INDEX},
+        )
+        if invalid:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX}")
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX} ON tasks USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        for trigger in ("tasks_fts_insert", "tasks_fts_delete", "tasks_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS tasks_fts")
+    elif bind.dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {INDEX}")
+        op.execute("ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,125 @@
+"""task tags: jsonb with GIN index and task_tags side table
+
+PostgreSQL: tasks.tags переводится в jsonb одной перезаписью таблицы вместе с
+search_vector (генерируемую колонку нельзя оставить при смене типа tags, поэтому она
+пересоздаётся тем же ALTER TABLE), затем GIN-индексы строятся через CREATE INDEX
+CONCURRENTLY. Таблица task_tags (тег задачи в нижнем регистре на строку) заполняется
+из существующих задач пачками: lower() в SQLite и локали "C" не переводит кириллицу.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_INDEX = "ix_tasks_search_vector"
+TAGS_INDEX = "ix_tasks_tags"
+BATCH_SIZE = 5000
+
+
+def search_vector_sql(tags: str) -> str:
+    """Выражение app.search на момент ревизии (0006 — через tags::jsonb::text)."""
+    return (
+        "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('russian', coalesce({tags}, '')), 'B') || "
+        "setweight(to_tsvector('russian', coalesce(description, '')), 'C')"
+    )
+
+
+def create_gin_index_concurrently(name: str, expression: str) -> None:
+    """Как в ревизии 0006: недостроенный после сбоя индекс строим заново."""
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        invalid = bind.scalar(
+            sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+            {"name": name},
+        )
+        if invalid:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON tasks USING gin ({expression})")
+
+
+def backfill_task_tags() -> None:
+    """Строки task_tags для существующих задач (keyset по id, BATCH_SIZE задач за запрос)."""
+    bind = op.get_bind()
+    task_tags = sa.table(
+        "task_tags",
+        sa.column("task_id"), sa.column("key"), sa.column("tag"), sa.column("owner_id"), sa.column("family_id"),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, owner_id, family_id, CAST(tags AS TEXT) FROM tasks "
+                "WHERE id > :last_id AND tags IS NOT NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            return
+        values = []
+        for task_id, owner_id, family_id, raw in rows:
+            keys: dict[str, str] = {}
+            for tag in json.loads(raw) or ():
+                if isinstance(tag, str) and tag.strip():
+                    keys.setdefault(tag.strip().lower(), tag)
+            values += [
+                {"task_id": task_id, "key": key, "tag": tag, "owner_id": owner_id, "family_id": family_id}
+                for key, tag in keys.items()
+            ]
+        if values:
+            bind.execute(sa.insert(task_tags), values)
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {SEARCH_VECTOR_INDEX}")
+        op.execute(
+            "ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector, "
+            "ALTER COLUMN tags TYPE jsonb USING tags::jsonb, "
+            f"ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({search_vector_sql('tags::text')}) STORED"
+        )
+    key_type = sa.Text().with_variant(sa.Text(collation="C"), "postgresql")
+    op.create_table(
+        "task_tags",
+        sa.Column("task_id", sa.Integer(), sa.ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("key", key_type, primary_key=True),
+        sa.Column("tag", sa.Text(), nullable=False),
+        sa.Column("owner_id", sa.Integer(), nullable=False),
+        sa.Column("family_id", sa.Integer(), nullable=True),
+    )
+    backfill_task_tags()
+    op.create_index(
+        "ix_task_tags_personal_key", "task_tags", ["owner_id", "key"],
+        postgresql_where=sa.text("family_id IS NULL"),
+        sqlite_where=sa.text("family_id IS NULL"),
+    )
+    op.create_index("ix_task_tags_family_id_key", "task_tags", ["family_id", "key"])
+    if bind.dialect.name == "postgresql":
+        create_gin_index_concurrently(SEARCH_VECTOR_INDEX, "search_vector")
+        create_gin_index_concurrently(TAGS_INDEX, "tags jsonb_path_ops")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    op.drop_table("task_tags")
+    if bind.dialect.name == "postgresql":
+        op.execute(f"DROP INDEX IF EXISTS {TAGS_INDEX}")
+        op.execute(f"DROP INDEX IF EXISTS {SEARCH_VECTOR_INDEX}")
+        op.execute(
+            "ALTER TABLE tasks DROP COLUMN IF EXISTS search_vector, "
+            "ALTER COLUMN tags TYPE json USING tags::json, "
+            f"ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({search_vector_sql('tags::jsonb::text')}) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS {SEARCH_VECTOR_INDEX} ON tasks USING gin (search_vector)")
@@ -0,0 +1,60 @@
+"""imported tasks: tasks.external_uid with unique indexes per source
+
+UID события .ics, из которого импортирована задача. Уникален в пределах источника (личные
+задачи владельца или задачи семьи): повторный импорт того же файла пропускает дубликаты
+через ON CONFLICT DO NOTHING. Индексы частичные (только импортированные задачи) и строятся
+через CREATE INDEX CONCURRENTLY.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("uq_tasks_personal_external_uid", "tasks", ["owner_id", "external_uid"],
+     "family_id IS NULL AND external_uid IS NOT NULL"),
+    ("uq_tasks_family_external_uid", "tasks", ["family_id", "external_uid"],
+     "family_id IS NOT NULL AND external_uid IS NOT NULL"),
+]
+
+
+def create_unique_index_concurrently(name: str, table: str, columns: list[str], where: str) -> None:
+    """Как create_index_concurrently в ревизии 0002, но уникальный."""
+    bind = op.get_bind()
+    predicate = sa.text(where)
+    with op.get_context().autocommit_block():
+        if bind.dialect.name == "postgresql":
+            invalid = bind.scalar(
+                sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                {"name": name},
+            )
+            if invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(
+            name, table, columns,
+            unique=True,
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=predicate,
+            sqlite_where=predicate,
+        )
+
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("external_uid", sa.String(length=255), nullable=True))
+    for name, table, columns, where in INDEXES:
+        create_unique_index_concurrently(name, table, columns, where)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+    op.drop_column("tasks", "external_uid")
@@ -0,0 +1,39 @@
+"""drop ix_tasks_reminders_date
+
+Частичный индекс задач с напоминаниями из ревизии 0002 не используется: с появлением
+notification_outbox планировщик выбирает напоминания из неё, и ни один запрос не фильтрует
+tasks по notify_before_*. Индекс только замедлял запись в tasks. Удаляется через
+DROP INDEX CONCURRENTLY.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+NAME = "ix_tasks_reminders_date"
+REMINDERS_PREDICATE = "notify_before_days IS NOT NULL OR notify_before_hours IS NOT NULL"
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(NAME, table_name="tasks", postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    predicate = sa.text(REMINDERS_PREDICATE)
+    with op.get_context().autocommit_block():
+        op.create_index(
+            NAME, "tasks", ["date"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=predicate,
+            sqlite_where=predicate,
+        )
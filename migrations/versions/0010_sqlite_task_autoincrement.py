@@ -0,0 +1,80 @@
+"""sqlite: monotonic task ids (AUTOINCREMENT)
+
+Без AUTOINCREMENT SQLite выдаёт новой задаче id последней удалённой (max(rowid) + 1).
+На id задачи ссылаются следы удаления (первичный ключ task_tombstones: повторное удаление
+падало на нём) и UID выгрузки .ics (<id>@tgcalendar), поэтому id не должны повторяться.
+
+SQLite не меняет первичный ключ через ALTER TABLE, поэтому таблица пересоздаётся по
+процедуре из документации SQLite: новая таблица, копирование строк с теми же id, замена
+старой, затем индексы и триггеры полнотекстового поиска из sqlite_master. id не меняются,
+поэтому индекс tasks_fts остаётся верным. Внешние ключи в SQLite приложение не включает,
+так что DROP TABLE не удаляет каскадом строки дочерних таблиц. В PostgreSQL id берутся из последовательности
+и не повторяются: ревизия ничего не делает.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+PLAIN_ID = "id INTEGER NOT NULL,"
+AUTOINCREMENT_ID = "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,"
+TABLE_PRIMARY_KEY = re.compile(r"\s*PRIMARY KEY \(id\),")
+
+
+def rebuild_tasks(table_sql: str) -> None:
+    bind = op.get_bind()
+    dependents = bind.execute(sa.text(
+        "SELECT type, name, sql FROM sqlite_master "
+        "WHERE tbl_name = 'tasks' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    )).all()
+    for kind, name, _ in dependents:
+        if kind == "trigger":
+            op.execute(f"DROP TRIGGER {name}")
+
+    op.execute(re.sub(r"^CREATE TABLE \"?tasks\"?", "CREATE TABLE tasks_new", table_sql))
+    op.execute("INSERT INTO tasks_new SELECT * FROM tasks")
+    op.execute("DROP TABLE tasks")
+    op.execute("ALTER TABLE tasks_new RENAME TO tasks")
+    for _, _, sql in dependents:
+        op.execute(sql)
+
+
+def current_table_sql() -> str:
+    return op.get_bind().scalar(sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"))
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    table_sql = current_table_sql()
+    if "AUTOINCREMENT" in table_sql:
+        return
+    if PLAIN_ID not in table_sql or not TABLE_PRIMARY_KEY.search(table_sql):
+        raise RuntimeError("Unexpected tasks table definition, cannot add AUTOINCREMENT")
+    rebuild_tasks(TABLE_PRIMARY_KEY.sub("", table_sql.replace(PLAIN_ID, AUTOINCREMENT_ID, 1), count=1))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    table_sql = current_table_sql()
+    if "AUTOINCREMENT" not in table_sql:
+        return
+    without = table_sql.replace(AUTOINCREMENT_ID, PLAIN_ID, 1)
+    # Табличный первичный ключ возвращается перед первым FOREIGN KEY (или в конец)
+    marker = without.find("FOREIGN KEY")
+    if marker == -1:
+        marker = without.rindex(")")
+        rebuild_tasks(without[:marker].rstrip() + ", \n\tPRIMARY KEY (id)\n)")
+    else:
+        rebuild_tasks(without[:marker] + "PRIMARY KEY (id), \n\t" + without[marker:])
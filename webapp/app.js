@@ -4,7 +4,7 @@ const params = new URLSearchParams(window.location.search);
 // Debug режим только для разработки (проверка через параметр URL)
 const isDevelopment = params.get("dev") === "true";
 
-const APP_VERSION = "2025-12-12-uiux-2";
+const APP_VERSION = "2026-10-18-task-tags";
 
 function agentLog(payload) {
   try {
@@ -233,7 +233,12 @@ const state = {
   currentMonth: new Date(new Date().getFullYear(), new Date().getMonth(), 1),
   selectedDate: new Date(),
   tasks: [],
-  taskMap: {},
+  taskMap: {}, // Полные задачи по дням; ключ есть только у уже загруженных дней
+  summaryMap: {}, // Сводка месяца по дням (GET /tasks/summary) для сетки календаря
+  tasksVersion: 0, // Увеличивается при смене месяца/области, чтобы отбросить устаревшие ответы
+  syncCursor: null, // Курсор GET /tasks/changes для текущей области
+  streamController: null, // AbortController открытого GET /tasks/stream
+  detailsRequest: null,
   viewMode: "calendar", // "calendar" | "kanban"
   kanbanDaysCount: 7, // Количество дней для отображения в канбане (7, 14, 30 или 0 для всего месяца)
 };
@@ -269,6 +274,9 @@ const ui = {
   fabAddTask: document.getElementById("fab-add-task"),
   familySelect: document.getElementById("family-select"),
   taskDateInput: document.getElementById("task-date-input"),
+  searchInput: document.getElementById("task-search-input"),
+  searchResults: document.getElementById("task-search-results"),
+  tagSuggestions: document.getElementById("tag-suggestions"),
 };
 
 function formatISO(date) {
@@ -329,20 +337,40 @@ async function authenticate() {
   }
 }
 
+// Ответы GET по пути запроса: { etag, text }. Сервер отвечает 304, если данные не менялись
+const responseCache = new Map();
+const RESPONSE_CACHE_LIMIT = 200;
+
+function authHeaders() {
+  if (state.token) return { Authorization: `Bearer ${state.token}` };
+  if (state.debugUserId) return { "X-Debug-User-Id": state.debugUserId };
+  return {};
+}
+
 async function apiFetch(path, options = {}) {
-  const headers = { "Content-Type": "application/json", ...(options.headers || {}) };
-  if (state.token) {
-    headers.Authorization = `Bearer ${state.token}`;
-  } else if (state.debugUserId) {
-    headers["X-Debug-User-Id"] = state.debugUserId;
+  const headers = { "Content-Type": "application/json", ...authHeaders(), ...(options.headers || {}) };
+  const isGet = !options.method || options.method.toUpperCase() === "GET";
+  const cached = isGet ? responseCache.get(path) : null;
+  if (cached) {
+    headers["If-None-Match"] = cached.etag;
   }
   const response = await fetch(path, { ...options, headers });
+  // Разбираем заново, чтобы вызывающий код мог менять полученные объекты
+  if (response.status === 304 && cached) return JSON.parse(cached.text);
   if (!response.ok) {
     const text = await response.text();
     throw new Error(text || "API error");
   }
   if (response.status === 204) return null;
-  return response.json();
+  const etag = isGet ? response.headers.get("ETag") : null;
+  if (!etag) return response.json();
+  const text = await response.text();
+  responseCache.delete(path);
+  responseCache.set(path, { etag, text });
+  if (responseCache.size > RESPONSE_CACHE_LIMIT) {
+    responseCache.delete(responseCache.keys().next().value);
+  }
+  return JSON.parse(text);
 }
 
 async function loadFamilies() {
@@ -352,6 +380,7 @@ async function loadFamilies() {
     state.families = families;
     populateFamilySelect();
     renderScopeChips();
+    restartTaskStream();
   } finally {
     setLoading(false);
   }
@@ -492,13 +521,14 @@ function renderCalendar() {
 
     // Цветные точки для задач
     const key = formatISO(day);
-    const tasksForDay = state.taskMap[key] || [];
-    if (tasksForDay.length) {
+    const summary = state.summaryMap[key];
+    const taskCount = summary ? summary.count : 0;
+    if (taskCount) {
       const dotsContainer = document.createElement("div");
       dotsContainer.className = "calendar-day__dots";
       
-      // Группируем задачи по цветам и показываем до 3 точек
-      const colors = [...new Set(tasksForDay.slice(0, 3).map(t => t.color || "#4c6fff"))];
+      // Цвета дня (в порядке времени начала), показываем до 3 точек
+      const colors = [...new Set(summary.colors.map((color) => color || "#4c6fff"))].slice(0, 3);
       colors.forEach(color => {
         const dot = document.createElement("span");
         dot.className = "calendar-day__dot";
@@ -509,15 +539,14 @@ function renderCalendar() {
       cell.appendChild(dotsContainer);
       
       // Tooltip с количеством задач
-      if (tasksForDay.length > 0) {
-        cell.title = `${tasksForDay.length} ${tasksForDay.length === 1 ? 'задача' : tasksForDay.length < 5 ? 'задачи' : 'задач'}`;
-      }
+      cell.title = `${taskCount} ${taskCount === 1 ? 'задача' : taskCount < 5 ? 'задачи' : 'задач'}`;
     }
 
     cell.addEventListener("click", () => {
       state.selectedDate = day;
       renderCalendar();
       renderTaskList();
+      loadVisibleDays();
       syncFormDate();
       // Прокручиваем к списку задач выбранного дня
       const selectedDayTasks = document.getElementById("selected-day-tasks");
@@ -538,6 +567,14 @@ function renderTaskList() {
   if (ui.selectedDayLabel) {
     ui.selectedDayLabel.textContent = formatDateHuman(state.selectedDate);
   }
+
+  if (!(key in state.taskMap) && state.summaryMap[key]?.count) {
+    const loading = document.createElement("li");
+    loading.className = "task-card task-card--empty";
+    loading.innerHTML = `<div><div class="task-empty-subtitle">Загрузка задач…</div></div>`;
+    ui.taskList.appendChild(loading);
+    return;
+  }
   
   if (!tasks.length) {
     const empty = document.createElement("li");
@@ -592,6 +629,12 @@ function renderTaskList() {
       timeSpan.textContent = time;
       metaEl.appendChild(timeSpan);
     }
+    if (task.rrule) {
+      const repeatSpan = document.createElement("span");
+      repeatSpan.textContent = "↻";
+      repeatSpan.title = "Повторяющаяся задача";
+      metaEl.appendChild(repeatSpan);
+    }
     
     // Теги
     const tagsContainer = node.querySelector(".task-card__tags");
@@ -609,7 +652,7 @@ function renderTaskList() {
     const deleteBtn = node.querySelector(".task-card__delete");
     deleteBtn.addEventListener("click", (event) => {
       event.stopPropagation();
-      confirmDelete(task.id);
+      confirmDelete(task);
     });
     ui.taskList.appendChild(node);
   });
@@ -664,9 +707,7 @@ function syncFormScope() {
   // #endregion
 }
 
-async function fetchTasks() {
-  setLoading(true);
-  const { start, end } = monthBounds(state.currentMonth);
+function scopeParams(start, end) {
   const params = new URLSearchParams({
     start: formatISO(start),
     end: formatISO(end),
@@ -675,23 +716,401 @@ async function fetchTasks() {
   if (state.scope.type === "family" && state.scope.familyId) {
     params.append("family_id", state.scope.familyId);
   }
-  let tasks = [];
+  return params;
+}
+
+function syncParams() {
+  const params = new URLSearchParams({ scope: state.scope.type });
+  if (state.scope.type === "family" && state.scope.familyId) {
+    params.append("family_id", state.scope.familyId);
+  }
+  return params;
+}
+
+// Полная загрузка области: для сетки — только сводка по дням, полные задачи — лениво
+// для выбранного дня (или дней канбана). Дальше загруженные дни обновляет syncChanges
+async function fetchTasks() {
+  setLoading(true);
+  const version = ++state.tasksVersion;
+  const { start, end } = monthBounds(state.currentMonth);
+  let summary = [];
+  let cursor = null;
+  try {
+    // Курсор берётся до сводки: изменения между запросами придут при следующей синхронизации
+    ({ cursor } = await apiFetch(`/tasks/changes?${syncParams().toString()}`));
+    summary = await apiFetch(`/tasks/summary?${scopeParams(start, end).toString()}`);
+  } finally {
+    setLoading(false);
+  }
+  if (version !== state.tasksVersion) return;
+  state.syncCursor = cursor;
+  state.summaryMap = Object.fromEntries(summary.map((day) => [day.date, day]));
+  state.tasks = [];
+  state.taskMap = {};
+  renderCurrentView();
+  renderTaskList();
+}
+
+async function refreshMonthSummary() {
+  const version = state.tasksVersion;
+  const { start, end } = monthBounds(state.currentMonth);
+  const summary = await apiFetch(`/tasks/summary?${scopeParams(start, end).toString()}`);
+  if (version !== state.tasksVersion) return;
+  state.summaryMap = Object.fromEntries(summary.map((day) => [day.date, day]));
+}
+
+// Переход на другой месяц: задачи уже загруженных дней остаются (их актуальность
+// поддерживает syncChanges), для сетки загружается только сводка нового месяца
+async function changeMonth(delta) {
+  state.currentMonth = new Date(
+    state.currentMonth.getFullYear(),
+    state.currentMonth.getMonth() + delta,
+    1
+  );
+  state.tasksVersion++;
+  setLoading(true);
   try {
-    tasks = await apiFetch(`/tasks?${params.toString()}`);
-    state.tasks = tasks;
+    // Сначала сводка: по ней loadVisibleDays пропускает пустые дни нового месяца
+    await refreshMonthSummary();
+    await syncChanges();
+  } catch (error) {
+    console.error("Error loading tasks:", error);
   } finally {
     setLoading(false);
   }
-  state.taskMap = tasks.reduce((acc, task) => {
-    const key = task.date;
-    acc[key] = acc[key] || [];
-    acc[key].push(task);
-    return acc;
-  }, {});
   renderCurrentView();
   renderTaskList();
 }
 
+// Догрузка изменений области после курсора вместо перезагрузки месяца
+async function syncChanges() {
+  if (!state.syncCursor) return fetchTasks();
+  const version = state.tasksVersion;
+  const params = syncParams();
+  params.append("since", state.syncCursor);
+  const changes = await apiFetch(`/tasks/changes?${params.toString()}`);
+  if (version !== state.tasksVersion) return;
+  // Вхождения серий разворачивает сервер: изменённую серию проще загрузить заново
+  if (changes.reset || changes.changed.some((task) => task.rrule)) return fetchTasks();
+  state.syncCursor = changes.cursor;
+  if (applyChanges(changes)) await refreshMonthSummary();
+  renderCurrentView();
+  renderTaskList();
+}
+
+// Поток изменений задач (GET /tasks/stream, SSE): по событию подтягиваем изменения через
+// syncChanges. fetch вместо EventSource, чтобы токен шёл в заголовке, а не в URL
+const STREAM_RETRY_MS = 3000;
+const SYNC_DEBOUNCE_MS = 300;
+let syncTimer = null;
+
+function scheduleSync() {
+  if (!state.syncCursor) return;
+  clearTimeout(syncTimer);
+  syncTimer = setTimeout(() => {
+    syncChanges().catch((error) => console.error("Error syncing tasks:", error));
+  }, SYNC_DEBOUNCE_MS);
+}
+
+function isChangeInScope(change) {
+  if (state.scope.type === "personal") return change.family_id === null;
+  if (state.scope.type === "family" && state.scope.familyId) return change.family_id === state.scope.familyId;
+  return true;
+}
+
+function handleStreamMessage(message) {
+  let event = "message";
+  let data = "";
+  message.split("\n").forEach((line) => {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data += line.slice(5).trim();
+  });
+  if (event === "reset") {
+    scheduleSync(); // Часть событий потеряна; сервер закроет поток, и мы переподключимся
+    return;
+  }
+  if (!data) return; // heartbeat
+  if (isChangeInScope(JSON.parse(data))) scheduleSync();
+}
+
+async function connectTaskStream() {
+  if (!state.token) return; // В debug-режиме без токена поток не открываем
+  for (;;) {
+    const controller = new AbortController();
+    state.streamController = controller;
+    try {
+      const response = await fetch("/tasks/stream", {
+        headers: { Authorization: `Bearer ${state.token}` },
+        signal: controller.signal,
+      });
+      if (!response.ok || !response.body) throw new Error(`stream status ${response.status}`);
+      // Изменения, сделанные, пока потока не было
+      scheduleSync();
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        let index;
+        while ((index = buffer.indexOf("\n\n")) >= 0) {
+          handleStreamMessage(buffer.slice(0, index));
+          buffer = buffer.slice(index + 2);
+        }
+      }
+    } catch (error) {
+      if (!controller.signal.aborted) console.warn("Task stream error:", error);
+    }
+    if (!controller.signal.aborted) {
+      await new Promise((resolve) => setTimeout(resolve, STREAM_RETRY_MS));
+    }
+  }
+}
+
+// Поиск задач области (GET /tasks/search) по мере ввода. Курсор следующей страницы
+// приходит в заголовке X-Next-Cursor, поэтому запрос идёт мимо apiFetch
+const SEARCH_DEBOUNCE_MS = 250;
+let searchTimer = null;
+let searchRequest = 0;
+
+async function fetchSearchPage(query, cursor) {
+  const params = syncParams();
+  params.append("q", query);
+  if (cursor) params.append("cursor", cursor);
+  const response = await fetch(`/tasks/search?${params.toString()}`, { headers: authHeaders() });
+  if (!response.ok) throw new Error((await response.text()) || "API error");
+  return { tasks: await response.json(), next: response.headers.get("X-Next-Cursor") };
+}
+
+async function runSearch(query, cursor = null) {
+  const request = ++searchRequest;
+  try {
+    const page = await fetchSearchPage(query, cursor);
+    if (request !== searchRequest) return; // Пока ждали ответ, запрос изменился
+    renderSearchResults(query, page, !cursor);
+  } catch (error) {
+    console.error("Error searching tasks:", error);
+  }
+}
+
+function renderSearchResults(query, { tasks, next }, reset) {
+  const list = ui.searchResults;
+  if (reset) list.innerHTML = "";
+  list.querySelector(".task-search__more")?.remove();
+  list.classList.remove("hidden");
+  if (reset && !tasks.length) {
+    const empty = document.createElement("li");
+    empty.className = "task-card task-card--empty";
+    empty.innerHTML = `<div><div class="task-empty-subtitle">Ничего не найдено</div></div>`;
+    list.appendChild(empty);
+    return;
+  }
+  tasks.forEach((task) => {
+    const item = document.createElement("li");
+    item.className = "task-card task-search__item";
+    const colorBar = document.createElement("div");
+    colorBar.className = "task-card__color-bar";
+    colorBar.style.background = task.color || "var(--primary)";
+    const content = document.createElement("div");
+    content.className = "task-card__content";
+    const title = document.createElement("div");
+    title.className = "task-card__title";
+    title.textContent = task.title;
+    const meta = document.createElement("div");
+    meta.className = "task-card__meta";
+    meta.textContent = [formatDateHuman(parseISO(task.date)), formatTimeRange(task), task.rrule ? "↻" : null]
+      .filter(Boolean)
+      .join(" • ");
+    content.append(title, meta);
+    item.append(colorBar, content);
+    item.addEventListener("click", () => openSearchResult(task));
+    list.appendChild(item);
+  });
+  if (next) {
+    const more = document.createElement("li");
+    more.className = "task-card task-card--empty task-search__more";
+    more.innerHTML = `<button type="button" class="task-empty-action">Показать ещё</button>`;
+    more.querySelector("button").addEventListener("click", () => runSearch(query, next));
+    list.appendChild(more);
+  }
+}
+
+function closeSearch() {
+  searchRequest++;
+  clearTimeout(searchTimer);
+  ui.searchInput.value = "";
+  ui.searchResults.innerHTML = "";
+  ui.searchResults.classList.add("hidden");
+}
+
+// Переход к дню найденной задачи
+async function openSearchResult(task) {
+  closeSearch();
+  const day = parseISO(task.date);
+  const delta = (day.getFullYear() - state.currentMonth.getFullYear()) * 12 + day.getMonth() - state.currentMonth.getMonth();
+  if (delta) await changeMonth(delta);
+  setSelectedDateFromISO(task.date);
+}
+
+// Подсказки тегов в форме задачи (GET /tasks/tags/suggest) для тега, который вводится
+// последним: область — группа, выбранная в форме, иначе личные задачи
+let tagSuggestTimer = null;
+let tagSuggestRequest = 0;
+
+function tagInputParts() {
+  const parts = ui.taskForm.elements["tags"].value.split(",");
+  const prefix = parts.pop().trim();
+  return { entered: parts.map(t => t.trim()).filter(Boolean), prefix };
+}
+
+async function suggestTags() {
+  const request = ++tagSuggestRequest;
+  const { entered, prefix } = tagInputParts();
+  const familyId = ui.familySelect?.value;
+  const params = new URLSearchParams({ prefix, scope: familyId ? "family" : "personal" });
+  if (familyId) params.append("family_id", familyId);
+  try {
+    const tags = await apiFetch(`/tasks/tags/suggest?${params.toString()}`);
+    if (request !== tagSuggestRequest) return;
+    const known = new Set(entered.map(t => t.toLowerCase()));
+    renderTagSuggestions(tags.filter(({ tag }) => !known.has(tag.toLowerCase()) && tag !== prefix));
+  } catch (error) {
+    console.error("Error suggesting tags:", error);
+  }
+}
+
+function renderTagSuggestions(tags) {
+  ui.tagSuggestions.innerHTML = "";
+  tags.forEach(({ tag }) => {
+    const button = document.createElement("button");
+    button.type = "button";
+    button.className = "tag-suggestion";
+    button.textContent = tag;
+    button.addEventListener("click", () => {
+      const input = ui.taskForm.elements["tags"];
+      input.value = [...tagInputParts().entered, tag].join(", ") + ", ";
+      input.focus();
+      suggestTags();
+    });
+    ui.tagSuggestions.appendChild(button);
+  });
+}
+
+function clearTagSuggestions() {
+  tagSuggestRequest++;
+  clearTimeout(tagSuggestTimer);
+  if (ui.tagSuggestions) ui.tagSuggestions.innerHTML = "";
+}
+
+// Переподключение потока после изменения состава семей (подписка строится при подключении)
+function restartTaskStream() {
+  state.streamController?.abort();
+}
+
+// Применяет изменения к загруженным дням. Возвращает true, если затронуты
+// незагруженные дни и сводку месяца нужно запросить заново
+function applyChanges({ changed, deleted }) {
+  const touched = new Set();
+  let summaryStale = false;
+  // Удаляет задачу вместе со всеми загруженными вхождениями, если это серия
+  const removeTask = (id) => {
+    const removed = state.tasks.filter((t) => t.id === id);
+    if (!removed.length) return false;
+    state.tasks = state.tasks.filter((t) => t.id !== id);
+    removed.forEach((task) => {
+      state.taskMap[task.date] = (state.taskMap[task.date] || []).filter((t) => t.id !== id);
+      touched.add(task.date);
+    });
+    return true;
+  };
+  deleted.forEach((id) => {
+    if (!removeTask(id)) summaryStale = true;
+  });
+  changed.forEach((task) => {
+    if (!removeTask(task.id)) summaryStale = true;
+    if (task.date in state.taskMap) {
+      state.taskMap[task.date] = [...state.taskMap[task.date], task].sort(sortTasks);
+      state.tasks.push(task);
+      touched.add(task.date);
+    } else {
+      summaryStale = true;
+    }
+  });
+  touched.forEach((key) => refreshDaySummary(key));
+  return summaryStale;
+}
+
+// Вхождения серии приходят с id серии и различаются датой
+function taskKey(task) {
+  return task.rrule ? `${task.id}@${task.occurrence_date}` : String(task.id);
+}
+
+async function loadTaskDetails(start, end) {
+  const version = state.tasksVersion;
+  const tasks = await apiFetch(`/tasks?${scopeParams(start, end).toString()}`);
+  if (version !== state.tasksVersion) return false;
+  for (const day = new Date(start); day <= end; day.setDate(day.getDate() + 1)) {
+    state.taskMap[formatISO(day)] = [];
+  }
+  tasks.forEach((task) => state.taskMap[task.date].push(task));
+  const loadedKeys = new Set(tasks.map(taskKey));
+  state.tasks = [...state.tasks.filter((task) => !loadedKeys.has(taskKey(task))), ...tasks];
+  return true;
+}
+
+// Догружает полные задачи для дней, видимых сейчас (выбранный день или колонки канбана)
+async function loadVisibleDays() {
+  const days = state.viewMode === "calendar" ? [state.selectedDate] : buildKanbanDays();
+  const { start, end } = monthBounds(state.currentMonth);
+  const [monthStart, monthEnd] = [formatISO(start), formatISO(end)];
+  const missing = days.filter((day) => {
+    const key = formatISO(day);
+    if (key in state.taskMap) return false;
+    // По сводке месяца день пуст — запрашивать нечего
+    if (key >= monthStart && key <= monthEnd && !state.summaryMap[key]) {
+      state.taskMap[key] = [];
+      return false;
+    }
+    return true;
+  });
+  if (!missing.length) return;
+
+  const requestKey = `${state.tasksVersion}:${formatISO(missing[0])}:${formatISO(missing[missing.length - 1])}`;
+  if (state.detailsRequest === requestKey) return; // Такой же запрос уже выполняется
+  state.detailsRequest = requestKey;
+  setLoading(true);
+  try {
+    if (!(await loadTaskDetails(missing[0], missing[missing.length - 1]))) return;
+  } catch (error) {
+    console.error("Error loading tasks:", error);
+    return;
+  } finally {
+    if (state.detailsRequest === requestKey) state.detailsRequest = null;
+    setLoading(false);
+  }
+  if (state.viewMode === "calendar") {
+    renderTaskList();
+  } else {
+    renderKanban();
+  }
+}
+
+// Пересчёт сводки дня по загруженным задачам (после локального переноса задачи)
+function refreshDaySummary(key) {
+  const tasks = [...(state.taskMap[key] || [])].sort(sortTasks);
+  if (!tasks.length) {
+    delete state.summaryMap[key];
+    return;
+  }
+  const startTimes = tasks.map((task) => task.start_time).filter(Boolean);
+  state.summaryMap[key] = {
+    date: key,
+    count: tasks.length,
+    colors: [...new Set(tasks.map((task) => task.color || null))],
+    first_start_time: startTimes.length ? startTimes[0] : null,
+  };
+}
+
 function openFamilyModal() {
   ui.inputFamilyName.value = ""; // Очищаем поле
   ui.familyModal.classList.remove("hidden");
@@ -954,25 +1373,11 @@ async function removeMember(userId, memberName) {
 function setupListeners() {
   // Навигация по месяцам
   if (ui.btnBack) {
-    ui.btnBack.addEventListener("click", () => {
-      state.currentMonth = new Date(
-        state.currentMonth.getFullYear(),
-        state.currentMonth.getMonth() - 1,
-        1
-      );
-      fetchTasks();
-    });
+    ui.btnBack.addEventListener("click", () => changeMonth(-1));
   }
 
   if (ui.btnForward) {
-    ui.btnForward.addEventListener("click", () => {
-      state.currentMonth = new Date(
-        state.currentMonth.getFullYear(),
-        state.currentMonth.getMonth() + 1,
-        1
-      );
-      fetchTasks();
-    });
+    ui.btnForward.addEventListener("click", () => changeMonth(1));
   }
 
   ui.btnCancelFamily.addEventListener("click", closeFamilyModal);
@@ -991,6 +1396,26 @@ function setupListeners() {
   }
   
   // Поиск участников
+  if (ui.searchInput) {
+    ui.searchInput.addEventListener("input", () => {
+      clearTimeout(searchTimer);
+      const query = ui.searchInput.value.trim();
+      if (!query) {
+        closeSearch();
+        return;
+      }
+      searchTimer = setTimeout(() => runSearch(query), SEARCH_DEBOUNCE_MS);
+    });
+  }
+
+  if (ui.tagSuggestions && ui.taskForm) {
+    ui.taskForm.elements["tags"].addEventListener("input", () => {
+      clearTimeout(tagSuggestTimer);
+      tagSuggestTimer = setTimeout(suggestTags, SEARCH_DEBOUNCE_MS);
+    });
+    ui.taskForm.elements["tags"].addEventListener("focus", suggestTags);
+  }
+
   if (ui.membersSearchInput) {
     ui.membersSearchInput.addEventListener("input", (e) => {
       renderMembersList(currentFamilyMembers, e.target.value);
@@ -1051,6 +1476,7 @@ function setupListeners() {
       }
       
       payload.start_time = payload.start_time || null;
+      payload.rrule = payload.rrule || null;
       payload.end_time = payload.end_time || null;
       if (payload.start_time && payload.end_time && payload.end_time < payload.start_time) {
         uiAlert("Время окончания должно быть позже начала", { title: "Проверь время", type: "warning" });
@@ -1104,7 +1530,7 @@ function setupListeners() {
         syncFormDate();
         syncFormScope();
         closeTaskForm();
-        await fetchTasks();
+        await syncChanges();
         showToast("Задача добавлена", { title: "Готово", type: "success" });
       } catch (error) {
         uiAlert(error.message, { title: "Ошибка", type: "error" });
@@ -1129,7 +1555,6 @@ function setupListeners() {
       if (state.viewMode !== "kanban") {
         state.viewMode = "kanban";
         renderCurrentView();
-        renderKanban();
       }
     });
   }
@@ -1162,6 +1587,7 @@ function setupListeners() {
     ui.kanbanDaysSelect.addEventListener("change", (event) => {
       state.kanbanDaysCount = parseInt(event.target.value, 10);
       renderKanban();
+      loadVisibleDays();
     });
   }
 
@@ -1180,6 +1606,7 @@ function renderCurrentView() {
   } else {
     renderKanban();
   }
+  loadVisibleDays();
 }
 
 function openTaskForm() {
@@ -1202,6 +1629,7 @@ function closeTaskForm() {
     if (ui.taskFormOverlay) {
       ui.taskFormOverlay.classList.remove("open");
     }
+    clearTagSuggestions();
     if (ui.taskForm) {
       ui.taskForm.reset();
       // Восстанавливаем значения по умолчанию
@@ -1259,8 +1687,8 @@ function renderKanban() {
     column.addEventListener("drop", (event) => {
       event.preventDefault();
       column.classList.remove("drop-target");
-      const taskId = event.dataTransfer.getData("taskId");
-      if (taskId) moveTaskToDate(Number(taskId), key);
+      const movedKey = event.dataTransfer.getData("taskKey");
+      if (movedKey) moveTaskToDate(movedKey, key);
     });
     
     // Клик по колонке открывает форму для создания задачи
@@ -1316,7 +1744,7 @@ function renderKanban() {
       card.draggable = true;
       card.dataset.taskId = task.id;
       card.addEventListener("dragstart", (event) => {
-        event.dataTransfer.setData("taskId", String(task.id));
+        event.dataTransfer.setData("taskKey", taskKey(task));
       });
 
       // Цветная полоса слева
@@ -1341,6 +1769,7 @@ function renderKanban() {
       const metaParts = [];
       const time = formatTimeRange(task);
       if (time) metaParts.push(time);
+      if (task.rrule) metaParts.push("↻");
       if (task.scope === "family" && task.family_id) {
         const family = state.families.find((f) => f.id === task.family_id);
         if (family) metaParts.push(family.name);
@@ -1368,7 +1797,7 @@ function renderKanban() {
       deleteBtn.textContent = "✕";
       deleteBtn.addEventListener("click", (event) => {
         event.stopPropagation();
-        confirmDelete(task.id);
+        confirmDelete(task);
       });
       card.appendChild(deleteBtn);
 
@@ -1380,46 +1809,63 @@ function renderKanban() {
   });
 }
 
-async function moveTaskToDate(taskId, newDate) {
-  const task = state.tasks.find((t) => t.id === taskId);
+// Перенос вхождения серии создаёт для этой даты отдельную задачу, серия не меняется
+async function moveTaskToDate(key, newDate) {
+  const task = state.tasks.find((t) => taskKey(t) === key);
   if (!task || task.date === newDate) return;
 
   const prevDate = task.date;
   task.date = newDate;
-  state.taskMap[prevDate] = (state.taskMap[prevDate] || []).filter((t) => t.id !== taskId);
+  state.taskMap[prevDate] = (state.taskMap[prevDate] || []).filter((t) => t !== task);
   state.taskMap[newDate] = [...(state.taskMap[newDate] || []), task];
   state.taskMap[newDate].sort(sortTasks);
+  refreshDaySummary(prevDate);
+  refreshDaySummary(newDate);
 
   renderCurrentView();
   if (formatISO(state.selectedDate) === prevDate) renderTaskList();
   try {
     setLoading(true);
-    await apiFetch(`/tasks/${taskId}`, {
+    const url = task.rrule ? `/tasks/${task.id}/occurrences/${task.occurrence_date}` : `/tasks/${task.id}`;
+    await apiFetch(url, {
       method: "PATCH",
       body: JSON.stringify({ date: newDate }),
     });
     showToast("Задача перенесена", { title: "Готово", type: "success", duration: 1800 });
+    // Подтягивает и изменения других участников семьи
+    syncChanges().catch((error) => console.error("Error syncing tasks:", error));
   } catch (error) {
     console.error("Error updating task:", error);
     uiAlert("Не удалось обновить задачу: " + error.message, { title: "Ошибка", type: "error" });
     // откат
     task.date = prevDate;
-    state.taskMap[newDate] = (state.taskMap[newDate] || []).filter((t) => t.id !== taskId);
+    state.taskMap[newDate] = (state.taskMap[newDate] || []).filter((t) => t !== task);
     state.taskMap[prevDate] = [...(state.taskMap[prevDate] || []), task];
     state.taskMap[prevDate].sort(sortTasks);
+    refreshDaySummary(prevDate);
+    refreshDaySummary(newDate);
     renderCurrentView();
   } finally {
     setLoading(false);
   }
 }
 
-async function confirmDelete(taskId) {
-  const agree = await uiConfirm("Удалить задачу?");
-  if (!agree) return;
+async function confirmDelete(task) {
+  let url = `/tasks/${task.id}`;
+  if (task.rrule) {
+    // Сначала предлагаем удалить только это вхождение, затем всю серию
+    if (await uiConfirm(`Удалить только повторение ${task.occurrence_date}?`)) {
+      url = `/tasks/${task.id}/occurrences/${task.occurrence_date}`;
+    } else if (!(await uiConfirm("Удалить всю серию повторяющейся задачи?"))) {
+      return;
+    }
+  } else if (!(await uiConfirm("Удалить задачу?"))) {
+    return;
+  }
   try {
     setLoading(true);
-    await apiFetch(`/tasks/${taskId}`, { method: "DELETE" });
-    await fetchTasks();
+    await apiFetch(url, { method: "DELETE" });
+    await syncChanges();
   } catch (error) {
     uiAlert("Не удалось удалить: " + error.message, { title: "Ошибка", type: "error" });
   } finally {
@@ -1436,6 +1882,7 @@ function setSelectedDateFromISO(dateISO) {
   } else {
     renderKanban();
   }
+  loadVisibleDays();
 }
 
 function sortTasks(a, b) {
@@ -1501,6 +1948,7 @@ async function init() {
     setupListeners();
     await fetchTasks();
     renderCurrentView();
+    connectTaskStream();
   } catch (error) {
     console.error(error);
     uiAlert(error.message, { title: "Ошибка", type: "error" });